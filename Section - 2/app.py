@@ -2,7 +2,9 @@ import streamlit as st
 from dotenv import load_dotenv
 import os
 from src.agents.chatbot import FitnessChatbot
+from src.agents.resources import ChatbotResources, get_resources
 from src.data_loaders.data_loader import initialize_data
+from config.config import app_config
 import logging
 
 # Configure logging
@@ -12,16 +14,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Load environment variables and initialize data (only once at startup)
+# Load environment variables
 logger.info("Loading environment variables...")
 load_dotenv()
 
-# Initialize data only if not already done
-if 'data_initialized' not in st.session_state:
+@st.cache_resource(show_spinner="Loading fitness knowledge base...")
+def load_shared_resources() -> ChatbotResources:
+    """Seed data and build the models, vector store and pool once per process.
+
+    Every session reuses the result, so only the first session pays for it.
+    """
     logger.info("Performing one-time data initialization...")
     initialize_data()
-    st.session_state.data_initialized = True
     logger.info("Data initialization completed")
+    return get_resources()
 
 def initialize_session_state():
     """Initialize session state variables."""
@@ -29,10 +35,12 @@ def initialize_session_state():
     if 'chat_history' not in st.session_state:
         logger.info("Creating new chat history")
         st.session_state.chat_history = []
+    if 'history_pages' not in st.session_state:
+        st.session_state.history_pages = 1
     if 'chatbot' not in st.session_state:
         try:
             logger.info("Initializing chatbot...")
-            st.session_state.chatbot = FitnessChatbot()
+            st.session_state.chatbot = FitnessChatbot(resources=load_shared_resources())
             logger.info("Chatbot initialized successfully")
             return True
         except Exception as e:
@@ -41,6 +49,23 @@ def initialize_session_state():
             return False
     return True
 
+def render_chat_history():
+    """Render the latest page(s) of messages; older ones load on demand.
+
+    Each rerun re-renders what is shown, so long sessions stay as fast as
+    short ones.
+    """
+    history = st.session_state.chat_history
+    visible = app_config.history_page_size * st.session_state.history_pages
+    hidden = max(len(history) - visible, 0)
+    if hidden:
+        if st.button(f"Show older messages ({hidden} hidden)"):
+            st.session_state.history_pages += 1
+            st.rerun()
+    for message in history[hidden:]:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
 def main():
     logger.info("Starting Kahunas Fitness Coach application...")
     
@@ -71,13 +96,7 @@ def main():
 
     # Chat interface
     logger.info("Setting up chat interface...")
-    for message in st.session_state.chat_history:
-        if message["role"] == "assistant":
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
-        else:
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
+    render_chat_history()
 
     # User input
     if prompt := st.chat_input("Ask your fitness-related question..."):
@@ -87,21 +106,30 @@ def main():
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # Get chatbot response
+        # Stream the chatbot response as it is generated
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    logger.info("Generating chatbot response...")
-                    response = st.session_state.chatbot.get_response(prompt)
-                    st.markdown(response)
-                    st.session_state.chat_history.append(
-                        {"role": "assistant", "content": response}
-                    )
-                    logger.info("Response generated and displayed successfully")
-                except Exception as e:
-                    error_message = f"An error occurred: {str(e)}"
-                    st.error(error_message)
-                    logger.error(f"Error generating response: {e}", exc_info=True)
+            placeholder = st.empty()
+            placeholder.markdown("Thinking...")
+            try:
+                logger.info("Generating chatbot response...")
+                response = ""
+                for chunk in st.session_state.chatbot.stream_response(prompt):
+                    response += chunk
+                    placeholder.markdown(response + "▌")
+                response = response.strip()
+                placeholder.markdown(response)
+                st.session_state.chat_history.append(
+                    {"role": "assistant", "content": response}
+                )
+                metrics = st.session_state.chatbot.metrics[-1]
+                st.caption(f"First token {metrics.time_to_first_token:.2f}s · total {metrics.total_time:.2f}s"
+                           + (" · cached" if metrics.cached else ""))
+                logger.info("Response generated and displayed successfully")
+            except Exception as e:
+                error_message = f"An error occurred: {str(e)}"
+                placeholder.empty()
+                st.error(error_message)
+                logger.error(f"Error generating response: {e}", exc_info=True)
 
     # Sidebar with additional options
     with st.sidebar:
@@ -109,6 +137,8 @@ def main():
         if st.button("Clear Chat History"):
             logger.info("Clearing chat history...")
             st.session_state.chat_history = []
+            st.session_state.history_pages = 1
+            st.session_state.chatbot.memory.clear()
             st.rerun()
 
         st.header("About")
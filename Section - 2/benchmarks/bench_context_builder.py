@@ -0,0 +1,100 @@
+"""Compare prompt size and latency of raw SQL results versus the context builder.
+
+Seeds a SQLite user_workouts table with many workouts for one user, then
+answers a history question both ways: fetching every row and pasting
+str(rows) into the prompt, as the chatbot used to, and streaming the rows
+in chunks through SQLContextBuilder. The LLM is a stub whose latency grows
+with prompt size, standing in for prefill time:
+
+    python benchmarks/bench_context_builder.py --workouts 20000 --days 730 --budget 1500
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.agents.context_builder import SQLContextBuilder
+from src.agents.memory import token_counter
+from src.data_loaders.db_pool import iter_guarded, rows_as_dicts
+from src.utils.stubs import StubLLM
+
+QUERY = "SELECT * FROM user_workouts WHERE user_id = 26 ORDER BY workout_date DESC"
+WORKOUT_TYPES = ["Running", "Cycling", "Swimming", "HIIT", "Strength Training", "Yoga"]
+NOTES = ["Felt strong", "Tired legs", "New personal best", "Easy recovery session", "Pushed hard", ""]
+
+def create_database(path: str, workouts: int, days: int, seed: int):
+    rng = random.Random(seed)
+    start = datetime.date.today() - datetime.timedelta(days=days)
+    connection = sqlite3.connect(path)
+    connection.execute("""CREATE TABLE user_workouts (
+        id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, workout_date TEXT NOT NULL,
+        workout_type TEXT, duration_minutes INTEGER, calories_burned INTEGER,
+        heart_rate_avg INTEGER, completion_status TEXT, notes TEXT)""")
+    connection.executemany(
+        "INSERT INTO user_workouts (user_id, workout_date, workout_type, duration_minutes, calories_burned, "
+        "heart_rate_avg, completion_status, notes) VALUES (26, ?, ?, ?, ?, ?, ?, ?)",
+        [((start + datetime.timedelta(days=i * days // workouts)).isoformat(), rng.choice(WORKOUT_TYPES),
+          rng.randint(20, 90), rng.randint(150, 800), rng.randint(110, 170),
+          rng.choice(["Completed", "Completed", "Completed", "Partial"]), rng.choice(NOTES))
+         for i in range(workouts)]
+    )
+    connection.commit()
+    connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workouts', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=730, help="Days the workouts are spread over")
+    parser.add_argument('--budget', type=int, default=1500, help="Token budget for the context")
+    parser.add_argument('--fetch-size', type=int, default=2000)
+    parser.add_argument('--llm-latency', type=float, default=0.3, help="Seconds per LLM call")
+    parser.add_argument('--prefill-ms-per-1k', type=float, default=20.0,
+                        help="Added LLM latency per 1,000 prompt tokens")
+    parser.add_argument('--context-window', type=int, default=128000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    count_tokens = token_counter()
+    builder = SQLContextBuilder(token_budget=args.budget, count_tokens=count_tokens)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'fitness.db')
+        create_database(path, args.workouts, args.days, args.seed)
+        connection = sqlite3.connect(path)
+        print(f"{args.workouts:,} workouts for one user over {args.days} days, token budget {args.budget:,}")
+
+        def raw_context():
+            cursor = connection.execute(QUERY)
+            return str(rows_as_dicts(cursor, cursor.fetchall()))
+
+        def built_context():
+            return builder.build(iter_guarded(connection, QUERY, 60000, args.workouts, args.fetch_size)).text
+
+        results = {}
+        for label, build in (("str(rows)", raw_context), ("context builder", built_context)):
+            start = time.perf_counter()
+            text = build()
+            fetch_time = time.perf_counter() - start
+            tokens = count_tokens(text)
+            llm = StubLLM(latency=args.llm_latency + tokens / 1000 * args.prefill_ms_per_1k / 1000)
+            start = time.perf_counter()
+            llm.invoke(text)
+            llm_time = time.perf_counter() - start
+            results[label] = tokens
+            note = "  (exceeds the context window)" if tokens > args.context_window else ""
+            print(f"{label:<16} {tokens:>10,} tokens {len(text):>12,} chars  fetch+build {fetch_time * 1000:8.1f} ms  "
+                  f"end-to-end {(fetch_time + llm_time) * 1000:8.1f} ms{note}")
+        print(f"prompt size reduction: {results['str(rows)'] / max(results['context builder'], 1):,.0f}x")
+
+        print("\nContext sent to the LLM:")
+        print(built_context())
+        connection.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Measure query latency with a connection per query versus a pooled connection.
+
+Runs offline against a SQLite file shaped like user_workouts, with an
+optional simulated connect latency standing in for the TCP/TLS/auth
+handshake of a PostgreSQL connection:
+
+    python benchmarks/bench_db_pool.py --queries 500 --connect-latency 0.01 --threads 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.data_loaders.db_pool import AsyncConnectionPool, ConnectionPool, guarded_query
+
+QUERY = "SELECT workout_type, SUM(calories_burned) FROM user_workouts WHERE user_id = ? GROUP BY workout_type"
+WORKOUT_TYPES = ["Running", "Cycling", "Swimming", "HIIT", "Strength Training", "Yoga"]
+
+def create_database(path: str, users: int, workouts_per_user: int, seed: int):
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path)
+    connection.execute("""CREATE TABLE user_workouts (
+        id INTEGER PRIMARY KEY, user_id INTEGER, workout_type TEXT,
+        duration_minutes INTEGER, calories_burned INTEGER, heart_rate_avg INTEGER)""")
+    connection.execute("CREATE INDEX idx_user_workouts_user_id ON user_workouts (user_id)")
+    connection.executemany(
+        "INSERT INTO user_workouts (user_id, workout_type, duration_minutes, calories_burned, heart_rate_avg) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [(user_id, rng.choice(WORKOUT_TYPES), rng.randint(20, 90), rng.randint(150, 800), rng.randint(110, 170))
+         for user_id in range(users) for _ in range(workouts_per_user)]
+    )
+    connection.commit()
+    connection.close()
+
+def percentiles(latencies):
+    ordered = sorted(latencies)
+    return (statistics.mean(ordered) * 1000, ordered[len(ordered) // 2] * 1000,
+            ordered[int(len(ordered) * 0.95)] * 1000)
+
+def report(label: str, latencies, elapsed: float):
+    mean, p50, p95 = percentiles(latencies)
+    print(f"{label:<30} mean {mean:7.2f} ms  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  "
+          f"({len(latencies) / elapsed:,.0f} queries/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--workouts-per-user', type=int, default=50)
+    parser.add_argument('--connect-latency', type=float, default=0.005,
+                        help="Seconds added to every new connection")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--pool-size', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    user_ids = [rng.randrange(args.users) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'fitness.db')
+        create_database(path, args.users, args.workouts_per_user, args.seed)
+
+        def connect():
+            time.sleep(args.connect_latency)
+            return sqlite3.connect(path, check_same_thread=False)
+
+        def query_with_new_connection(user_id):
+            start = time.perf_counter()
+            connection = connect()
+            try:
+                connection.execute(QUERY, (user_id,)).fetchall()
+            finally:
+                connection.close()
+            return time.perf_counter() - start
+
+        pool = ConnectionPool(connect, max_size=args.pool_size)
+
+        def query_with_pool(user_id):
+            start = time.perf_counter()
+            pool.fetch(QUERY, (user_id,))
+            return time.perf_counter() - start
+
+        print(f"{args.queries} queries, {args.users * args.workouts_per_user:,} workout rows, "
+              f"connect latency {args.connect_latency * 1000:.1f} ms, pool size {args.pool_size}")
+
+        for label, run in (("connect per query", query_with_new_connection), ("pooled", query_with_pool)):
+            start = time.perf_counter()
+            latencies = [run(user_id) for user_id in user_ids]
+            report(label, latencies, time.perf_counter() - start)
+
+        for label, run in (("connect per query", query_with_new_connection), ("pooled", query_with_pool)):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.threads) as executor:
+                latencies = list(executor.map(run, user_ids))
+            report(f"{label}, {args.threads} threads", latencies, time.perf_counter() - start)
+
+        async_pool = AsyncConnectionPool(pool)
+
+        async def timed_fetch(user_id):
+            start = time.perf_counter()
+            await async_pool.fetch(QUERY, (user_id,))
+            return time.perf_counter() - start
+
+        async def run_async():
+            return await asyncio.gather(*(timed_fetch(user_id) for user_id in user_ids))
+
+        start = time.perf_counter()
+        latencies = asyncio.run(run_async())
+        report("pooled, asyncio", latencies, time.perf_counter() - start)
+        async_pool.close()
+
+        with pool.connection() as connection:
+            start = time.perf_counter()
+            rows, truncated = guarded_query(connection, "SELECT * FROM user_workouts", 5000, 500)
+            print(f"guarded full scan: {len(rows)} rows, truncated={truncated}, "
+                  f"{(time.perf_counter() - start) * 1000:.2f} ms")
+            runaway = "SELECT COUNT(*) FROM user_workouts a, user_workouts b"
+            start = time.perf_counter()
+            try:
+                guarded_query(connection, runaway, 100, 500)
+                print("guarded cross join: finished")
+            except sqlite3.OperationalError as e:
+                print(f"guarded cross join: aborted after {(time.perf_counter() - start) * 1000:.0f} ms ({e})")
+
+        print(f"pool stats: {pool.stats}")
+        pool.close()
+
+if __name__ == '__main__':
+    main()
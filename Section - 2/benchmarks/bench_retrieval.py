@@ -0,0 +1,112 @@
+"""Compare dense, BM25 and hybrid retrieval latency and recall on data/documents.
+
+Chunks the documents the way ingestion does, builds a FAISS index and the
+BM25 index in a temporary directory, and queries each with word windows
+sampled from random chunks; a query's relevant chunk is the one it was
+sampled from. Uses the stub embedder unless --local is given:
+
+    python benchmarks/bench_retrieval.py --queries 200 --k 4
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_community.vectorstores import FAISS
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from src.agents.retrieval import HybridRetriever, load_faiss_mmap
+from src.data_loaders.ingestion import DocumentIngestor, extract_pages
+from src.utils.stubs import StubEmbeddings
+
+def load_chunks(documents_path: str):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    texts, metadatas = [], []
+    for rel, path in sorted(DocumentIngestor(None, documents_path=documents_path).scan().items()):
+        for page_number, page in enumerate(extract_pages(path), start=1):
+            for chunk in splitter.split_text(page):
+                texts.append(chunk)
+                metadatas.append({"source": rel, "page": page_number})
+    return texts, metadatas
+
+def sample_queries(texts, metadatas, count: int, words: int, rng: random.Random):
+    queries = []
+    candidates = [i for i, text in enumerate(texts) if len(text.split()) > words]
+    for _ in range(count):
+        row = rng.choice(candidates)
+        tokens = texts[row].split()
+        start = rng.randrange(len(tokens) - words)
+        queries.append((" ".join(tokens[start:start + words]), row, metadatas[row]["source"]))
+    return queries
+
+def evaluate(label: str, search, queries, k: int):
+    latencies, hits, reciprocal_ranks = [], 0, []
+    for query, row, source in queries:
+        start = time.perf_counter()
+        rows = search(query, source)[:k]
+        latencies.append(time.perf_counter() - start)
+        rank = rows.index(row) + 1 if row in rows else None
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    latencies.sort()
+    print(f"{label:<22} recall@{k} {hits / len(queries):6.1%}  MRR {statistics.mean(reciprocal_ranks):.3f}  "
+          f"mean {statistics.mean(latencies) * 1000:6.2f} ms  p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', default=os.path.join(os.path.dirname(__file__), '..', 'data', 'documents'))
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--query-words', type=int, default=8)
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--fetch-k', type=int, default=20)
+    parser.add_argument('--local', action='store_true', help="Use the local sentence-transformers embedder")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.local:
+        from src.utils.embeddings import LocalEmbeddings
+        embeddings = LocalEmbeddings()
+    else:
+        embeddings = StubEmbeddings()
+
+    texts, metadatas = load_chunks(args.documents)
+    queries = sample_queries(texts, metadatas, args.queries, args.query_words, random.Random(args.seed))
+    print(f"{len(texts)} chunks from {len({m['source'] for m in metadatas})} documents, "
+          f"{len(queries)} queries of {args.query_words} words")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vectors = embeddings.embed_documents(texts)
+        vector_store = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas)
+        vector_store.save_local(tmp_dir)
+        bm25_dir = os.path.join(tmp_dir, 'bm25')
+        start = time.perf_counter()
+        HybridRetriever.load_or_build(vector_store, embeddings, bm25_dir)
+        print(f"BM25 build: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        FAISS.load_local(tmp_dir, embeddings)
+        print(f"FAISS load into memory: {(time.perf_counter() - start) * 1000:.1f} ms")
+        start = time.perf_counter()
+        mapped_store = load_faiss_mmap(tmp_dir, embeddings)
+        retriever = HybridRetriever.load_or_build(mapped_store, embeddings, bm25_dir,
+                                                  k=args.k, fetch_k=args.fetch_k)
+        print(f"FAISS + BM25 memory-mapped load: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        row_of = {text: row for row, text in reversed(list(enumerate(texts)))}
+
+        def rows(documents):
+            return [row_of[doc.page_content] for doc in documents]
+
+        evaluate("dense", lambda query, _: retriever.dense_search(query, args.k), queries, args.k)
+        evaluate("bm25", lambda query, _: retriever.sparse_search(query, args.k), queries, args.k)
+        evaluate("hybrid (RRF)", lambda query, _: rows(retriever.search(query)), queries, args.k)
+        evaluate("hybrid, source filter",
+                 lambda query, source: rows(retriever.search(query, filter={"source": source})), queries, args.k)
+
+if __name__ == '__main__':
+    main()
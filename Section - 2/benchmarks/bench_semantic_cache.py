@@ -0,0 +1,123 @@
+"""Measure the semantic response cache's hit rate and saved latency offline.
+
+Replays a skewed mix of paraphrased fitness questions, each from a new
+session, through FitnessChatbot.stream_response with and without the
+cache, using the local stub LLM and stub embedder. PostgreSQL is replaced:
+the user's data version is fixed, and fetching it makes only the
+SQL-generation LLM call an untemplated question makes:
+
+    python benchmarks/bench_semantic_cache.py --requests 500 --llm-latency 0.05
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from langchain_community.vectorstores import FAISS
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from src.agents.chatbot import FitnessChatbot
+from src.agents.resources import DEFAULT_KNOWLEDGE, ChatbotResources
+from src.agents.retrieval import HybridRetriever
+from src.agents.router import QueryRouter
+from src.data_loaders.sql_templates import SQLTemplateCache
+from src.utils.semantic_cache import SemanticCache
+from src.utils.stubs import StubEmbeddings, StubLLM
+
+# Paraphrases of each question
+QUESTIONS = [
+    ["What are some nutrition tips?", "what are some nutrition tips", "Nutrition tips?"],
+    ["How do I improve my squat technique?", "how do i improve my squat technique??",
+     "How do I improve squat technique"],
+    ["What are the benefits of HIIT?", "what are the benefits of hiit", "What are the benefits of HIIT workouts?"],
+    ["Can you recommend a post-workout meal?", "can you recommend a post workout meal",
+     "Recommend a post-workout meal"],
+    ["What is the best diet for fat loss?", "what is the best diet for fat loss?",
+     "What's the best diet for fat loss?"],
+    ["How many calories did I burn last week?", "how many calories did i burn last week",
+     "How many calories did I burn last week?!"],
+    ["Show my workout history", "show my workout history.", "Show me my workout history"],
+    ["What was my average heart rate during runs?", "what was my average heart rate during runs",
+     "What was my average heart rate on runs?"],
+]
+
+class OfflineChatbot(FitnessChatbot):
+    """FitnessChatbot with PostgreSQL replaced, for runs without a database."""
+
+    def _data_freshness(self, use_vector_store: bool, use_user_data: bool):
+        return ("documents" if use_vector_store else None, "workouts" if use_user_data else None)
+
+    def _fetch_user_data(self, user_question: str):
+        if not self.sql_templates.match(user_question):
+            self._generate_sql_query(user_question)
+        return None
+
+def build_resources(llm, embeddings, bm25_dir: str, cache: bool, threshold: float) -> ChatbotResources:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=50)
+    vector_store = FAISS.from_texts(splitter.split_text(DEFAULT_KNOWLEDGE), embeddings)
+    return ChatbotResources(
+        llm=llm,
+        embeddings=embeddings,
+        vector_store=vector_store,
+        db_pool=None,
+        sql_templates=SQLTemplateCache(),
+        retriever=HybridRetriever.load_or_build(vector_store, embeddings, bm25_dir),
+        router=QueryRouter(),
+        response_cache=SemanticCache(embeddings.embed_query, threshold=threshold) if cache else None,
+        executor=ThreadPoolExecutor(max_workers=4)
+    )
+
+def replay(resources: ChatbotResources, workload):
+    """Ask each question from a new session; returns elapsed seconds and per-response metrics."""
+    metrics = []
+    start = time.perf_counter()
+    for question in workload:
+        chatbot = OfflineChatbot(resources=resources)
+        "".join(chatbot.stream_response(question))
+        metrics.extend(chatbot.metrics)
+    return time.perf_counter() - start, metrics
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--llm-latency', type=float, default=0.02,
+                        help="Seconds the stub LLM takes per call")
+    parser.add_argument('--threshold', type=float, default=0.92)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    # The chatbot logs every step of every request at INFO
+    logging.disable(logging.INFO)
+
+    rng = random.Random(args.seed)
+    weights = [1 / (rank + 1) for rank in range(len(QUESTIONS))]
+    workload = [rng.choice(rng.choices(QUESTIONS, weights)[0]) for _ in range(args.requests)]
+    print(f"{args.requests} requests, {len(QUESTIONS)} topics, stub LLM latency {args.llm_latency * 1000:.0f} ms")
+
+    embeddings = StubEmbeddings()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label, cache in (("without cache", False), ("with cache", True)):
+            llm = StubLLM(latency=args.llm_latency)
+            resources = build_resources(llm, embeddings, os.path.join(tmp_dir, label), cache, args.threshold)
+            elapsed, metrics = replay(resources, workload)
+            first_tokens = [m.time_to_first_token * 1000 for m in metrics]
+            print(f"{label:<14} {elapsed:6.2f}s, {llm.calls} LLM calls, "
+                  f"time to first token mean {statistics.mean(first_tokens):6.2f} ms")
+            if resources.response_cache is not None:
+                stats = resources.response_cache.stats()
+                hits = [m.total_time * 1000 for m in metrics if m.cached]
+                misses = [m.total_time * 1000 for m in metrics if not m.cached]
+                print(f"hit rate: {stats['hit_rate']:.1%} ({stats['hits']} hits, {stats['misses']} misses, "
+                      f"{stats['entries']} entries)")
+                print(f"response time: hits {statistics.mean(hits):.2f} ms, misses {statistics.mean(misses):.2f} ms; "
+                      f"latency saved by hits: {stats['saved_seconds']:.2f}s")
+            resources.executor.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,11 @@ class PostgresConfig:
     password: str = os.getenv("DB_PWD", "")
     database: str = os.getenv("DB_NAME", "fitness_db")
     port: int = int(os.getenv("DB_PORT", "5432"))
+    pool_max_size: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    pool_health_check_interval: float = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+    statement_timeout_ms: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+    max_rows: int = int(os.getenv("DB_MAX_ROWS", "100000"))
+    fetch_size: int = int(os.getenv("DB_FETCH_SIZE", "2000"))
 
 @dataclass
 class OpenAIConfig:
@@ -23,6 +28,30 @@ class OpenAIConfig:
 class AppConfig:
     debug: bool = os.getenv("DEBUG", "False").lower() == "true"
     vector_store_path: str = os.getenv("VECTOR_STORE_PATH", "./data/vector_store")
+    documents_path: str = os.getenv("DOCUMENTS_PATH", "./data/documents")
+    ingest_on_startup: bool = os.getenv("INGEST_ON_STARTUP", "True").lower() == "true"
+    embedding_batch_size: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    embedding_provider: str = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+    local_embedding_model: str = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+    embedding_cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", "./data/embedding_cache")
+    ingestion_workers: int = int(os.getenv("INGESTION_WORKERS", "0"))
+    pdf_pages_per_task: int = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+    vector_store_mmap: bool = os.getenv("VECTOR_STORE_MMAP", "True").lower() == "true"
+    retrieval_k: int = int(os.getenv("RETRIEVAL_K", "4"))
+    retrieval_fetch_k: int = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+    retrieval_rrf_k: int = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+    semantic_cache_enabled: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "True").lower() == "true"
+    semantic_cache_threshold: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    semantic_cache_ttl: float = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+    semantic_cache_max_entries: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+    memory_max_tokens: int = int(os.getenv("MEMORY_MAX_TOKENS", "2000"))
+    memory_summary_tokens: int = int(os.getenv("MEMORY_SUMMARY_TOKENS", "400"))
+    memory_facts_tokens: int = int(os.getenv("MEMORY_FACTS_TOKENS", "600"))
+    memory_summary_workers: int = int(os.getenv("MEMORY_SUMMARY_WORKERS", "2"))
+    sql_context_max_tokens: int = int(os.getenv("SQL_CONTEXT_MAX_TOKENS", "1500"))
+    sql_context_sample_rows: int = int(os.getenv("SQL_CONTEXT_SAMPLE_ROWS", "20"))
+    history_page_size: int = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
 
 # Create config instances
 postgres_config = PostgresConfig()
@@ -1,15 +1,17 @@
-from typing import List, Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain.chains.conversational_retrieval.base import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import psycopg2
 from psycopg2.extras import DictCursor
-from config.config import postgres_config, openai_config, app_config
+from config.config import postgres_config, app_config
+from src.agents.context_builder import SQLContext, SQLContextBuilder
+from src.agents.memory import ConversationMemory
+from src.agents.resources import ChatbotResources, build_resources, get_resources
+from src.data_loaders.sql_templates import PreparedStatements
+from src.data_loaders.db_pool import PoolTimeout, iter_guarded
+import hashlib
 import os
+import time
 import logging
 
 logging.basicConfig(
@@ -18,9 +20,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+ERROR_RESPONSE = "I apologize, but I encountered an error while processing your request. Please try again."
+
+@dataclass
+class ResponseMetrics:
+    """Timings of one response, in seconds from the start of the request."""
+    question: str
+    cached: bool
+    time_to_first_token: float
+    total_time: float
+    chunks: int
+
 class FitnessChatbot:
-    def __init__(self):
-        """Initialize the Fitness Chatbot with necessary components."""
+    def __init__(self, llm=None, embeddings=None, resources: ChatbotResources = None):
+        """Initialize a chatbot session.
+
+        Models, vector store, connection pool and caches come from the
+        process-wide resources, so a new session only sets up its own
+        memory. Passing llm or embeddings (e.g. the local stand-ins in
+        src.utils.stubs for offline runs) builds separate resources instead.
+        """
         logger.info("Initializing Fitness Chatbot...")
         self.default_user_id = 26
         self.default_user_name = "Fahad"
@@ -49,136 +68,120 @@ class FitnessChatbot:
         - heart_rate_avg (integer): Average heart rate
         """
         
-        # Initialize OpenAI components
-        logger.info("Setting up OpenAI components...")
-        self.llm = ChatOpenAI(
-            temperature=openai_config.temperature,
-            model_name=openai_config.model_name
+        if resources is None:
+            resources = build_resources(llm, embeddings) if llm or embeddings else get_resources()
+        self.resources = resources
+        self.llm = resources.llm
+        self.embeddings = resources.embeddings
+        self.vector_store = resources.vector_store
+        self.retriever = resources.retriever
+        self.router = resources.router
+        self.db_pool = resources.db_pool
+        self.sql_templates = resources.sql_templates
+        self.response_cache = resources.response_cache
+        self.executor = resources.executor
+        self.metrics = deque(maxlen=100)
+        self.memory = ConversationMemory(
+            self._summarize,
+            max_tokens=app_config.memory_max_tokens,
+            summary_tokens=app_config.memory_summary_tokens,
+            facts_tokens=app_config.memory_facts_tokens,
+            executor=resources.summary_executor
         )
-        self.embeddings = OpenAIEmbeddings()
-        self.vector_store = self._initialize_vector_store()
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            output_key="answer",
-            return_messages=True
-        )
-        self.qa_chain = self._create_qa_chain()
-        self.postgres_connection = self._setup_postgres_connection()
-
-    def _initialize_vector_store(self) -> FAISS:
-        """Initialize or load the vector store with document embeddings."""
-        logger.info("Initializing vector store...")
-        if os.path.exists(app_config.vector_store_path):
-            try:
-                logger.info("Loading existing vector store from disk...")
-                return FAISS.load_local(
-                    app_config.vector_store_path,
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-            except Exception as e:
-                logger.warning(f"Error loading existing vector store: {e}. Creating new one...")
-                if os.path.exists(app_config.vector_store_path):
-                    os.remove(app_config.vector_store_path)
-        
-        # Create default document if no vector store exists
-        default_text = """
-        Welcome to Kahunas Fitness! Here's some general fitness information:
-        
-        1. Workout Types and Benefits:
-        - Cardio: Improves heart health, burns calories, increases endurance
-        - Strength Training: Builds muscle, boosts metabolism, improves bone density
-        - HIIT: Efficient calorie burning, improves cardiovascular fitness
-        - Yoga: Enhances flexibility, reduces stress, improves balance
-        
-        2. Exercise Guidelines:
-        - Warm up properly before exercising
-        - Stay hydrated during workouts
-        - Listen to your body and avoid overtraining
-        - Mix different types of exercises for balanced fitness
-        
-        3. Nutrition Tips:
-        - Eat balanced meals with protein, carbs, and healthy fats
-        - Stay hydrated throughout the day
-        - Time your meals around workouts
-        - Consider post-workout nutrition for recovery
-        
-        4. Recovery and Rest:
-        - Get adequate sleep for muscle recovery
-        - Take rest days between intense workouts
-        - Use proper form to prevent injuries
-        - Stretch regularly for flexibility
-        """
-        
-        documents = [Document(page_content=default_text, metadata={"source": "fitness_guide"})]
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
+        self.context_builder = SQLContextBuilder(
+            token_budget=app_config.sql_context_max_tokens,
+            sample_rows=app_config.sql_context_sample_rows,
+            count_tokens=self.memory.count_tokens
         )
-        texts = text_splitter.split_documents(documents)
-        
-        # Create and save vector store
-        logger.info("Creating new vector store...")
-        vector_store = FAISS.from_documents(texts, self.embeddings)
-        os.makedirs(os.path.dirname(app_config.vector_store_path), exist_ok=True)
-        vector_store.save_local(app_config.vector_store_path)
-        logger.info("Vector store saved successfully")
-        return vector_store
-
-    def _setup_postgres_connection(self):
-        """Set up PostgreSQL database connection."""
-        logger.info("Setting up PostgreSQL connection...")
-        try:
-            conn = psycopg2.connect(
-                host=postgres_config.host,
-                user=postgres_config.user,
-                password=postgres_config.password,
-                dbname=postgres_config.database,
-                port=postgres_config.port
-            )
-            logger.info("Successfully connected to PostgreSQL database")
-            return conn
-        except psycopg2.Error as err:
-            logger.error(f"Error connecting to PostgreSQL: {err}")
-            return None
 
     def _query_postgres(self, query: str, params: tuple = None) -> List[Dict]:
         """Query PostgreSQL database for relevant information."""
         logger.info(f"Executing PostgreSQL query: {query}")
-        if not self.postgres_connection:
-            logger.info("Reconnecting to PostgreSQL...")
-            self.postgres_connection = self._setup_postgres_connection()
-            
-        if not self.postgres_connection:
-            logger.error("No PostgreSQL connection available")
-            return []
-        
         try:
-            cursor = self.postgres_connection.cursor(cursor_factory=DictCursor)
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            results = cursor.fetchall()
-            cursor.close()
+            with self.db_pool.connection() as conn:
+                cursor = conn.cursor(cursor_factory=DictCursor)
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                results = cursor.fetchall()
+                cursor.close()
             logger.info(f"Query returned {len(results)} results")
             return [dict(row) for row in results]
-        except psycopg2.Error as err:
+        except (psycopg2.Error, PoolTimeout) as err:
             logger.error(f"Error querying PostgreSQL: {err}")
             return []
 
-    def _create_qa_chain(self) -> ConversationalRetrievalChain:
-        """Create the question-answering chain."""
-        return ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
-            retriever=self.vector_store.as_retriever(
-                search_kwargs={"k": 3}
-            ),
-            memory=self.memory,
-            return_source_documents=True,
-            output_key="answer",
-            return_generated_question=True
-        )
+    def _fetch_user_data(self, user_question: str) -> Optional[SQLContext]:
+        """Fetch the data a personal-data question needs, fitted to the prompt's budget.
+
+        Recurring questions run a cached SQL template as a prepared
+        statement; only other questions ask the LLM for SQL, which runs with
+        a statement timeout and row limit and is promoted to a template once
+        it has run successfully. Promoted templates keep that timeout and
+        limit. Generated SQL is read in chunks from a server-side cursor,
+        and results too large for the prompt are summarized by the context
+        builder.
+        """
+        template = self.sql_templates.match(user_question)
+        sql_query = None
+        if not template:
+            sql_query = self._generate_sql_query(user_question)
+            if not sql_query:
+                return None
+        try:
+            with self.db_pool.connection() as conn:
+                if template:
+                    logger.info(f"Using SQL template: {template.name}")
+                    # Prepared statements belong to the connection they were made on
+                    prepared = conn.state.setdefault("prepared_statements", PreparedStatements(conn))
+                    values = {"user_id": self.default_user_id}
+                    if template.guarded:
+                        # Promoted from generated SQL, so it keeps the guards it first ran with
+                        context = self.context_builder.build(
+                            prepared.iter_execute(
+                                template, values,
+                                timeout_ms=postgres_config.statement_timeout_ms,
+                                max_rows=postgres_config.max_rows,
+                                chunk_size=postgres_config.fetch_size
+                            ),
+                            max_rows=postgres_config.max_rows
+                        )
+                    else:
+                        context = self.context_builder.build([prepared.execute(template, values)])
+                else:
+                    logger.info(f"Executing generated SQL query: {sql_query}")
+                    context = self.context_builder.build(
+                        iter_guarded(
+                            conn, sql_query,
+                            timeout_ms=postgres_config.statement_timeout_ms,
+                            max_rows=postgres_config.max_rows,
+                            chunk_size=postgres_config.fetch_size
+                        ),
+                        max_rows=postgres_config.max_rows
+                    )
+                    self.sql_templates.promote(user_question, sql_query, self.default_user_id)
+            logger.info(f"Query returned {context.rows} rows, {context.tokens} tokens of context"
+                        + (" (summarized)" if context.summarized else ""))
+            self.memory.add_context(template.name if template else user_question, context.text)
+            return context
+        except (psycopg2.Error, PoolTimeout) as err:
+            logger.error(f"Error querying PostgreSQL: {err}")
+            return None
+
+    def _summarize(self, summary: str, transcript: str) -> str:
+        """Fold older conversation turns into the running summary."""
+        prompt = f"""Summarize this conversation between a fitness coach and {self.default_user_name} in at most 150 words.
+        Keep goals, preferences, injuries, plans and any numbers mentioned; drop greetings and small talk.
+
+        Summary so far:
+        {summary or "(none)"}
+
+        Newer messages:
+        {transcript}
+
+        Updated summary:"""
+        return self.llm.invoke(prompt).content
 
     def _generate_sql_query(self, user_question: str) -> str:
         """Generate SQL query based on user's question."""
@@ -216,33 +219,45 @@ class FitnessChatbot:
             logger.error(f"Error generating SQL query: {e}")
             return ""
 
-    def _should_use_vector_store(self, user_input: str) -> bool:
-        """Determine if the question requires vector store lookup."""
-        general_keywords = [
-            "guide", "how to", "technique", "form", "explain",
-            "what is", "I want to", "How do I", "benefits", "recommend", "advice", "tips",
-            "best practices", "nutrition", "diet", "meal", "food"
-        ]
-        return any(keyword in user_input.lower() for keyword in general_keywords)
+    def _plan(self, user_input: str) -> Tuple[bool, bool]:
+        """Whether a question needs the knowledge base, and whether it needs the user's data."""
+        return self.router.route(user_input)
 
-    def get_response(self, user_input: str) -> str:
-        """Generate a response to the user's input."""
-        try:
-            logger.info(f"Processing user input: {user_input}")
-            
-            context_data = ""
-            use_vector_store = self._should_use_vector_store(user_input)
-            
-            # For personal data queries, get data from database
-            if not use_vector_store:
-                sql_query = self._generate_sql_query(user_input)
-                if sql_query:
-                    results = self._query_postgres(sql_query)
-                    if results:
-                        context_data = "Your Fitness Data:\n" + str(results)
-
-            # Prepare prompt for GPT-4
-            prompt = f"""You are a knowledgeable and engaging fitness coach for Kahunas. 
+    def _data_freshness(self, use_vector_store: bool, use_user_data: bool):
+        """Version of the data an answer draws on, or None if it is unknown.
+
+        Knowledge-base answers depend on the vector store; personal-data
+        answers on the user's workout rows, summarized by count and latest id.
+        """
+        parts = []
+        if use_vector_store:
+            index_path = os.path.join(app_config.vector_store_path, "index.faiss")
+            parts.append(("documents", os.path.getmtime(index_path) if os.path.exists(index_path) else 0))
+        if use_user_data:
+            rows = self._query_postgres(
+                "SELECT COUNT(*) AS count, MAX(id) AS max_id FROM user_workouts WHERE user_id = %s",
+                (self.default_user_id,)
+            )
+            if not rows:
+                return None
+            parts.append(("workouts", rows[0]["count"], rows[0]["max_id"]))
+        return tuple(parts)
+
+    def _conversation_digest(self) -> Optional[str]:
+        """Digest of the conversation context, or None at the start of a conversation."""
+        conversation = self.memory.context()
+        return hashlib.sha1(conversation.encode("utf-8")).hexdigest()[:16] if conversation else None
+
+    def _retrieve(self, user_input: str, filter: Dict[str, Any] = None) -> List[str]:
+        """Knowledge-base passages relevant to the question, optionally filtered by metadata."""
+        logger.info("Using hybrid retrieval for general fitness knowledge")
+        return [doc.page_content for doc in self.retriever.search(user_input, filter=filter)]
+
+    def _build_prompt(self, user_input: str, user_data: Optional[SQLContext], documents: List[str]) -> str:
+        context_data = "Your Fitness Data:\n" + user_data.text if user_data and user_data.text else ""
+
+        # Prepare prompt for GPT-4
+        prompt = f"""You are a knowledgeable and engaging fitness coach for Kahunas. 
             
                     User Question: {user_input}
 
@@ -254,26 +269,102 @@ class FitnessChatbot:
                     Keep your responses concise, do not give too wordy responses. Please do provide insights and suggestions of what data you've fetched if you have the data. If you have the data of user, don't assume that they've provided the data, rather frame it as that you've fetched the data and analyzed it or whatever makes sense based on the conversation and user input.
                 """
 
-            # Use vector store for general fitness knowledge
-            if use_vector_store:
-                logger.info("Using vector store for general fitness knowledge")
-                docs = self.vector_store.similarity_search(user_input)
-                if docs:
-                    prompt += "\n\nAdditional fitness information:\n"
-                    prompt += "\n".join(doc.page_content for doc in docs)
+        conversation = self.memory.context()
+        if conversation:
+            prompt += "\n\nConversation so far (use it for follow-up questions):\n" + conversation
 
-            # Generate response
-            logger.info("Generating final response...")
-            response = self.llm.invoke(prompt)
-            return response.content.strip()
+        # Use vector store for general fitness knowledge
+        if documents:
+            prompt += "\n\nAdditional fitness information:\n"
+            prompt += "\n".join(documents)
+        return prompt
 
+    def get_response(self, user_input: str) -> str:
+        """Generate a response to the user's input, waiting for all of it."""
+        return "".join(self.stream_response(user_input)).strip()
+
+    def stream_response(self, user_input: str) -> Iterator[str]:
+        """Yield the response to the user's input as it is generated.
+
+        Answers are served whole from the semantic cache when a similar
+        question was answered for the same user from the same data. Only on
+        a miss do retrieval and fetching the user's data start, running
+        concurrently, so a hit costs no retrieval or pooled connection for
+        the user's data; then the LLM's tokens are yielded as they arrive.
+        Timings of each response are kept in self.metrics.
+        """
+        start = time.perf_counter()
+        first_token = None
+        chunks = []
+        cached = False
+        try:
+            logger.info(f"Processing user input: {user_input}")
+            use_vector_store, use_user_data = self._plan(user_input)
+
+            freshness = None
+            embedding = None
+            if self.response_cache is not None:
+                freshness = self._data_freshness(use_vector_store, use_user_data)
+                if freshness is None:
+                    logger.info("Data freshness unknown, bypassing semantic cache")
+                else:
+                    # Follow-ups depend on the conversation, so answers are shared only between identical ones
+                    freshness = (freshness, self._conversation_digest())
+                    answer, embedding = self.response_cache.search(user_input, self.default_user_id, freshness)
+                    if answer is not None:
+                        logger.info("Semantic cache hit")
+                        cached = True
+                        first_token = time.perf_counter()
+                        chunks.append(answer)
+                        yield answer
+                        self._remember(user_input, answer)
+                        return
+
+            documents = self.executor.submit(self._retrieve, user_input) if use_vector_store else None
+            user_data = self.executor.submit(self._fetch_user_data, user_input) if use_user_data else None
+            prompt = self._build_prompt(
+                user_input,
+                user_data.result() if user_data else None,
+                documents.result() if documents else []
+            )
+
+            logger.info("Streaming final response...")
+            for chunk in self.llm.stream(prompt):
+                if not chunk.content:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter()
+                chunks.append(chunk.content)
+                yield chunk.content
+
+            answer = "".join(chunks).strip()
+            if freshness is not None and answer:
+                self.response_cache.store(user_input, answer, self.default_user_id, freshness,
+                                          latency=time.perf_counter() - start, embedding=embedding)
+            self._remember(user_input, answer)
         except Exception as e:
             logger.error(f"Error generating response: {e}", exc_info=True)
-            return "I apologize, but I encountered an error while processing your request. Please try again."
-
-    def __del__(self):
-        """Cleanup when the chatbot is destroyed."""
-        logger.info("Cleaning up chatbot resources...")
-        if hasattr(self, 'postgres_connection') and self.postgres_connection:
-            self.postgres_connection.close()
-            logger.info("PostgreSQL connection closed") 
\ No newline at end of file
+            if not chunks:
+                first_token = time.perf_counter()
+                chunks.append(ERROR_RESPONSE)
+                yield ERROR_RESPONSE
+        finally:
+            self._record_metrics(user_input, cached, start, first_token, len(chunks))
+
+    def _remember(self, user_input: str, answer: str):
+        """Add a turn to memory before the next question; summarizing it runs in the background."""
+        self.memory.add_turn(user_input, answer)
+
+    def _record_metrics(self, question: str, cached: bool, start: float,
+                        first_token: Optional[float], chunks: int):
+        end = time.perf_counter()
+        metrics = ResponseMetrics(
+            question=question,
+            cached=cached,
+            time_to_first_token=(first_token or end) - start,
+            total_time=end - start,
+            chunks=chunks
+        )
+        self.metrics.append(metrics)
+        logger.info(f"Response {'served from cache' if cached else 'generated'}: "
+                    f"first token after {metrics.time_to_first_token:.2f}s, total {metrics.total_time:.2f}s")
@@ -0,0 +1,272 @@
+import datetime
+import decimal
+import re
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from src.agents.memory import compact_rows, token_counter
+
+logger = logging.getLogger(__name__)
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+@dataclass
+class SQLContext:
+    """Query results rendered for the prompt."""
+    text: str
+    rows: int
+    tokens: int
+    summarized: bool
+    truncated: bool
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool)
+
+def _is_date(value) -> bool:
+    return isinstance(value, (datetime.date, datetime.datetime)) or \
+        (isinstance(value, str) and bool(_ISO_DATE.match(value)))
+
+def _month(value) -> str:
+    return value.strftime("%Y-%m") if isinstance(value, (datetime.date, datetime.datetime)) else value[:7]
+
+def _day(value) -> str:
+    return value.strftime("%Y-%m-%d") if isinstance(value, (datetime.date, datetime.datetime)) else value[:10]
+
+def _number(value: float) -> str:
+    text = f"{value:,.1f}"
+    return text[:-2] if text.endswith(".0") else text
+
+class ResultSummary:
+    """Running aggregates of a result set, updated one chunk at a time.
+
+    Keeps the first sample_rows rows verbatim and, for the rest, only
+    counts: the total, min, max and sum of each numeric column, per-value
+    counts and means for low-cardinality text columns (e.g. workout_type),
+    and per-month counts and means over the first date column. Memory stays
+    bounded however many rows are read. Id columns are not aggregated, and
+    text columns with more than max_categories distinct values (e.g. notes)
+    are not grouped by.
+    """
+
+    def __init__(self, sample_rows: int = 20, max_categories: int = 30):
+        self.sample_rows = sample_rows
+        self.max_categories = max_categories
+        self.rows = 0
+        self.samples: List[Dict] = []
+        self.columns: List[str] = []
+        self.numeric: Dict[str, List[float]] = {}
+        self.categories: Dict[str, Dict[str, Dict]] = {}
+        self.date_column: Optional[str] = None
+        self.first_date = None
+        self.last_date = None
+        self.months: Dict[str, Dict] = {}
+        self._typed: set = set()
+
+    def _classify(self, row: Dict):
+        """Decide each column's kind from its first non-null value."""
+        for column, value in row.items():
+            if column in self._typed or value is None:
+                continue
+            self._typed.add(column)
+            if column == "id" or column.endswith("_id"):
+                continue
+            if _is_number(value):
+                self.numeric[column] = [0, 0.0, float("inf"), float("-inf")]
+            elif _is_date(value):
+                self.date_column = self.date_column or column
+            elif isinstance(value, str):
+                self.categories[column] = {}
+
+    def _bucket(self, buckets: Dict[str, Dict], key: str) -> Dict:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {"rows": 0, "sums": {}, "counts": {}}
+        return bucket
+
+    def _add_to(self, bucket: Dict, row: Dict):
+        bucket["rows"] += 1
+        sums, counts = bucket["sums"], bucket["counts"]
+        for column in self.numeric:
+            value = row.get(column)
+            if value is not None:
+                sums[column] = sums.get(column, 0.0) + float(value)
+                counts[column] = counts.get(column, 0) + 1
+
+    def add(self, rows: List[Dict]):
+        if not rows:
+            return
+        if not self.columns:
+            self.columns = list(rows[0])
+        for row in rows:
+            if len(self._typed) < len(self.columns):
+                self._classify(row)
+            self.rows += 1
+            if len(self.samples) < self.sample_rows:
+                self.samples.append(row)
+            for column, stats in self.numeric.items():
+                value = row.get(column)
+                if value is None:
+                    continue
+                value = float(value)
+                stats[0] += 1
+                stats[1] += value
+                if value < stats[2]:
+                    stats[2] = value
+                if value > stats[3]:
+                    stats[3] = value
+            for column in list(self.categories):
+                value = row.get(column)
+                if not value:
+                    continue
+                buckets = self.categories[column]
+                if value not in buckets and len(buckets) >= self.max_categories:
+                    del self.categories[column]
+                    continue
+                self._add_to(self._bucket(buckets, value), row)
+            if self.date_column is not None:
+                value = row.get(self.date_column)
+                if value is not None:
+                    day = _day(value)
+                    if self.first_date is None or day < self.first_date:
+                        self.first_date = day
+                    if self.last_date is None or day > self.last_date:
+                        self.last_date = day
+                    self._add_to(self._bucket(self.months, _month(value)), row)
+
+    def _means(self, bucket: Dict) -> str:
+        return ", ".join(f"avg {column} {_number(bucket['sums'][column] / bucket['counts'][column])}"
+                         for column in self.numeric if bucket["counts"].get(column))
+
+    def totals_lines(self) -> List[str]:
+        lines = []
+        for column, (count, total, low, high) in self.numeric.items():
+            if count:
+                lines.append(f"{column}: total {_number(total)}, avg {_number(total / count)}, "
+                             f"min {_number(low)}, max {_number(high)}")
+        return lines
+
+    def category_lines(self, column: str) -> List[str]:
+        buckets = self.categories[column]
+        ordered = sorted(buckets.items(), key=lambda item: (-item[1]["rows"], item[0]))
+        return [f"{value}: {bucket['rows']:,} rows" + (f", {self._means(bucket)}" if self._means(bucket) else "")
+                for value, bucket in ordered]
+
+    def trend_lines(self, max_months: int = 36) -> List[str]:
+        """Per-month lines, most recent first; per-year lines if there are more than max_months."""
+        periods = self.months
+        if len(periods) > max_months:
+            periods = {}
+            for month, bucket in self.months.items():
+                year = self._bucket(periods, month[:4])
+                year["rows"] += bucket["rows"]
+                for column, total in bucket["sums"].items():
+                    year["sums"][column] = year["sums"].get(column, 0.0) + total
+                    year["counts"][column] = year["counts"].get(column, 0) + bucket["counts"][column]
+        return [f"{period}: {bucket['rows']:,} rows" + (f", {self._means(bucket)}" if self._means(bucket) else "")
+                for period, bucket in sorted(periods.items(), reverse=True)]
+
+class SQLContextBuilder:
+    """Fit a query's result into a token budget for the prompt.
+
+    Rows are consumed in chunks (as read from a server-side cursor) into a
+    ResultSummary, so large results are never held in memory whole. A
+    result of at most verbatim_rows rows that fits in token_budget as a
+    compact table is passed through verbatim. Larger ones are replaced by
+    a summary - row count and date range, column totals, per-type
+    breakdowns, the monthly trend - and as many of the first sample_rows
+    rows as still fit. Sections are added in that order and each stops at
+    the budget with a note of how much was left out, so the most
+    informative parts survive.
+    """
+
+    def __init__(self, token_budget: int = 1500, sample_rows: int = 20, verbatim_rows: int = 200,
+                 count_tokens: Callable[[str], int] = None):
+        self.token_budget = token_budget
+        self.sample_rows = sample_rows
+        self.verbatim_rows = max(verbatim_rows, sample_rows)
+        self.count_tokens = count_tokens or token_counter()
+
+    def build(self, chunks: Iterable[List[Dict]], max_rows: int = None) -> SQLContext:
+        """Render rows read in chunks, reading at most max_rows of them."""
+        summary = ResultSummary(sample_rows=self.verbatim_rows)
+        truncated = False
+        try:
+            for chunk in chunks:
+                if max_rows is not None and summary.rows + len(chunk) > max_rows:
+                    chunk = chunk[:max_rows - summary.rows]
+                    truncated = True
+                summary.add(chunk)
+                if truncated:
+                    break
+        finally:
+            # Release a server-side cursor before the connection goes back to the pool
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+        if truncated:
+            logger.warning(f"Result cut off after {max_rows} rows")
+        return self.render(summary, truncated)
+
+    def render(self, summary: ResultSummary, truncated: bool = False) -> SQLContext:
+        if not summary.rows:
+            return SQLContext("", 0, 0, summarized=False, truncated=truncated)
+        if summary.rows <= len(summary.samples):
+            text = "\n".join(compact_rows(summary.samples))
+            tokens = self.count_tokens(text)
+            if tokens <= self.token_budget:
+                return SQLContext(text, summary.rows, tokens, summarized=False, truncated=truncated)
+
+        lines: List[str] = []
+        tokens = 0
+
+        def fits(*new_lines: str) -> bool:
+            return tokens + sum(self.count_tokens(line) + 1 for line in new_lines) <= self.token_budget
+
+        def add(line: str) -> bool:
+            nonlocal tokens
+            if not fits(line):
+                return False
+            lines.append(line)
+            tokens += self.count_tokens(line) + 1
+            return True
+
+        header = f"{summary.rows:,} rows" + (" (cut off, more exist)" if truncated else "")
+        if summary.first_date:
+            header += f" from {summary.first_date} to {summary.last_date}"
+        add(f"Summary of {header}.")
+
+        def more(count: int, unit: str) -> List[str]:
+            return [f"... {count} more {unit}"] if count else []
+
+        def section(title: str, section_lines: List[str], unit: str, header_lines: int = 0):
+            """Add the title, header lines and as many lines as fit, leaving room to say how many were not."""
+            items = len(section_lines) - header_lines
+            if items <= 0:
+                return
+            first = section_lines[:header_lines + 1]
+            if not fits(title, *first, *more(items - 1, unit)):
+                # Not even one line fits; say the section exists rather than print an empty one
+                add(f"{title[:-1]}: left out to fit the token budget ({items:,} {unit}).")
+                return
+            for line in [title] + first:
+                add(line)
+            shown = 1
+            for line in section_lines[header_lines + 1:]:
+                if not fits(line, *more(items - shown - 1, unit)):
+                    break
+                add(line)
+                shown += 1
+            for line in more(items - shown, unit):
+                add(line)
+
+        section("Totals:", summary.totals_lines(), "columns")
+        for column in summary.categories:
+            section(f"By {column}:", summary.category_lines(column), "values")
+        if len(summary.months) > 1:
+            section("Trend, most recent first:", summary.trend_lines(), "periods")
+        samples = summary.samples[:self.sample_rows]
+        section(f"First {len(samples)} of the rows:", compact_rows(samples), "rows", header_lines=1)
+
+        text = "\n".join(lines)
+        return SQLContext(text, summary.rows, tokens, summarized=True, truncated=truncated)
@@ -0,0 +1,197 @@
+import datetime
+import decimal
+import threading
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import tiktoken
+
+from config.config import openai_config
+
+logger = logging.getLogger(__name__)
+
+def token_counter(model_name: str = None) -> Callable[[str], int]:
+    """Count tokens the way the chat model does."""
+    try:
+        encoding = tiktoken.encoding_for_model(model_name or openai_config.model_name)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text))
+
+def _compact_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (float, decimal.Decimal)):
+        return f"{float(value):.1f}".rstrip("0").rstrip(".")
+    return str(value)
+
+def compact_rows(rows: List[Dict]) -> List[str]:
+    """Rows as a header line plus one pipe-separated line per row."""
+    if not rows:
+        return []
+    columns = list(rows[0])
+    return [" | ".join(columns)] + [" | ".join(_compact_value(row.get(column)) for column in columns)
+                                     for row in rows]
+
+class ConversationMemory:
+    """Conversation context for the prompt, kept within a token budget.
+
+    Recent turns are kept verbatim. When they exceed their share of
+    max_tokens, the oldest half is folded into a rolling summary by
+    summarize(previous_summary, transcript), which is itself re-summarized
+    when it outgrows summary_tokens. Summarizing runs on executor if one is
+    given, without holding the lock, so turns are recorded and context is
+    read without waiting on it; the folded turns stay in the context until
+    their summary is swapped in. Context fetched from the database is kept
+    per query, each at most half of facts_tokens, evicting the oldest
+    beyond facts_tokens. Thread-safe.
+    """
+
+    def __init__(self, summarize: Callable[[str, str], str], max_tokens: int = 2000,
+                 summary_tokens: int = 400, facts_tokens: int = 600,
+                 count_tokens: Callable[[str], int] = None, executor: Optional[Executor] = None):
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.facts_tokens = facts_tokens
+        self.count_tokens = count_tokens or token_counter()
+        self.summary = ""
+        self._turns: "deque[Tuple[str, str, int]]" = deque()
+        self._turn_tokens = 0
+        self._facts: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._facts_total = 0
+        self.executor = executor
+        self._folding = False
+        # Bumped by clear, so a summary of turns cleared meanwhile is dropped
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def turn_tokens(self) -> int:
+        return self.max_tokens - self.summary_tokens - self.facts_tokens
+
+    def add_turn(self, user_input: str, answer: str):
+        """Record a question and its answer, summarizing older turns if needed."""
+        tokens = [(role, content, self.count_tokens(content))
+                  for role, content in (("User", user_input), ("Coach", answer))]
+        with self._lock:
+            for turn in tokens:
+                self._turns.append(turn)
+                self._turn_tokens += turn[2]
+            fold = self._start_fold()
+        if fold:
+            self._run_fold(fold)
+
+    def _start_fold(self) -> Optional[Tuple[int, int, str, str]]:
+        """Pick the oldest half of the turns, by tokens, to summarize; call with the lock held."""
+        if self._folding or self._turn_tokens <= self.turn_tokens:
+            return None
+        count, remaining = 0, self._turn_tokens
+        for _, _, tokens in self._turns:
+            if remaining <= self._turn_tokens // 2 and count % 2 == 0:
+                break
+            count += 1
+            remaining -= tokens
+        self._folding = True
+        transcript = "\n".join(f"{role}: {content}" for role, content, _ in list(self._turns)[:count])
+        return self._generation, count, self.summary, transcript
+
+    def _run_fold(self, fold: Tuple[int, int, str, str]):
+        if self.executor is None:
+            self._fold(*fold)
+        else:
+            self.executor.submit(self._fold, *fold)
+
+    def _fold(self, generation: int, count: int, summary: str, transcript: str):
+        """Summarize the picked turns without the lock, then swap the summary in for them."""
+        logger.info(f"Summarizing {count} older messages")
+        summary = self._summarize(summary, transcript)
+        if self.count_tokens(summary) > self.summary_tokens:
+            summary = self._summarize("", summary)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._folding = False
+            for _ in range(count):
+                self._turn_tokens -= self._turns.popleft()[2]
+            self.summary = summary
+            fold = self._start_fold()
+        if fold:
+            self._run_fold(fold)
+
+    def _summarize(self, summary: str, transcript: str) -> str:
+        try:
+            return self.summarize(summary, transcript).strip()
+        except Exception as e:
+            # Keep the most recent part of the text rather than losing it all
+            logger.error(f"Error summarizing conversation: {e}")
+            text = f"{summary}\n{transcript}".strip()
+            return text[-self.summary_tokens * 4:]
+
+    def add_context(self, source: str, text: str):
+        """Keep already rendered query context, e.g. a result summary, replacing older context for it."""
+        self._add_lines(source, text.splitlines(), "lines")
+
+    def _add_lines(self, source: str, lines: List[str], unit: str):
+        if not lines:
+            return
+        with self._lock:
+            if source in self._facts:
+                self._facts_total -= self._facts.pop(source)[1]
+            # Keep as many rows as fit in this query's share of the budget
+            kept = [f"{source}:", lines[0]]
+            tokens = self.count_tokens("\n".join(kept))
+            # Leave room for the note on what was left out
+            note_tokens = self.count_tokens(f"... {len(lines)} more {unit}") + 1
+            for i, line in enumerate(lines[1:], start=1):
+                line_tokens = self.count_tokens(line) + 1
+                reserve = note_tokens if i < len(lines) - 1 else 0
+                if tokens + line_tokens + reserve > self.facts_tokens // 2:
+                    kept.append(f"... {len(lines) - i} more {unit}")
+                    tokens += self.count_tokens(kept[-1]) + 1
+                    break
+                kept.append(line)
+                tokens += line_tokens
+            self._facts[source] = ("\n".join(kept), tokens)
+            self._facts_total += tokens
+            while self._facts_total > self.facts_tokens and len(self._facts) > 1:
+                self._facts_total -= self._facts.popitem(last=False)[1][1]
+
+    def context(self) -> str:
+        """Summary, known facts and recent turns, formatted for the prompt."""
+        with self._lock:
+            sections = []
+            if self.summary:
+                sections.append(f"Summary of the earlier conversation:\n{self.summary}")
+            if self._facts:
+                sections.append("Data already fetched for this user:\n"
+                                + "\n\n".join(text for text, _ in self._facts.values()))
+            if self._turns:
+                sections.append("Recent conversation:\n"
+                                + "\n".join(f"{role}: {content}" for role, content, _ in self._turns))
+            return "\n\n".join(sections)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._folding = False
+            self.summary = ""
+            self._turns.clear()
+            self._turn_tokens = 0
+            self._facts.clear()
+            self._facts_total = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "turns": len(self._turns),
+                "summarizing": int(self._folding),
+                "turn_tokens": self._turn_tokens,
+                "summary_tokens": self.count_tokens(self.summary) if self.summary else 0,
+                "fact_sources": len(self._facts),
+                "fact_tokens": self._facts_total
+            }
@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional
+import os
+import shutil
+import threading
+import logging
+
+from langchain_openai import ChatOpenAI
+from langchain_community.vectorstores import FAISS
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema import Document
+from config.config import postgres_config, openai_config, app_config
+from src.utils.embeddings import create_embeddings
+from src.utils.semantic_cache import SemanticCache
+from src.data_loaders.sql_templates import SQLTemplateCache
+from src.data_loaders.db_pool import ConnectionPool, get_pool
+from src.data_loaders.ingestion import DocumentIngestor
+from src.agents.retrieval import HybridRetriever, load_faiss_mmap
+from src.agents.router import QueryRouter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KNOWLEDGE = """
+        Welcome to Kahunas Fitness! Here's some general fitness information:
+
+        1. Workout Types and Benefits:
+        - Cardio: Improves heart health, burns calories, increases endurance
+        - Strength Training: Builds muscle, boosts metabolism, improves bone density
+        - HIIT: Efficient calorie burning, improves cardiovascular fitness
+        - Yoga: Enhances flexibility, reduces stress, improves balance
+
+        2. Exercise Guidelines:
+        - Warm up properly before exercising
+        - Stay hydrated during workouts
+        - Listen to your body and avoid overtraining
+        - Mix different types of exercises for balanced fitness
+
+        3. Nutrition Tips:
+        - Eat balanced meals with protein, carbs, and healthy fats
+        - Stay hydrated throughout the day
+        - Time your meals around workouts
+        - Consider post-workout nutrition for recovery
+
+        4. Recovery and Rest:
+        - Get adequate sleep for muscle recovery
+        - Take rest days between intense workouts
+        - Use proper form to prevent injuries
+        - Stretch regularly for flexibility
+        """
+
+@dataclass
+class ChatbotResources:
+    """Process-wide chatbot dependencies, shared by every session.
+
+    All of these are expensive to build and safe to share between threads:
+    the LLM and embedding clients, the FAISS index and the hybrid retriever
+    over it, the query router, the connection pool, the caches, which key
+    their entries by user, the thread pool that gathers a question's
+    context concurrently, and a separate one that summarizes conversations,
+    so slow summaries never hold up context gathering.
+    """
+    llm: Any
+    embeddings: Any
+    vector_store: FAISS
+    db_pool: ConnectionPool
+    sql_templates: SQLTemplateCache
+    retriever: Optional[HybridRetriever] = None
+    router: Optional[QueryRouter] = None
+    response_cache: Optional[SemanticCache] = None
+    executor: Optional[ThreadPoolExecutor] = None
+    summary_executor: Optional[ThreadPoolExecutor] = None
+
+def load_vector_store(embeddings, ingest: bool = None) -> FAISS:
+    """Load the vector store from disk, or build and save the default one.
+
+    With ingest (default: the INGEST_ON_STARTUP setting), new and changed
+    files in the documents directory are then indexed. Without it, the
+    index is memory-mapped read-only if VECTOR_STORE_MMAP is set.
+    """
+    ingest = app_config.ingest_on_startup if ingest is None else ingest
+    vector_store = _load_or_create_vector_store(embeddings, mmap=app_config.vector_store_mmap and not ingest)
+    if ingest:
+        logger.info("Indexing new and changed documents...")
+        vector_store, _ = DocumentIngestor(embeddings).ingest(vector_store)
+    return vector_store
+
+def _read_vector_store(embeddings, mmap: bool) -> FAISS:
+    if mmap:
+        try:
+            return load_faiss_mmap(app_config.vector_store_path, embeddings)
+        except Exception as e:
+            logger.warning(f"Could not memory-map the vector store ({e}), loading it into memory")
+    return FAISS.load_local(
+        app_config.vector_store_path,
+        embeddings,
+        allow_dangerous_deserialization=True
+    )
+
+def _load_or_create_vector_store(embeddings, mmap: bool = False) -> FAISS:
+    logger.info("Initializing vector store...")
+    if os.path.exists(app_config.vector_store_path):
+        try:
+            logger.info("Loading existing vector store from disk...")
+            vector_store = _read_vector_store(embeddings, mmap)
+            dimensions = len(embeddings.embed_query("fitness"))
+            if vector_store.index.d == dimensions:
+                return vector_store
+            # Built with another embedding model; its vectors are not comparable
+            logger.warning(f"Vector store has {vector_store.index.d}-dimensional vectors but the embedder "
+                           f"produces {dimensions}. Rebuilding it...")
+        except Exception as e:
+            logger.warning(f"Error loading existing vector store: {e}. Creating new one...")
+        if os.path.isdir(app_config.vector_store_path):
+            shutil.rmtree(app_config.vector_store_path)
+        elif os.path.isfile(app_config.vector_store_path):
+            os.remove(app_config.vector_store_path)
+
+    documents = [Document(page_content=DEFAULT_KNOWLEDGE, metadata={"source": "fitness_guide"})]
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200
+    )
+    texts = text_splitter.split_documents(documents)
+
+    logger.info("Creating new vector store...")
+    vector_store = FAISS.from_documents(texts, embeddings)
+    os.makedirs(app_config.vector_store_path, exist_ok=True)
+    vector_store.save_local(app_config.vector_store_path)
+    logger.info("Vector store saved successfully")
+    return vector_store
+
+def build_resources(llm=None, embeddings=None, db_pool: ConnectionPool = None) -> ChatbotResources:
+    """Build a fresh set of resources.
+
+    Defaults are the OpenAI chat model, the configured embedder behind the
+    on-disk embedding cache, and the shared pool.
+    """
+    logger.info("Setting up OpenAI components...")
+    llm = llm or ChatOpenAI(
+        temperature=openai_config.temperature,
+        model_name=openai_config.model_name
+    )
+    embeddings = embeddings or create_embeddings()
+    response_cache = None
+    if app_config.semantic_cache_enabled:
+        logger.info("Setting up semantic response cache...")
+        response_cache = SemanticCache(
+            embeddings.embed_query,
+            threshold=app_config.semantic_cache_threshold,
+            ttl=app_config.semantic_cache_ttl,
+            max_entries=app_config.semantic_cache_max_entries
+        )
+    vector_store = load_vector_store(embeddings)
+    return ChatbotResources(
+        llm=llm,
+        embeddings=embeddings,
+        vector_store=vector_store,
+        retriever=HybridRetriever.load_or_build(
+            vector_store, embeddings,
+            k=app_config.retrieval_k,
+            fetch_k=app_config.retrieval_fetch_k,
+            rrf_k=app_config.retrieval_rrf_k
+        ),
+        router=QueryRouter(),
+        db_pool=db_pool or get_pool(),
+        sql_templates=SQLTemplateCache(),
+        response_cache=response_cache,
+        # Each task holds at most one pooled connection
+        executor=ThreadPoolExecutor(max_workers=postgres_config.pool_max_size,
+                                    thread_name_prefix="chatbot-context"),
+        summary_executor=ThreadPoolExecutor(max_workers=app_config.memory_summary_workers,
+                                            thread_name_prefix="memory-summary")
+    )
+
+_resources: Optional[ChatbotResources] = None
+_resources_lock = threading.Lock()
+
+def get_resources() -> ChatbotResources:
+    """The process-wide resources, built on first use."""
+    global _resources
+    with _resources_lock:
+        if _resources is None:
+            logger.info("Building shared chatbot resources...")
+            _resources = build_resources()
+        return _resources
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import pickle
+import logging
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain.schema import Document
+from config.config import app_config
+from src.utils.bm25 import BM25Index
+
+logger = logging.getLogger(__name__)
+
+def load_faiss_mmap(path: str, embeddings) -> FAISS:
+    """Load a saved vector store with its FAISS index memory-mapped read-only.
+
+    Pages of the index are read on demand instead of copied into memory
+    up front, so loading is fast and processes share the page cache. The
+    store cannot be added to.
+    """
+    index = faiss.read_index(os.path.join(path, "index.faiss"), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+def _positions(vector_store: FAISS) -> List[str]:
+    """Docstore ids in FAISS index order."""
+    return [vector_store.index_to_docstore_id[i] for i in range(len(vector_store.index_to_docstore_id))]
+
+def _stamp(doc_ids: List[str]) -> str:
+    return hashlib.sha1("\n".join(doc_ids).encode("utf-8")).hexdigest()
+
+class HybridRetriever:
+    """Dense FAISS search and BM25 keyword search fused by reciprocal rank.
+
+    Each retriever returns its top fetch_k chunks and a chunk scores
+    sum(1 / (rrf_k + rank)) over the rankings it appears in, so exact
+    keyword matches (exercise names, numbers) and paraphrases both surface.
+    A metadata filter restricts both searches before ranking rather than
+    after, so filtered queries still get k results when k matching chunks
+    exist. The BM25 index is persisted next to the vector store and rebuilt
+    only when the set of chunks changes.
+    """
+
+    def __init__(self, vector_store: FAISS, embeddings, bm25: BM25Index,
+                 k: int = 4, fetch_k: int = 20, rrf_k: int = 60):
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+        self.bm25 = bm25
+        self.k = k
+        self.fetch_k = fetch_k
+        self.rrf_k = rrf_k
+
+    @classmethod
+    def load_or_build(cls, vector_store: FAISS, embeddings, directory: str = None, **kwargs) -> "HybridRetriever":
+        """Load the BM25 index for the vector store's chunks, rebuilding it if they changed."""
+        directory = directory or os.path.join(app_config.vector_store_path, "bm25")
+        doc_ids = _positions(vector_store)
+        stamp = _stamp(doc_ids)
+        bm25 = BM25Index.load(directory)
+        if bm25 is None or bm25.stamp != stamp:
+            logger.info(f"Building BM25 index over {len(doc_ids)} chunks...")
+            documents = [vector_store.docstore.search(doc_id) for doc_id in doc_ids]
+            bm25 = BM25Index.build(doc_ids, [doc.page_content for doc in documents],
+                                   [doc.metadata for doc in documents], stamp=stamp)
+            bm25.save(directory)
+            # Serve from the memory-mapped copy, like a later load would
+            bm25 = BM25Index.load(directory) or bm25
+        else:
+            logger.info(f"Loaded BM25 index over {len(bm25)} chunks")
+        return cls(vector_store, embeddings, bm25, **kwargs)
+
+    def _allowed(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Rows whose metadata matches every key; a list value matches any of its items."""
+        if not filter:
+            return None
+        def matches(metadata):
+            for key, expected in filter.items():
+                value = metadata.get(key)
+                if value not in expected if isinstance(expected, (list, tuple, set)) else value != expected:
+                    return False
+            return True
+        return np.fromiter((matches(metadata) for metadata in self.bm25.metadatas), dtype=bool,
+                           count=len(self.bm25))
+
+    def dense_search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[int]:
+        index = self.vector_store.index
+        vector = np.asarray([self.embeddings.embed_query(query)], dtype=np.float32)
+        if allowed is None:
+            k = min(k, index.ntotal)
+            params = None
+        else:
+            ids = np.flatnonzero(allowed).astype(np.int64)
+            k = min(k, len(ids))
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids)))
+        if k <= 0:
+            return []
+        _, positions = index.search(vector, k, params=params)
+        return [int(position) for position in positions[0] if position >= 0]
+
+    def sparse_search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[int]:
+        return [row for row, _ in self.bm25.search(query, k, allowed)]
+
+    def fuse(self, *rankings: List[int]) -> List[int]:
+        scores: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, position in enumerate(ranking, start=1):
+                scores[position] = scores.get(position, 0.0) + 1.0 / (self.rrf_k + rank)
+        return sorted(scores, key=lambda position: (-scores[position], position))
+
+    def search(self, query: str, k: int = None, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Top k chunks for the query, restricted to chunks whose metadata matches filter."""
+        k = k or self.k
+        allowed = self._allowed(filter)
+        fetch_k = max(self.fetch_k, k)
+        dense = self.dense_search(query, fetch_k, allowed)
+        sparse = self.sparse_search(query, fetch_k, allowed)
+        return [self.vector_store.docstore.search(self.bm25.doc_ids[position])
+                for position in self.fuse(dense, sparse)[:k]]
@@ -0,0 +1,120 @@
+from typing import Dict, List, Sequence, Tuple
+import logging
+
+import numpy as np
+
+from src.utils.bm25 import tokenize
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE = "knowledge"
+PERSONAL = "personal"
+BOTH = "both"
+
+# Labeled example questions the router is trained on at startup
+TRAINING_QUESTIONS: Dict[str, List[str]] = {
+    KNOWLEDGE: [
+        "What are the benefits of HIIT?",
+        "How do I improve my squat technique?",
+        "Explain progressive overload",
+        "What is a good warm up before running?",
+        "Can you recommend a post-workout meal?",
+        "What should I eat before a workout?",
+        "Give me some nutrition tips",
+        "What is the best diet for fat loss?",
+        "How much protein should I eat to build muscle?",
+        "What are best practices for stretching?",
+        "How do I do a proper deadlift?",
+        "What's the difference between cardio and strength training?",
+        "How many rest days should I take per week?",
+        "What is a good beginner workout plan?",
+        "How can I improve my flexibility?",
+        "Guide to proper push-up form",
+        "How to breathe while lifting weights",
+        "What foods help with muscle recovery?",
+        "Is yoga good for recovery?",
+        "How much water should I drink while training?",
+    ],
+    PERSONAL: [
+        "How many workouts did I do this week?",
+        "How many calories did I burn last week?",
+        "Show my workout history",
+        "What was my average heart rate during runs?",
+        "When was my last workout?",
+        "How long was my last session?",
+        "What is my total calories burned?",
+        "Did I complete all my workouts?",
+        "Which workout type do I do most often?",
+        "List my recent workouts",
+        "How many minutes did I train in January?",
+        "What was my highest heart rate?",
+        "How often did I run this month?",
+        "Show me my progress",
+        "How many HIIT sessions have I done?",
+        "What did I do on Tuesday?",
+        "Summarize my training this month",
+        "Have I been consistent with my workouts?",
+    ],
+    BOTH: [
+        "Based on my workouts, what should I focus on next?",
+        "Recommend a plan based on my history",
+        "Given my heart rate data, am I training too hard?",
+        "Is my workout frequency enough to lose weight?",
+        "How should I adjust my diet given my calories burned?",
+        "Based on my recent sessions, do I need more rest days?",
+        "Am I doing enough cardio compared to strength training?",
+        "What should I improve based on my progress?",
+        "Suggest a workout plan for next week based on what I did this week",
+        "Are my workouts balanced enough?",
+    ],
+}
+
+def _features(question: str) -> List[str]:
+    tokens = tokenize(question)
+    # Pronouns are stopwords for retrieval but the strongest routing signal
+    pronouns = [word for word in question.lower().replace("?", " ").split() if word in ("i", "my", "me", "i've")]
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])] + [f"pronoun:{word}" for word in pronouns]
+
+class QueryRouter:
+    """Multinomial naive Bayes over words, bigrams and pronouns.
+
+    Decides whether a question needs the knowledge base, the user's
+    workout data, or both. Trains in milliseconds on labeled examples and
+    classifies with one dictionary lookup per feature, so it adds
+    negligible latency and needs no network. Questions no label wins with
+    at least min_confidence are routed to both sources.
+    """
+
+    def __init__(self, examples: Dict[str, Sequence[str]] = None, alpha: float = 0.5,
+                 min_confidence: float = 0.5):
+        examples = examples or TRAINING_QUESTIONS
+        self.min_confidence = min_confidence
+        self.labels = list(examples)
+        documents = [(_features(question), index) for index, label in enumerate(self.labels)
+                     for question in examples[label]]
+        self.vocabulary = {feature: i for i, feature in
+                           enumerate(sorted({feature for features, _ in documents for feature in features}))}
+        counts = np.full((len(self.labels), len(self.vocabulary)), alpha)
+        priors = np.zeros(len(self.labels))
+        for features, index in documents:
+            priors[index] += 1
+            for feature in features:
+                counts[index, self.vocabulary[feature]] += 1
+        self.log_priors = np.log(priors / priors.sum())
+        self.log_likelihoods = np.log(counts / counts.sum(axis=1, keepdims=True))
+
+    def predict_proba(self, question: str) -> Dict[str, float]:
+        columns = [self.vocabulary[feature] for feature in _features(question) if feature in self.vocabulary]
+        scores = self.log_priors + self.log_likelihoods[:, columns].sum(axis=1)
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        return dict(zip(self.labels, probabilities.tolist()))
+
+    def route(self, question: str) -> Tuple[bool, bool]:
+        """Whether the question needs the knowledge base, and whether it needs the user's data."""
+        probabilities = self.predict_proba(question)
+        label = max(probabilities, key=probabilities.get)
+        if probabilities[label] < self.min_confidence:
+            label = BOTH
+        logger.info(f"Routed question as {label} ({probabilities[label]:.2f})")
+        return label in (KNOWLEDGE, BOTH), label in (PERSONAL, BOTH)
@@ -6,6 +6,7 @@ from PyPDF2 import PdfReader
 import psycopg2
 from psycopg2.extras import DictCursor
 from config.config import postgres_config
+from src.data_loaders.db_pool import PoolTimeout, get_pool
 
 # Configure logging
 logging.basicConfig(
@@ -62,18 +63,25 @@ class DataLoader:
             logger.error(f"Error loading Kahunas data: {e}")
             return {}
 
+    @staticmethod
+    def extract_pdf_pages(file_path: str, start: int = 0, stop: int = None) -> List[str]:
+        """Extract the text of each page of a PDF file, or of pages start to stop."""
+        reader = PdfReader(file_path)
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+    @staticmethod
+    def count_pdf_pages(file_path: str) -> int:
+        return len(PdfReader(file_path).pages)
+
     @staticmethod
     def load_pdf(file_path: str) -> str:
         """Extract text from a PDF file."""
         logger.info(f"Loading PDF file: {file_path}")
         try:
-            reader = PdfReader(file_path)
-            text = ""
-            for i, page in enumerate(reader.pages):
-                logger.info(f"Processing page {i+1} of PDF")
-                text += page.extract_text() + "\n"
-            logger.info("Successfully extracted text from PDF")
-            return text
+            pages = DataLoader.extract_pdf_pages(file_path)
+            logger.info(f"Successfully extracted text from {len(pages)} PDF pages")
+            return "".join(page + "\n" for page in pages)
         except Exception as e:
             logger.error(f"Error loading PDF file {file_path}: {e}")
             return ""
@@ -83,32 +91,32 @@ class DataLoader:
         """Load data from PostgreSQL database."""
         logger.info(f"Executing PostgreSQL query: {query}")
         try:
-            connection = psycopg2.connect(
-                host=postgres_config.host,
-                user=postgres_config.user,
-                password=postgres_config.password,
-                port=postgres_config.port,
-                dbname=postgres_config.database
-            )
-            logger.info("Successfully connected to PostgreSQL")
-            
-            cursor = connection.cursor(cursor_factory=DictCursor)
-            cursor.execute(query)
-            results = cursor.fetchall()
-            logger.info(f"Query returned {len(results)} results")
-            
-            cursor.close()
-            connection.close()
-            logger.info("Database connection closed")
+            # Reuse a pooled connection instead of connecting per query
+            with get_pool().connection() as connection:
+                cursor = connection.cursor(cursor_factory=DictCursor)
+                cursor.execute(query)
+                results = cursor.fetchall()
+                logger.info(f"Query returned {len(results)} results")
+                cursor.close()
             
             return [dict(row) for row in results]
-        except psycopg2.Error as e:
+        except (psycopg2.Error, PoolTimeout) as e:
             logger.error(f"Error querying PostgreSQL: {e}")
             return []
 
+    @staticmethod
+    def _write_if_missing(path: str, write) -> bool:
+        """Write a sample file unless it already exists; True if it was written."""
+        if os.path.exists(path):
+            logger.info(f"{path} already exists, skipping")
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write(path)
+        return True
+
     @staticmethod
     def create_sample_data():
-        """Create sample data files for demonstration."""
+        """Create sample data files for demonstration, leaving existing ones in place."""
         logger.info("Creating sample data files...")
         # Load Kahunas data first
         kahunas_data = DataLoader.load_kahunas_data()
@@ -124,10 +132,8 @@ class DataLoader:
             }
             df = pd.DataFrame(sample_data)
             
-            # Create data directory if it doesn't exist
-            os.makedirs('./data', exist_ok=True)
-            df.to_csv('./data/sample_data.csv', index=False)
-            logger.info("Sample CSV created successfully")
+            if DataLoader._write_if_missing('./data/sample_data.csv', lambda path: df.to_csv(path, index=False)):
+                logger.info("Sample CSV created successfully")
 
         # Create sample PDF content
         logger.info("Creating sample PDF content...")
@@ -150,14 +156,21 @@ class DataLoader:
         """
         
         # Save sample PDF content
-        os.makedirs('./data/documents', exist_ok=True)
-        with open('./data/documents/training_guide.txt', 'w') as f:
-            f.write(pdf_content)
-        logger.info("Sample training guide created successfully")
+        def write_guide(path):
+            with open(path, 'w') as f:
+                f.write(pdf_content)
+
+        if DataLoader._write_if_missing('./data/documents/training_guide.txt', write_guide):
+            logger.info("Sample training guide created successfully")
 
     @staticmethod
     def create_postgres_schema():
-        """Create PostgreSQL schema and sample data."""
+        """Create PostgreSQL schema and sample data.
+
+        Safe to run repeatedly and from several processes at once: tables are
+        created if missing and sample rows are inserted only into empty
+        tables, under an advisory lock.
+        """
         logger.info("Setting up PostgreSQL schema...")
         try:
             logger.info("Connecting to default PostgreSQL database...")
@@ -194,6 +207,9 @@ class DataLoader:
             )
             cursor = connection.cursor()
             
+            # Serialize concurrent seeding; released at commit
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('fitness_db_seed'))")
+            
             # Create fitness_metrics table
             logger.info("Creating fitness_metrics table...")
             cursor.execute("""
@@ -230,15 +246,16 @@ class DataLoader:
                 ('2024-01-03', 'Yoga', 60, 150, 110)
             ]
             
-            logger.info("Clearing existing data from fitness_metrics...")
-            cursor.execute("TRUNCATE fitness_metrics RESTART IDENTITY")
-            
-            logger.info("Inserting sample data into fitness_metrics...")
-            cursor.executemany("""
-                INSERT INTO fitness_metrics 
-                (date, exercise_type, duration_minutes, calories_burned, heart_rate_avg)
-                VALUES (%s, %s, %s, %s, %s)
-            """, sample_metrics)
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM fitness_metrics)")
+            if cursor.fetchone()[0]:
+                logger.info("fitness_metrics already has data, skipping sample data")
+            else:
+                logger.info("Inserting sample data into fitness_metrics...")
+                cursor.executemany("""
+                    INSERT INTO fitness_metrics 
+                    (date, exercise_type, duration_minutes, calories_burned, heart_rate_avg)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, sample_metrics)
             
             # Insert sample user workout data
             sample_workouts = [
@@ -248,15 +265,16 @@ class DataLoader:
                 (26, '2024-01-18', 'Yoga', 45, 180, 110, 'Completed', 'Recovery session')
             ]
             
-            logger.info("Clearing existing data from user_workouts...")
-            cursor.execute("TRUNCATE user_workouts RESTART IDENTITY")
-            
-            logger.info("Inserting sample data into user_workouts...")
-            cursor.executemany("""
-                INSERT INTO user_workouts 
-                (user_id, workout_date, workout_type, duration_minutes, calories_burned, heart_rate_avg, completion_status, notes)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, sample_workouts)
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM user_workouts)")
+            if cursor.fetchone()[0]:
+                logger.info("user_workouts already has data, skipping sample data")
+            else:
+                logger.info("Inserting sample data into user_workouts...")
+                cursor.executemany("""
+                    INSERT INTO user_workouts 
+                    (user_id, workout_date, workout_type, duration_minutes, calories_burned, heart_rate_avg, completion_status, notes)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, sample_workouts)
             
             connection.commit()
             cursor.close()
@@ -0,0 +1,277 @@
+import asyncio
+import functools
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+class PoolTimeout(Exception):
+    """No connection became available within the acquire timeout."""
+
+class PooledConnection:
+    """A pooled DB-API connection plus per-connection state.
+
+    Attribute access falls through to the underlying connection, so it can
+    be used wherever a connection is expected. state holds objects tied to
+    this physical connection, such as its prepared statements, and is
+    dropped with it.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.state: Dict[str, Any] = {}
+        self.last_used = time.monotonic()
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API connections with health checks.
+
+    Connections are opened lazily up to max_size; callers beyond that wait
+    up to acquire_timeout for one to be returned. A connection idle for more
+    than health_check_interval seconds is checked with a trivial query before
+    it is handed out, and a closed or failing connection is replaced with a
+    new one. Work not committed by the caller is rolled back when the
+    connection returns to the pool.
+    """
+
+    def __init__(self, connect: Callable[[], Any], max_size: int = 10,
+                 health_check_interval: float = 30.0, acquire_timeout: float = 10.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self._idle: List[PooledConnection] = []
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self.stats = {"connections_opened": 0, "acquired": 0, "waits": 0, "health_check_failures": 0}
+
+    def _open(self) -> PooledConnection:
+        logger.info("Opening pooled database connection...")
+        pooled = PooledConnection(self._connect())
+        with self._condition:
+            self.stats["connections_opened"] += 1
+        return pooled
+
+    def _healthy(self, pooled: PooledConnection) -> bool:
+        if getattr(pooled.connection, "closed", False):
+            return False
+        if time.monotonic() - pooled.last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = pooled.connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            pooled.connection.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check: {e}")
+            return False
+
+    @staticmethod
+    def _close_quietly(pooled: PooledConnection):
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+
+    def acquire(self) -> PooledConnection:
+        """Take a healthy connection from the pool, opening one if allowed."""
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    pooled = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No database connection available after {self.acquire_timeout}s")
+                self.stats["waits"] += 1
+                self._condition.wait(remaining)
+            self.stats["acquired"] += 1
+
+        try:
+            if pooled is None:
+                return self._open()
+            if not self._healthy(pooled):
+                with self._condition:
+                    self.stats["health_check_failures"] += 1
+                self._close_quietly(pooled)
+                logger.info("Reconnecting pooled database connection...")
+                return self._open()
+            return pooled
+        except Exception:
+            # Give the slot back so a failed connect does not shrink the pool
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, pooled: PooledConnection):
+        """Return a connection, discarding it if it can no longer be used."""
+        usable = not getattr(pooled.connection, "closed", False)
+        if usable:
+            try:
+                pooled.connection.rollback()
+            except Exception:
+                usable = False
+        with self._condition:
+            if usable and not self._closed:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            else:
+                self._close_quietly(pooled)
+                self._size -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledConnection]:
+        pooled = self.acquire()
+        try:
+            yield pooled
+        finally:
+            self.release(pooled)
+
+    def fetch(self, query: str, params: Optional[Sequence] = None) -> List[Dict]:
+        """Run a query on a pooled connection and return its rows as dicts."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if params is None:
+                    cursor.execute(query)
+                else:
+                    cursor.execute(query, params)
+                return rows_as_dicts(cursor, cursor.fetchall())
+            finally:
+                cursor.close()
+
+    def close(self):
+        """Close idle connections; connections in use are closed on release."""
+        with self._condition:
+            self._closed = True
+            for pooled in self._idle:
+                self._close_quietly(pooled)
+            self._size -= len(self._idle)
+            self._idle.clear()
+            self._condition.notify_all()
+
+class AsyncConnectionPool:
+    """Async access to a ConnectionPool.
+
+    Blocking driver calls run on a bounded thread pool, so coroutines can
+    await queries, and run several at once, without blocking the event loop.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_workers: Optional[int] = None):
+        self.pool = pool
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or pool.max_size,
+                                            thread_name_prefix="db-pool")
+
+    async def _run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+
+    async def fetch(self, query: str, params: Optional[Sequence] = None) -> List[Dict]:
+        return await self._run(self.pool.fetch, query, params)
+
+    async def fetch_guarded(self, query: str, timeout_ms: int, max_rows: int) -> Tuple[List[Dict], bool]:
+        def run():
+            with self.pool.connection() as conn:
+                return guarded_query(conn, query, timeout_ms, max_rows)
+        return await self._run(run)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+def rows_as_dicts(cursor, rows: Sequence) -> List[Dict]:
+    columns = [column[0] for column in cursor.description or ()]
+    return [dict(zip(columns, row)) for row in rows]
+
+def iter_guarded(connection, query: str, timeout_ms: int, max_rows: int,
+                 chunk_size: int = 1000) -> Iterator[List[Dict]]:
+    """Run an untrusted SELECT read-only with a statement timeout, yielding rows in chunks.
+
+    The query is wrapped so the server stops after max_rows + 1 rows; all
+    of them are yielded, so callers can tell whether the result was cut
+    off. PostgreSQL results are read through a server-side cursor, so only
+    one chunk is held in memory at a time; the transaction is made read
+    only and the timeout is set with SET LOCAL statement_timeout. SQLite
+    connections run with PRAGMA query_only and use a progress handler that
+    aborts the query.
+    """
+    raw = getattr(connection, "connection", connection)
+    sqlite = hasattr(raw, "set_progress_handler")
+    if sqlite:
+        deadline = time.monotonic() + timeout_ms / 1000
+        raw.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+        query_only = raw.execute("PRAGMA query_only").fetchone()[0]
+        raw.execute("PRAGMA query_only = ON")
+        cursor = connection.cursor()
+    else:
+        setup = connection.cursor()
+        # Writes hidden in the SQL, e.g. in functions it calls, fail instead of running
+        setup.execute("SET TRANSACTION READ ONLY")
+        setup.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+        setup.close()
+        cursor = connection.cursor(name=f"guarded_{uuid.uuid4().hex}")
+        cursor.itersize = chunk_size
+    try:
+        cursor.execute(f"SELECT * FROM ({query.strip().rstrip(';')}) AS guarded LIMIT {int(max_rows) + 1}")
+        remaining = max_rows + 1
+        while remaining > 0:
+            rows = cursor.fetchmany(min(chunk_size, remaining))
+            if not rows:
+                break
+            remaining -= len(rows)
+            yield rows_as_dicts(cursor, rows)
+    finally:
+        cursor.close()
+        if sqlite:
+            raw.set_progress_handler(None, 0)
+            raw.execute(f"PRAGMA query_only = {int(query_only)}")
+
+def guarded_query(connection, query: str, timeout_ms: int, max_rows: int) -> Tuple[List[Dict], bool]:
+    """Run an untrusted SELECT with a statement timeout and a row limit.
+
+    Returns at most max_rows rows and whether rows were cut off.
+    """
+    rows = [row for chunk in iter_guarded(connection, query, timeout_ms, max_rows) for row in chunk]
+    return rows[:max_rows], len(rows) > max_rows
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """The process-wide PostgreSQL pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import psycopg2
+            from config.config import postgres_config
+            _pool = ConnectionPool(
+                functools.partial(
+                    psycopg2.connect,
+                    host=postgres_config.host,
+                    user=postgres_config.user,
+                    password=postgres_config.password,
+                    dbname=postgres_config.database,
+                    port=postgres_config.port
+                ),
+                max_size=postgres_config.pool_max_size,
+                health_check_interval=postgres_config.pool_health_check_interval
+            )
+        return _pool
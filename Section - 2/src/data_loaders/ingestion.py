@@ -0,0 +1,257 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from config.config import app_config
+from src.data_loaders.data_loader import DataLoader
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+SUPPORTED_EXTENSIONS = {".pdf", ".txt", ".md"}
+
+@dataclass
+class IngestionStats:
+    scanned: int = 0
+    unchanged: int = 0
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    failed: int = 0
+    chunks_embedded: int = 0
+    chunks_deleted: int = 0
+    seconds: float = 0.0
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def extract_pages(path: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    """Text of each page of a PDF (or of pages start to stop), or the whole text of a plain-text file."""
+    if path.lower().endswith(".pdf"):
+        return DataLoader.extract_pdf_pages(path, start, stop)
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return [f.read()]
+
+class DocumentIngestor:
+    """Incrementally indexes data/documents into the FAISS vector store.
+
+    A manifest next to the index records each document's size, mtime,
+    content hash and chunk ids. A run stats every document but hashes only
+    those whose size or mtime changed, and extracts, chunks and embeds only
+    those whose hash changed; chunks of changed and deleted documents are
+    removed from the index. PDFs are split into ranges of pages_per_task
+    pages extracted in a process pool, so one large PDF is spread across
+    the workers too, and chunks are embedded in batches.
+    """
+
+    def __init__(self, embeddings, vector_store_path: str = None, documents_path: str = None,
+                 chunk_size: int = 1000, chunk_overlap: int = 200,
+                 batch_size: int = None, max_workers: Optional[int] = None,
+                 pages_per_task: int = None):
+        self.embeddings = embeddings
+        self.vector_store_path = vector_store_path or app_config.vector_store_path
+        self.documents_path = documents_path or app_config.documents_path
+        self.batch_size = batch_size or app_config.embedding_batch_size
+        self.max_workers = max_workers or app_config.ingestion_workers or None
+        self.pages_per_task = pages_per_task or app_config.pdf_pages_per_task
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.vector_store_path, MANIFEST_NAME)
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable ingestion manifest, re-indexing all documents: {e}")
+            return {}
+
+    def _save_manifest(self, manifest: Dict[str, Dict]):
+        os.makedirs(self.vector_store_path, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def scan(self) -> Dict[str, str]:
+        """Supported documents under documents_path, by relative path."""
+        files = {}
+        for root, _, names in os.walk(self.documents_path):
+            for name in names:
+                if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    path = os.path.join(root, name)
+                    files[os.path.relpath(path, self.documents_path)] = path
+        return files
+
+    def _extract_all(self, changed: List[Tuple]) -> Dict[str, List[str]]:
+        """Pages of each changed document; PDFs are extracted in parallel by page range."""
+        pages = {}
+        tasks = []
+        for rel, path, *_ in changed:
+            if not path.lower().endswith(".pdf"):
+                pages[rel] = self._extract_logged(rel, path)
+                continue
+            try:
+                page_count = DataLoader.count_pdf_pages(path)
+            except Exception as e:
+                logger.error(f"Error extracting {rel}: {e}")
+                continue
+            pages[rel] = []
+            for start in range(0, page_count, self.pages_per_task):
+                tasks.append((rel, path, start, start + self.pages_per_task))
+        if len(tasks) == 1:
+            rel, path, start, stop = tasks[0]
+            pages[rel] = self._extract_logged(rel, path, start, stop)
+        elif tasks:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [(rel, executor.submit(extract_pages, path, start, stop))
+                           for rel, path, start, stop in tasks]
+                # Ranges were submitted in page order, so appending keeps each document's pages in order
+                for rel, future in futures:
+                    try:
+                        document_pages = future.result()
+                    except Exception as e:
+                        if pages[rel] is not None:
+                            logger.error(f"Error extracting {rel}: {e}")
+                        pages[rel] = None
+                        continue
+                    if pages[rel] is not None:
+                        pages[rel].extend(document_pages)
+        return {rel: document_pages for rel, document_pages in pages.items() if document_pages is not None}
+
+    @staticmethod
+    def _extract_logged(rel: str, path: str, start: int = 0, stop: Optional[int] = None) -> Optional[List[str]]:
+        try:
+            return extract_pages(path, start, stop)
+        except Exception as e:
+            logger.error(f"Error extracting {rel}: {e}")
+            return None
+
+    def _chunk(self, rel: str, digest: str, pages: List[str]) -> Tuple[List[str], List[Dict], List[str]]:
+        """Chunk texts, metadata and ids for a document; ids are stable per content."""
+        texts, metadatas = [], []
+        for page_number, page in enumerate(pages, start=1):
+            for chunk in self.text_splitter.split_text(page):
+                texts.append(chunk)
+                metadatas.append({"source": rel, "page": page_number})
+        prefix = hashlib.sha1(f"{rel}:{digest}".encode("utf-8")).hexdigest()[:16]
+        return texts, metadatas, [f"{prefix}-{i}" for i in range(len(texts))]
+
+    def ingest(self, vector_store: Optional[FAISS] = None) -> Tuple[Optional[FAISS], IngestionStats]:
+        """Bring the index up to date with the documents directory and save it."""
+        start = time.perf_counter()
+        stats = IngestionStats()
+        manifest = self._load_manifest()
+        files = self.scan()
+        stats.scanned = len(files)
+
+        changed = []
+        for rel, path in sorted(files.items()):
+            status = os.stat(path)
+            entry = manifest.get(rel)
+            if entry and entry["size"] == status.st_size and entry["mtime"] == status.st_mtime:
+                stats.unchanged += 1
+                continue
+            digest = file_digest(path)
+            if entry and entry["sha256"] == digest:
+                # Touched but not modified: remember the new mtime, skip re-embedding
+                entry["mtime"] = status.st_mtime
+                stats.unchanged += 1
+                continue
+            changed.append((rel, path, digest, status))
+
+        removed = [rel for rel in manifest if rel not in files]
+        stale_ids = [chunk_id for rel in removed for chunk_id in manifest[rel]["ids"]]
+        stale_ids += [chunk_id for rel, *_ in changed if rel in manifest for chunk_id in manifest[rel]["ids"]]
+        for rel in removed:
+            del manifest[rel]
+        stats.removed = len(removed)
+
+        pages = self._extract_all(changed) if changed else {}
+        pending = []
+        for rel, _, digest, status in changed:
+            if rel not in pages:
+                stats.failed += 1
+                continue
+            texts, metadatas, ids = self._chunk(rel, digest, pages[rel])
+            pending.append((rel, digest, status, texts, metadatas, ids))
+
+        texts, metadatas, ids = [], [], []
+        for _, _, _, chunk_texts, chunk_metadatas, chunk_ids in pending:
+            texts.extend(chunk_texts)
+            metadatas.extend(chunk_metadatas)
+            ids.extend(chunk_ids)
+
+        if vector_store is not None:
+            # Ids left over from an interrupted run would collide with the new ones
+            indexed = set(vector_store.index_to_docstore_id.values())
+            stale_ids = [chunk_id for chunk_id in dict.fromkeys(stale_ids + ids) if chunk_id in indexed]
+            if stale_ids:
+                vector_store.delete(stale_ids)
+                stats.chunks_deleted = len(stale_ids)
+
+        for offset in range(0, len(texts), self.batch_size):
+            batch = slice(offset, offset + self.batch_size)
+            logger.info(f"Embedding chunks {offset + 1}-{min(offset + self.batch_size, len(texts))} of {len(texts)}")
+            vectors = self.embeddings.embed_documents(texts[batch])
+            pairs = list(zip(texts[batch], vectors))
+            if vector_store is None:
+                vector_store = FAISS.from_embeddings(pairs, self.embeddings, metadatas=metadatas[batch], ids=ids[batch])
+            else:
+                vector_store.add_embeddings(pairs, metadatas=metadatas[batch], ids=ids[batch])
+        stats.chunks_embedded = len(texts)
+
+        for rel, digest, status, _, _, chunk_ids in pending:
+            # Recorded with the stat taken before hashing, so edits made since are picked up next run
+            if rel in manifest:
+                stats.updated += 1
+            else:
+                stats.added += 1
+            manifest[rel] = {"sha256": digest, "size": status.st_size, "mtime": status.st_mtime, "ids": chunk_ids}
+
+        if vector_store is not None and (pending or stats.chunks_deleted):
+            vector_store.save_local(self.vector_store_path)
+        self._save_manifest(manifest)
+        stats.seconds = time.perf_counter() - start
+        logger.info(f"Document ingestion finished: {asdict(stats)}")
+        return vector_store, stats
+
+def main():
+    from src.agents.resources import _load_or_create_vector_store
+    from src.utils.embeddings import create_embeddings
+
+    parser = argparse.ArgumentParser(description="Index new and changed documents into the vector store.")
+    parser.add_argument("--documents", default=app_config.documents_path)
+    parser.add_argument("--batch-size", type=int, default=app_config.embedding_batch_size)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    embeddings = create_embeddings()
+    ingestor = DocumentIngestor(embeddings, documents_path=args.documents,
+                                batch_size=args.batch_size, max_workers=args.workers)
+    # Ingestion adds to the store, so it is loaded into memory even if VECTOR_STORE_MMAP is set
+    _, stats = ingestor.ingest(_load_or_create_vector_store(embeddings, mmap=False))
+    print(json.dumps(asdict(stats), indent=2))
+
+if __name__ == "__main__":
+    main()
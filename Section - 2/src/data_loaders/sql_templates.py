@@ -0,0 +1,244 @@
+import hashlib
+import re
+import threading
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from psycopg2 import errors
+from psycopg2.extras import DictCursor
+
+from src.utils.semantic_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+# Tables generated SQL may read from before it is promoted to a template
+ALLOWED_TABLES = {"user_workouts", "fitness_metrics"}
+
+# PostgreSQL types of template parameters, by name
+PARAM_TYPES = {"user_id": "integer"}
+
+@dataclass(frozen=True)
+class SQLTemplate:
+    """A parameterized query, prepared once per connection and then executed.
+
+    sql uses PostgreSQL positional parameters ($1, $2, ...) bound to params
+    in order. A question matches the template when every regex in patterns
+    is found in the normalized question. Guarded templates hold SQL the LLM
+    wrote and keep running with a statement timeout and row limit.
+    """
+    name: str
+    sql: str
+    params: Tuple[str, ...] = ("user_id",)
+    patterns: Tuple[str, ...] = ()
+    guarded: bool = False
+
+    def matches(self, normalized: str) -> bool:
+        return bool(self.patterns) and all(re.search(pattern, normalized) for pattern in self.patterns)
+
+# Recurring personal-data intents, checked in order
+DEFAULT_TEMPLATES = (
+    SQLTemplate(
+        name="workouts_this_week",
+        sql="""SELECT workout_date, workout_type, duration_minutes, calories_burned,
+                      heart_rate_avg, completion_status, notes
+               FROM user_workouts
+               WHERE user_id = $1 AND workout_date >= date_trunc('week', CURRENT_DATE)
+               ORDER BY workout_date""",
+        patterns=(r"\bthis week\b", r"\b(workouts?|train(ed|ing)?|exercis(e|ed|ing))\b")
+    ),
+    SQLTemplate(
+        name="total_calories",
+        sql="""SELECT SUM(calories_burned) AS total_calories, COUNT(*) AS workouts,
+                      MIN(workout_date) AS first_workout, MAX(workout_date) AS last_workout
+               FROM user_workouts
+               WHERE user_id = $1""",
+        patterns=(r"\b(total|overall|all time|in total)\b", r"\bcalories\b")
+    ),
+    SQLTemplate(
+        name="average_heart_rate_by_type",
+        sql="""SELECT workout_type, ROUND(AVG(heart_rate_avg)) AS avg_heart_rate, COUNT(*) AS workouts
+               FROM user_workouts
+               WHERE user_id = $1
+               GROUP BY workout_type
+               ORDER BY workout_type""",
+        patterns=(r"\b(average|avg|mean)\b", r"\bheart rate\b")
+    ),
+    SQLTemplate(
+        name="workout_history",
+        sql="""SELECT workout_date, workout_type, duration_minutes, calories_burned,
+                      heart_rate_avg, completion_status, notes
+               FROM user_workouts
+               WHERE user_id = $1
+               ORDER BY workout_date DESC
+               LIMIT 20""",
+        patterns=(r"\b(workout history|recent workouts|past workouts|my workouts)\b",)
+    ),
+)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+def parameterize_generated_sql(sql: str, user_id: int) -> Optional[str]:
+    """Validate LLM-generated SQL and bind its user filter to $1.
+
+    Accepts a single SELECT (or WITH ... SELECT) over the allowed tables in
+    which every read of user_workouts is filtered by the given user; returns
+    None otherwise. Checks run on the SQL with string literals blanked out.
+    Comments are rejected, as is any OR or NOT, since either could widen
+    the user filter (user_id = 26 OR 1=1).
+    """
+    cleaned = re.sub(r"^```(?:sql)?|```$", "", sql.strip(), flags=re.IGNORECASE).strip().rstrip(";").strip()
+    code = _STRING_LITERAL.sub("''", cleaned).lower()
+    if not cleaned or any(token in code for token in (";", "$", "--", "/*")) \
+            or not re.match(r"(select|with)\b", code) or re.search(r"\b(or|not)\b", code):
+        return None
+    tables = re.findall(r"\b(?:from|join)\s+([a-z_][a-z0-9_]*)", code)
+    if not tables or not set(tables) <= ALLOWED_TABLES:
+        return None
+    user_filter = re.compile(rf"\buser_id\s*=\s*{int(user_id)}\b", re.IGNORECASE)
+    # One filter per read, so a UNION or subquery cannot read user_workouts unfiltered
+    if len(user_filter.findall(code)) < tables.count("user_workouts"):
+        return None
+    return user_filter.sub("user_id = $1", cleaned)
+
+class SQLTemplateCache:
+    """Maps questions to parameterized SQL templates so most skip the LLM.
+
+    Built-in templates cover recurring intents. SQL the LLM generates for
+    other questions is validated, parameterized and promoted to a template
+    keyed by the normalized question once it has executed successfully; at
+    most max_promoted promoted templates are kept, least recently used first
+    out. One cache is shared by all sessions, so it is thread-safe.
+    """
+
+    def __init__(self, templates: Tuple[SQLTemplate, ...] = DEFAULT_TEMPLATES, max_promoted: int = 500):
+        self.templates = templates
+        self.max_promoted = max_promoted
+        self._promoted: "OrderedDict[str, SQLTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.template_hits = 0
+        self.promoted_hits = 0
+        self.misses = 0
+
+    def match(self, question: str) -> Optional[SQLTemplate]:
+        """Template for a question, or None when the LLM must write the SQL."""
+        normalized = normalize_question(question)
+        with self._lock:
+            template = self._promoted.get(normalized)
+            if template:
+                self._promoted.move_to_end(normalized)
+                self.promoted_hits += 1
+                return template
+            for template in self.templates:
+                if template.matches(normalized):
+                    self.template_hits += 1
+                    return template
+            self.misses += 1
+        return None
+
+    def promote(self, question: str, sql: str, user_id: int) -> Optional[SQLTemplate]:
+        """Turn generated SQL that ran successfully into a template for the question."""
+        parameterized = parameterize_generated_sql(sql, user_id)
+        if parameterized is None:
+            logger.info("Generated SQL failed validation, not promoting it to a template")
+            return None
+        normalized = normalize_question(question)
+        digest = hashlib.sha1(parameterized.encode("utf-8")).hexdigest()[:12]
+        params = ("user_id",) if "$1" in parameterized else ()
+        template = SQLTemplate(name=f"generated_{digest}", sql=parameterized, params=params, guarded=True)
+        with self._lock:
+            self._promoted[normalized] = template
+            self._promoted.move_to_end(normalized)
+            while len(self._promoted) > self.max_promoted:
+                self._promoted.popitem(last=False)
+        logger.info(f"Promoted generated SQL to template {template.name}")
+        return template
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "template_hits": self.template_hits,
+            "promoted_hits": self.promoted_hits,
+            "misses": self.misses,
+            "promoted_templates": len(self._promoted)
+        }
+
+class PreparedStatements:
+    """Server-side prepared statements for templates on one connection.
+
+    Each template is sent with PREPARE the first time it runs on the
+    connection, so PostgreSQL parses and plans it once; later runs only
+    send EXECUTE with the parameter values. Statements live as long as the
+    connection, so a new connection needs a new PreparedStatements.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._prepared = set()
+
+    def execute(self, template: SQLTemplate, values: Dict[str, Any]) -> List[Dict]:
+        cursor = self.connection.cursor(cursor_factory=DictCursor)
+        try:
+            self._run(cursor, template, values)
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def iter_execute(self, template: SQLTemplate, values: Dict[str, Any], timeout_ms: int,
+                     max_rows: int, chunk_size: int = 1000) -> Iterator[List[Dict]]:
+        """Run a template with the guards of iter_guarded, yielding rows in chunks.
+
+        The statement runs in a read-only transaction under SET LOCAL
+        statement_timeout and is prepared with a LIMIT of max_rows + 1, so
+        callers can tell whether the result was cut off. EXECUTE cannot back a server-side cursor, so the driver
+        buffers the capped result and it is handed on chunk_size rows at a
+        time.
+        """
+        cursor = self.connection.cursor(cursor_factory=DictCursor)
+        try:
+            self._run(cursor, template, values, timeout_ms=timeout_ms, limit=int(max_rows) + 1)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [dict(row) for row in rows]
+        finally:
+            cursor.close()
+
+    def _run(self, cursor, template: SQLTemplate, values: Dict[str, Any],
+             timeout_ms: int = None, limit: int = None):
+        try:
+            self._execute(cursor, template, values, timeout_ms, limit)
+        except errors.InvalidSqlStatementName:
+            # The server no longer has the statement; prepare it again
+            self.connection.rollback()
+            self._prepared.discard(self._name(template, limit))
+            self._execute(cursor, template, values, timeout_ms, limit)
+
+    @staticmethod
+    def _name(template: SQLTemplate, limit: Optional[int]) -> str:
+        return template.name if limit is None else f"{template.name}_limited"
+
+    def _execute(self, cursor, template: SQLTemplate, values: Dict[str, Any],
+                 timeout_ms: Optional[int], limit: Optional[int]):
+        if timeout_ms is not None:
+            cursor.execute("SET TRANSACTION READ ONLY")
+            cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+        name = self._name(template, limit)
+        args = [values[param] for param in template.params]
+        if name not in self._prepared:
+            types = [PARAM_TYPES[param] for param in template.params]
+            sql = template.sql
+            if limit is not None:
+                # The limit is a parameter too, so one statement serves any max_rows
+                sql = f"SELECT * FROM ({sql}) AS limited LIMIT ${len(types) + 1}"
+                types.append("bigint")
+            signature = f" ({', '.join(types)})" if types else ""
+            cursor.execute(f"PREPARE {name}{signature} AS {sql}")
+            self._prepared.add(name)
+        if limit is not None:
+            args.append(limit)
+        if args:
+            cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(args))})", tuple(args))
+        else:
+            cursor.execute(f"EXECUTE {name}")
@@ -0,0 +1,147 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from how i in is it my of on or so that the
+this to was what when which with you your me we our should
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords."""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of chunks, stored as CSR postings.
+
+    Each term's postings are a contiguous slice of two flat arrays, the
+    chunk rows containing it and its frequency in each, so scoring a query
+    is a few vectorized slices. Rows line up with the FAISS index positions
+    the chunks were built from, and metadatas holds each row's metadata for
+    pre-filtering. save writes the arrays as .npy files in a new version
+    directory and then points CURRENT at it, and load maps them read-only.
+    """
+
+    def __init__(self, vocabulary: Dict[str, Tuple[int, int]], postings_rows: np.ndarray,
+                 postings_tf: np.ndarray, doc_lengths: np.ndarray, doc_ids: List[str],
+                 metadatas: List[Dict], k1: float = 1.5, b: float = 0.75, stamp: str = ""):
+        self.vocabulary = vocabulary
+        self.postings_rows = postings_rows
+        self.postings_tf = postings_tf
+        self.doc_lengths = doc_lengths
+        self.doc_ids = doc_ids
+        self.metadatas = metadatas
+        self.k1 = k1
+        self.b = b
+        self.stamp = stamp
+        self.avgdl = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, doc_ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[Dict],
+              k1: float = 1.5, b: float = 0.75, stamp: str = "") -> "BM25Index":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths[row] = sum(counts.values())
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((row, count))
+        vocabulary = {}
+        rows, tfs = [], []
+        offset = 0
+        for term in sorted(postings):
+            entries = postings[term]
+            vocabulary[term] = (offset, len(entries))
+            rows.extend(row for row, _ in entries)
+            tfs.extend(count for _, count in entries)
+            offset += len(entries)
+        return cls(vocabulary, np.asarray(rows, dtype=np.int32), np.asarray(tfs, dtype=np.float32),
+                   doc_lengths, list(doc_ids), list(metadatas), k1, b, stamp)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every row for the query."""
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        if not len(self.doc_ids):
+            return scores
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / self.avgdl)
+        for term in set(tokenize(query)):
+            if term not in self.vocabulary:
+                continue
+            offset, df = self.vocabulary[term]
+            rows = self.postings_rows[offset:offset + df]
+            tf = self.postings_tf[offset:offset + df]
+            idf = np.log(1 + (len(self.doc_ids) - df + 0.5) / (df + 0.5))
+            # Each row appears once per term, so plain fancy-index addition is safe
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm[rows])
+        return scores
+
+    def search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Top k (row, score) pairs with a positive score, limited to allowed rows if given."""
+        scores = self.scores(query)
+        if allowed is not None:
+            scores = np.where(allowed, scores, 0)
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(row), float(scores[row])) for row in order]
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        version = tempfile.mkdtemp(prefix="index-", dir=directory)
+        np.save(os.path.join(version, "postings_rows.npy"), self.postings_rows)
+        np.save(os.path.join(version, "postings_tf.npy"), self.postings_tf)
+        np.save(os.path.join(version, "doc_lengths.npy"), self.doc_lengths)
+        meta = {
+            "vocabulary": self.vocabulary,
+            "doc_ids": self.doc_ids,
+            "metadatas": self.metadatas,
+            "k1": self.k1,
+            "b": self.b,
+            "stamp": self.stamp
+        }
+        with open(os.path.join(version, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        # Readers only ever see a finished version, never files being overwritten
+        tmp_path = os.path.join(directory, "CURRENT.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(os.path.basename(version))
+        os.replace(tmp_path, os.path.join(directory, "CURRENT"))
+        for name in os.listdir(directory):
+            if name.startswith("index-") and name != os.path.basename(version):
+                # Open memory maps of an old version stay valid after it is removed
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        """Load a saved index with its arrays memory-mapped, or None if there is none."""
+        current_path = os.path.join(directory, "CURRENT")
+        if not os.path.exists(current_path):
+            return None
+        try:
+            with open(current_path) as f:
+                version = os.path.join(directory, f.read().strip())
+            with open(os.path.join(version, "meta.json")) as f:
+                meta = json.load(f)
+            arrays = [np.load(os.path.join(version, name), mmap_mode="r")
+                      for name in ("postings_rows.npy", "postings_tf.npy", "doc_lengths.npy")]
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable BM25 index in {directory}: {e}")
+            return None
+        vocabulary = {term: tuple(entry) for term, entry in meta["vocabulary"].items()}
+        return cls(vocabulary, *arrays, meta["doc_ids"], meta["metadatas"],
+                   meta["k1"], meta["b"], meta["stamp"])
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config.config import app_config
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+logger = logging.getLogger(__name__)
+
+KEY_SIZE = 16
+
+class LocalEmbeddings(Embeddings):
+    """CPU sentence-transformers model, so embedding needs no network calls.
+
+    Texts are encoded in batches of batch_size and vectors are normalized,
+    so inner product equals cosine similarity.
+    """
+
+    def __init__(self, model_name: str = None, batch_size: int = 32, device: str = "cpu"):
+        if SentenceTransformer is None:
+            raise ImportError("EMBEDDING_PROVIDER=local requires the optional sentence-transformers package: "
+                              "pip install sentence-transformers, or set EMBEDDING_PROVIDER=openai")
+        self.model_name = model_name or app_config.local_embedding_model
+        self.batch_size = batch_size
+        logger.info(f"Loading local embedding model {self.model_name}...")
+        self.model = SentenceTransformer(self.model_name, device=device)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size,
+                                    normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+class EmbeddingCache:
+    """Append-only on-disk embedding store keyed by text hash.
+
+    keys.bin holds 16-byte BLAKE2b digests and vectors.f32 the float32
+    vectors, row for row; vectors are read through a read-only memory map,
+    so the cache costs little memory however large it grows. Vectors are
+    written before their keys, so a write cut short leaves orphan rows that
+    are trimmed on the next load. Each namespace (one per embedding model)
+    has its own directory. Meant for a single writing process.
+    """
+
+    def __init__(self, path: str, namespace: str):
+        self.directory = os.path.join(path, re.sub(r"[^\w.-]+", "_", namespace))
+        os.makedirs(self.directory, exist_ok=True)
+        self._keys_path = os.path.join(self.directory, "keys.bin")
+        self._vectors_path = os.path.join(self.directory, "vectors.f32")
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        self.dimensions: Optional[int] = None
+        self._rows: Dict[bytes, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._load()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+    def _load(self):
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self.dimensions = json.load(f)["dimensions"]
+        if not self.dimensions or not os.path.exists(self._keys_path):
+            return
+        with open(self._keys_path, "rb") as f:
+            keys = f.read()
+        row_bytes = self.dimensions * 4
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        rows = min(len(keys) // KEY_SIZE, size // row_bytes)
+        # Trim whatever an interrupted write left behind
+        if len(keys) != rows * KEY_SIZE:
+            os.truncate(self._keys_path, rows * KEY_SIZE)
+        if size != rows * row_bytes:
+            os.truncate(self._vectors_path, rows * row_bytes)
+        self._rows = {keys[row * KEY_SIZE:(row + 1) * KEY_SIZE]: row for row in range(rows)}
+        self._map()
+        logger.info(f"Loaded {rows} cached embeddings from {self.directory}")
+
+    def _map(self):
+        rows = len(self._rows)
+        self._vectors = (np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimensions))
+                         if rows else None)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        return None if row is None else np.array(self._vectors[row])
+
+    def put_many(self, keys: Sequence[bytes], vectors: np.ndarray):
+        """Append vectors for keys not yet cached."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dimensions is None:
+            self.dimensions = int(vectors.shape[1])
+            with open(self._meta_path, "w") as f:
+                json.dump({"dimensions": self.dimensions}, f)
+        new = {}
+        for i, key in enumerate(keys):
+            if key not in self._rows:
+                new.setdefault(key, i)
+        new = list(new.values())
+        if not new:
+            return
+        with open(self._vectors_path, "ab") as f:
+            f.write(vectors[new].tobytes())
+        with open(self._keys_path, "ab") as f:
+            f.write(b"".join(keys[i] for i in new))
+        for i in new:
+            self._rows[keys[i]] = len(self._rows)
+        self._map()
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings served from an EmbeddingCache, computing only the misses.
+
+    Indexing and queries share the cache, so a text is embedded once per
+    model. Misses are sent to the wrapped embedder in batches of batch_size.
+    """
+
+    def __init__(self, embedder, cache: EmbeddingCache, batch_size: int = 64):
+        self.embedder = embedder
+        self.cache = cache
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingCache.key(text) for text in texts]
+        with self._lock:
+            vectors = [self.cache.get(key) for key in keys]
+        first = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                first.setdefault(keys[i], i)
+        missing = list(first.values())
+        for offset in range(0, len(missing), self.batch_size):
+            batch = missing[offset:offset + self.batch_size]
+            computed = np.asarray(self.embedder.embed_documents([texts[i] for i in batch]), dtype=np.float32)
+            with self._lock:
+                self.cache.put_many([keys[i] for i in batch], computed)
+            for i, vector in zip(batch, computed):
+                vectors[i] = vector
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                # Duplicate of a text computed above
+                vectors[i] = vectors[first[keys[i]]]
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [vector.tolist() for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.cache)}
+
+def create_embeddings() -> Embeddings:
+    """The embedder selected by EMBEDDING_PROVIDER, wrapped in the on-disk cache if enabled."""
+    if app_config.embedding_provider == "local":
+        embedder = LocalEmbeddings()
+        namespace = f"local-{embedder.model_name}"
+    else:
+        from langchain_openai import OpenAIEmbeddings
+        embedder = OpenAIEmbeddings()
+        namespace = f"openai-{embedder.model}"
+    if not app_config.embedding_cache_enabled:
+        return embedder
+    return CachedEmbeddings(embedder, EmbeddingCache(app_config.embedding_cache_path, namespace),
+                            batch_size=app_config.embedding_batch_size)
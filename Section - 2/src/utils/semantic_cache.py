@@ -0,0 +1,183 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_question(question: str) -> str:
+    """Lowercase a question and strip punctuation and repeated whitespace."""
+    question = _PUNCTUATION.sub(" ", question.lower())
+    return _WHITESPACE.sub(" ", question).strip()
+
+@dataclass
+class CacheEntry:
+    namespace: Tuple
+    question: str
+    embedding: np.ndarray
+    answer: str
+    created: float
+    latency: float
+
+class SemanticCache:
+    """Answers to previously seen questions, matched by embedding similarity.
+
+    Questions are normalized and embedded, then compared by cosine
+    similarity against cached questions in the same namespace, a
+    (user_id, freshness) pair, so one user's answers are never served to
+    another and answers built from older data are never served once the data
+    changes. Entries expire after ttl seconds and the least recently used
+    entry is evicted beyond max_entries. Hits record the latency of the
+    original computation, which is the time they saved.
+    """
+
+    def __init__(self, embed: Callable[[str], List[float]], threshold: float = 0.92,
+                 ttl: float = 3600.0, max_entries: int = 1000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        # Per-namespace index: entry ids and their unit embeddings, row for row
+        self._index: Dict[Tuple, Tuple[List[int], np.ndarray]] = {}
+        self._exact: Dict[Tuple, int] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    def _embedding(self, normalized: str) -> np.ndarray:
+        vector = np.asarray(self.embed(normalized), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        ids, matrix = self._index[entry.namespace]
+        row = ids.index(entry_id)
+        ids.pop(row)
+        if ids:
+            self._index[entry.namespace] = (ids, np.delete(matrix, row, axis=0))
+        else:
+            del self._index[entry.namespace]
+        self._exact.pop(entry.namespace + (entry.question,), None)
+
+    def _live(self, entry_id: Optional[int]) -> Optional[CacheEntry]:
+        """The entry if it exists and has not expired; expired entries are removed."""
+        if entry_id is None or entry_id not in self._entries:
+            return None
+        entry = self._entries[entry_id]
+        if self.clock() - entry.created > self.ttl:
+            self._remove(entry_id)
+            return None
+        self._entries.move_to_end(entry_id)
+        return entry
+
+    def _nearest(self, namespace: Tuple, embedding: np.ndarray) -> Optional[CacheEntry]:
+        """Most similar live entry at or above the threshold."""
+        if namespace not in self._index:
+            return None
+        ids, matrix = self._index[namespace]
+        scores = matrix @ embedding
+        candidates = [ids[row] for row in np.argsort(-scores, kind="stable") if scores[row] >= self.threshold]
+        # An expired best match must not hide a live one just below it
+        for entry_id in candidates:
+            entry = self._live(entry_id)
+            if entry:
+                return entry
+        return None
+
+    def lookup(self, question: str, user_id: Hashable = None, freshness: Hashable = None) -> Optional[str]:
+        """Cached answer for a question similar enough to this one, or None."""
+        return self.search(question, user_id, freshness)[0]
+
+    def search(self, question: str, user_id: Hashable = None,
+               freshness: Hashable = None) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Like lookup, but also return the question's embedding if it was computed.
+
+        Passing the embedding on to store saves embedding the question
+        again when the answer is cached after a miss.
+        """
+        normalized = normalize_question(question)
+        namespace = (user_id, freshness)
+        embedding = None
+        with self._lock:
+            entry = self._live(self._exact.get(namespace + (normalized,)))
+            searchable = entry is None and namespace in self._index
+        if searchable:
+            # Embedding may be an API call, so it runs without holding the lock
+            embedding = self._embedding(normalized)
+            with self._lock:
+                entry = self._nearest(namespace, embedding)
+        with self._lock:
+            self._record(entry)
+        return (entry.answer if entry else None), embedding
+
+    def _record(self, entry: Optional[CacheEntry]):
+        if entry:
+            self.hits += 1
+            self.saved_seconds += entry.latency
+        else:
+            self.misses += 1
+
+    def store(self, question: str, answer: str, user_id: Hashable = None,
+              freshness: Hashable = None, latency: float = 0.0,
+              embedding: Optional[np.ndarray] = None):
+        """Cache an answer, evicting the least recently used entry if full.
+
+        embedding is the one search returned for the question, if any.
+        """
+        normalized = normalize_question(question)
+        namespace = (user_id, freshness)
+        if embedding is None:
+            embedding = self._embedding(normalized)
+        with self._lock:
+            existing = self._exact.get(namespace + (normalized,))
+            if existing is not None:
+                self._remove(existing)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = CacheEntry(namespace, normalized, embedding, answer, self.clock(), latency)
+            self._exact[namespace + (normalized,)] = entry_id
+            ids, matrix = self._index.get(namespace, ([], np.zeros((0, len(embedding)), dtype=np.float32)))
+            self._index[namespace] = (ids + [entry_id], np.vstack([matrix, embedding[None, :]]))
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, user_id: Hashable = None):
+        """Drop every entry for a user."""
+        with self._lock:
+            for entry_id in [entry_id for entry_id, entry in self._entries.items()
+                             if entry.namespace[0] == user_id]:
+                self._remove(entry_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self._exact.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate, saved latency and size counters."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'saved_seconds': self.saved_seconds,
+            'entries': len(self._entries),
+            'evictions': self.evictions
+        }
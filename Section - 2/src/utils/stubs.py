@@ -0,0 +1,73 @@
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+from typing import Iterator, List
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+@dataclass
+class StubMessage:
+    """Stand-in for a LangChain chat message."""
+    content: str
+
+class StubLLM:
+    """Local stand-in for ChatOpenAI with a fixed latency per call.
+
+    Answers echo the end of the prompt, so benchmarks and offline runs can
+    exercise the chatbot's flow and measure time saved by caching without
+    network access or API keys. stream yields the answer word by word, the
+    first after latency and the rest token_latency apart.
+    """
+
+    def __init__(self, latency: float = 0.5, token_latency: float = 0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.calls = 0
+
+    def _answer(self, prompt: str) -> str:
+        if "SQL Query:" in prompt:
+            return "SELECT * FROM user_workouts WHERE user_id = 26"
+        return f"Stub answer to: {prompt.strip()[-200:]}"
+
+    def invoke(self, prompt: str) -> StubMessage:
+        self.calls += 1
+        time.sleep(self.latency)
+        return StubMessage(self._answer(prompt))
+
+    def stream(self, prompt: str) -> Iterator[StubMessage]:
+        self.calls += 1
+        time.sleep(self.latency)
+        for i, word in enumerate(self._answer(prompt).split(" ")):
+            if i:
+                time.sleep(self.token_latency)
+            yield StubMessage(word if i == 0 else " " + word)
+
+class StubEmbeddings:
+    """Deterministic local embedder: hashed bag of words and word bigrams.
+
+    Texts sharing most of their words get cosine similarities near 1, which
+    is enough to exercise similarity lookups. Implements the embed_query and
+    embed_documents methods of LangChain embeddings.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def _bucket(self, feature: str) -> int:
+        digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') % self.dimensions
+
+    def embed_query(self, text: str) -> List[float]:
+        tokens = _TOKEN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in features:
+            vector[self._bucket(feature)] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
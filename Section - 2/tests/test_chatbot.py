@@ -0,0 +1,70 @@
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.agents import memory
+from src.agents.chatbot import FitnessChatbot
+from src.agents.resources import ChatbotResources
+from src.data_loaders.sql_templates import SQLTemplateCache
+from src.utils.semantic_cache import SemanticCache
+from src.utils.stubs import StubEmbeddings, StubLLM
+
+class CountingChatbot(FitnessChatbot):
+    """FitnessChatbot with the database replaced, counting the context it gathers."""
+
+    calls = []
+
+    def _plan(self, user_input: str):
+        return True, True
+
+    def _data_freshness(self, use_vector_store: bool, use_user_data: bool):
+        return "fixed"
+
+    def _retrieve(self, user_input: str, filter=None):
+        self.calls.append("retrieve")
+        return []
+
+    def _fetch_user_data(self, user_question: str):
+        self.calls.append("fetch")
+        return None
+
+@pytest.fixture
+def resources(monkeypatch):
+    # tiktoken cannot download its encodings offline
+    monkeypatch.setattr(memory, "token_counter", lambda model_name=None: lambda text: len(text.split()))
+    embed = StubEmbeddings().embed_query
+    embedded = []
+    cache = SemanticCache(lambda text: embedded.append(text) or embed(text))
+    resources = ChatbotResources(llm=StubLLM(latency=0), embeddings=None, vector_store=None, db_pool=None,
+                                 sql_templates=SQLTemplateCache(), response_cache=cache,
+                                 executor=ThreadPoolExecutor(max_workers=2))
+    CountingChatbot.calls = []
+    yield resources, embedded
+    resources.executor.shutdown()
+
+def test_cache_hit_gathers_no_context(resources):
+    resources, _ = resources
+    question = "What are some nutrition tips?"
+
+    first = "".join(CountingChatbot(resources=resources).stream_response(question))
+    assert CountingChatbot.calls == ["retrieve", "fetch"] or CountingChatbot.calls == ["fetch", "retrieve"]
+
+    chatbot = CountingChatbot(resources=resources)
+    assert "".join(chatbot.stream_response("what are some nutrition tips")) == first
+    assert chatbot.metrics[-1].cached
+    resources.executor.shutdown(wait=True)
+    assert len(CountingChatbot.calls) == 2
+
+def test_miss_embeds_the_question_once(resources):
+    resources, embedded = resources
+    "".join(CountingChatbot(resources=resources).stream_response("What are some nutrition tips?"))
+    embedded.clear()
+
+    "".join(CountingChatbot(resources=resources).stream_response("How do I improve my squat technique?"))
+
+    assert embedded == ["how do i improve my squat technique"]
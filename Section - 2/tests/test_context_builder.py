@@ -0,0 +1,75 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.agents.context_builder import SQLContextBuilder
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+def workouts(count: int):
+    types = ["Running", "Cycling", "Yoga"]
+    return [{"id": i, "user_id": 26, "workout_date": f"2024-{1 + i % 6:02d}-{1 + i % 28:02d}",
+             "workout_type": types[i % 3], "calories_burned": 100 + i} for i in range(count)]
+
+def build(rows, budget, chunk_size=7, **kwargs):
+    builder = SQLContextBuilder(token_budget=budget, sample_rows=5, verbatim_rows=10,
+                                count_tokens=count_words, **kwargs)
+    return builder.build(rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size))
+
+def test_small_result_is_passed_through_verbatim():
+    context = build(workouts(3), budget=1000)
+
+    assert not context.summarized and context.rows == 3
+    assert context.text.splitlines()[0] == "id | user_id | workout_date | workout_type | calories_burned"
+    assert context.text.splitlines()[1] == "0 | 26 | 2024-01-01 | Running | 100"
+
+def test_large_result_is_summarized_within_the_budget():
+    context = build(workouts(100), budget=1000)
+    lines = context.text.splitlines()
+
+    assert context.summarized and context.rows == 100
+    assert lines[0] == "Summary of 100 rows from 2024-01-01 to 2024-06-28."
+    assert "calories_burned: total 14,950, avg 149.5, min 100, max 199" in lines
+    assert "Running: 34 rows, avg calories_burned 149.5" in lines
+    assert "2024-06: 16 rows, avg calories_burned 150" in lines
+    assert lines[-7:-4] == ["First 5 of the rows:", "id | user_id | workout_date | workout_type | calories_burned",
+                            "0 | 26 | 2024-01-01 | Running | 100"]
+    assert context.tokens <= 1000
+
+def test_tight_budget_leaves_room_for_the_more_note():
+    context = build(workouts(100), budget=70)
+    lines = context.text.splitlines()
+
+    assert context.tokens <= 70
+    assert any(line.startswith("... ") and line.endswith(" more periods") for line in lines)
+
+def test_sample_rows_are_dropped_rather_than_shown_as_a_bare_header():
+    context = build(workouts(100), budget=50)
+    lines = context.text.splitlines()
+
+    assert context.tokens <= 50
+    assert "First 5 of the rows:" not in lines
+    assert "id | user_id | workout_date | workout_type | calories_burned" not in lines
+
+def test_section_that_cannot_show_a_row_is_reduced_to_one_line():
+    rows = [{"id": i, "notes": f"note {i} about a long and tiring session on the track"} for i in range(100)]
+
+    context = build(rows, budget=20)
+
+    assert context.text.splitlines() == [
+        "Summary of 100 rows.",
+        "First 5 of the rows: left out to fit the token budget (5 rows).",
+    ]
+
+def test_max_rows_cuts_off_reading():
+    context = build(workouts(100), budget=1000, chunk_size=30)
+
+    assert context.rows == 100
+    builder = SQLContextBuilder(token_budget=1000, sample_rows=5, verbatim_rows=10, count_tokens=count_words)
+    rows = workouts(100)
+    cut = builder.build((rows[i:i + 30] for i in range(0, 100, 30)), max_rows=45)
+    assert cut.rows == 45 and cut.truncated
+    assert cut.text.startswith("Summary of 45 rows (cut off, more exist)")
@@ -0,0 +1,133 @@
+import sqlite3
+import sys
+import os
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.data_loaders.db_pool import ConnectionPool, guarded_query, iter_guarded
+from src.data_loaders.sql_templates import PreparedStatements, SQLTemplate
+
+@pytest.fixture
+def connection():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE user_workouts (id INTEGER PRIMARY KEY, user_id INTEGER, calories_burned INTEGER)")
+    connection.executemany("INSERT INTO user_workouts (user_id, calories_burned) VALUES (?, ?)",
+                           [(26, i) for i in range(250)])
+    yield connection
+    connection.close()
+
+def test_iter_guarded_yields_chunks_up_to_one_row_past_the_limit(connection):
+    chunks = list(iter_guarded(connection, "SELECT * FROM user_workouts;", 1000, max_rows=100, chunk_size=30))
+
+    assert [len(chunk) for chunk in chunks] == [30, 30, 30, 11]
+    assert chunks[0][0] == {"id": 1, "user_id": 26, "calories_burned": 0}
+
+def test_iter_guarded_returns_small_results_whole(connection):
+    chunks = list(iter_guarded(connection, "SELECT * FROM user_workouts WHERE id <= 5", 1000, max_rows=100))
+
+    assert sum(len(chunk) for chunk in chunks) == 5
+
+def test_guarded_query_reports_truncation(connection):
+    rows, truncated = guarded_query(connection, "SELECT * FROM user_workouts", 1000, 100)
+    assert len(rows) == 100 and truncated
+
+    rows, truncated = guarded_query(connection, "SELECT * FROM user_workouts", 1000, 250)
+    assert len(rows) == 250 and not truncated
+
+def test_iter_guarded_aborts_at_the_timeout(connection):
+    runaway = "SELECT COUNT(*) FROM user_workouts a, user_workouts b, user_workouts c"
+    with pytest.raises(sqlite3.OperationalError):
+        list(iter_guarded(connection, runaway, 50, max_rows=10))
+    # The progress handler is removed afterwards
+    assert connection.execute(runaway).fetchone() == (250 ** 3,)
+
+def test_iter_guarded_rejects_writes(connection):
+    def purge():
+        connection.execute("DELETE FROM user_workouts")
+        return 0
+    connection.create_function("purge", 0, purge)
+
+    with pytest.raises(sqlite3.OperationalError):
+        list(iter_guarded(connection, "SELECT purge() AS deleted", 1000, max_rows=10))
+    assert connection.execute("SELECT COUNT(*) FROM user_workouts").fetchone() == (250,)
+    # Writes outside the guard are allowed again
+    assert connection.execute("PRAGMA query_only").fetchone() == (0,)
+
+def test_pool_reuses_connections():
+    pool = ConnectionPool(lambda: sqlite3.connect(":memory:", check_same_thread=False), max_size=2)
+    for _ in range(5):
+        assert pool.fetch("SELECT 1 AS one") == [{"one": 1}]
+    assert pool.stats["connections_opened"] == 1
+    pool.close()
+
+class RecordingCursor:
+    description = (("n",),)
+
+    def __init__(self, log, rows):
+        self.log = log
+        self.rows = rows
+        self.itersize = None
+
+    def execute(self, sql, params=None):
+        self.log.append((sql, params))
+
+    def fetchmany(self, size):
+        chunk, self.rows[:] = self.rows[:size], self.rows[size:]
+        return chunk
+
+    def fetchall(self):
+        return self.fetchmany(len(self.rows))
+
+    def close(self):
+        pass
+
+class RecordingConnection:
+    """Records the SQL PreparedStatements sends, returning canned rows."""
+
+    def __init__(self, rows):
+        self.log = []
+        self.rows = rows
+
+    def cursor(self, name=None, cursor_factory=None):
+        return RecordingCursor(self.log, self.rows)
+
+def test_iter_guarded_runs_postgresql_queries_read_only():
+    connection = RecordingConnection([(1,), (2,)])
+
+    chunks = list(iter_guarded(connection, "SELECT n FROM user_workouts;", 500, max_rows=5))
+
+    assert chunks == [[{"n": 1}, {"n": 2}]]
+    assert connection.log == [
+        ("SET TRANSACTION READ ONLY", None),
+        ("SET LOCAL statement_timeout = %s", (500,)),
+        ("SELECT * FROM (SELECT n FROM user_workouts) AS guarded LIMIT 6", None),
+    ]
+
+def test_guarded_template_runs_with_timeout_and_limit():
+    connection = RecordingConnection([{"n": i} for i in range(7)])
+    template = SQLTemplate(name="generated_abc", sql="SELECT n FROM user_workouts WHERE user_id = $1", guarded=True)
+
+    chunks = list(PreparedStatements(connection).iter_execute(template, {"user_id": 26}, timeout_ms=500,
+                                                              max_rows=5, chunk_size=4))
+
+    assert [len(chunk) for chunk in chunks] == [4, 3]
+    assert connection.log == [
+        ("SET TRANSACTION READ ONLY", None),
+        ("SET LOCAL statement_timeout = %s", (500,)),
+        ("PREPARE generated_abc_limited (integer, bigint) AS "
+         "SELECT * FROM (SELECT n FROM user_workouts WHERE user_id = $1) AS limited LIMIT $2", None),
+        ("EXECUTE generated_abc_limited (%s, %s)", (26, 6)),
+    ]
+
+def test_prepared_statement_is_prepared_once_per_connection():
+    connection = RecordingConnection([])
+    template = SQLTemplate(name="history", sql="SELECT 1 WHERE $1 > 0")
+    prepared = PreparedStatements(connection)
+
+    prepared.execute(template, {"user_id": 26})
+    prepared.execute(template, {"user_id": 26})
+
+    assert [sql for sql, _ in connection.log].count("PREPARE history (integer) AS SELECT 1 WHERE $1 > 0") == 1
@@ -0,0 +1,37 @@
+import sys
+import os
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils import embeddings
+from src.utils.embeddings import CachedEmbeddings, EmbeddingCache, LocalEmbeddings
+from src.utils.stubs import StubEmbeddings
+
+def test_local_embeddings_without_sentence_transformers(monkeypatch):
+    monkeypatch.setattr(embeddings, "SentenceTransformer", None)
+
+    with pytest.raises(ImportError, match="pip install sentence-transformers"):
+        LocalEmbeddings()
+
+class CountingEmbeddings(StubEmbeddings):
+    def __init__(self):
+        super().__init__(dimensions=16)
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self.embed_query(text) for text in texts]
+
+def test_cached_embeddings_embed_each_text_once_across_reopens(tmp_path):
+    embedder = CountingEmbeddings()
+    cached = CachedEmbeddings(embedder, EmbeddingCache(str(tmp_path), "stub"), batch_size=2)
+
+    first = cached.embed_documents(["squat", "deadlift", "squat", "bench"])
+    reopened = CachedEmbeddings(embedder, EmbeddingCache(str(tmp_path), "stub"))
+
+    assert embedder.embedded == ["squat", "deadlift", "bench"]
+    assert reopened.embed_documents(["bench", "squat"]) == [first[3], first[0]]
+    assert embedder.embedded == ["squat", "deadlift", "bench"]
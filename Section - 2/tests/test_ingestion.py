@@ -0,0 +1,53 @@
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.data_loaders.ingestion import DocumentIngestor
+
+def write_pdf(path: str, texts):
+    """Write a minimal PDF with one line of text per page."""
+    pages = len(texts)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(pages))
+               + b"] /Count %d >>" % pages,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for i, text in enumerate(texts):
+        stream = b"BT /F1 12 Tf 72 720 Td (" + text.encode() + b") Tj ET"
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    data, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(data)
+
+def test_large_pdf_is_split_into_page_ranges(tmp_path):
+    texts = [f"Page {i} squat notes" for i in range(7)]
+    big, small, notes = tmp_path / "big.pdf", tmp_path / "small.pdf", tmp_path / "notes.txt"
+    write_pdf(str(big), texts)
+    write_pdf(str(small), ["Only page"])
+    notes.write_text("Plain notes")
+    ingestor = DocumentIngestor(embeddings=None, vector_store_path=str(tmp_path / "store"),
+                                documents_path=str(tmp_path), max_workers=2, pages_per_task=3)
+
+    pages = ingestor._extract_all([("big.pdf", str(big)), ("small.pdf", str(small)), ("notes.txt", str(notes))])
+
+    assert [page.strip() for page in pages["big.pdf"]] == texts
+    assert [page.strip() for page in pages["small.pdf"]] == ["Only page"]
+    assert pages["notes.txt"] == ["Plain notes"]
+
+def test_unreadable_pdf_is_skipped(tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    ingestor = DocumentIngestor(embeddings=None, vector_store_path=str(tmp_path / "store"),
+                                documents_path=str(tmp_path))
+
+    assert ingestor._extract_all([("broken.pdf", str(broken))]) == {}
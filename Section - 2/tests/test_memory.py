@@ -0,0 +1,126 @@
+import sys
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.agents.memory import ConversationMemory, compact_rows
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+def make_memory(summarize=None, **kwargs):
+    calls = []
+
+    def record(summary, transcript):
+        calls.append((summary, transcript))
+        return f"summary of {transcript.count(': ')} messages"
+
+    options = dict(max_tokens=100, summary_tokens=20, facts_tokens=20, count_tokens=count_words)
+    options.update(kwargs)
+    return ConversationMemory(summarize or record, **options), calls
+
+def sentence(i: int) -> str:
+    return f"message {i} " + "word " * 8
+
+def test_compact_rows():
+    assert compact_rows([{"a": 1.25, "b": None}, {"a": 2.0, "b": "x"}]) == ["a | b", "1.2 | ", "2 | x"]
+
+def test_turns_within_budget_are_kept_verbatim():
+    memory, calls = make_memory()
+    memory.add_turn("How many workouts?", "Three this week.")
+
+    assert calls == []
+    assert memory.context() == "Recent conversation:\nUser: How many workouts?\nCoach: Three this week."
+
+def test_oldest_half_is_folded_into_the_summary():
+    memory, calls = make_memory()
+    for i in range(3):
+        memory.add_turn(sentence(2 * i), sentence(2 * i + 1))
+
+    # Three exchanges are 60 tokens, exactly the turn budget; a fourth goes over it
+    assert calls == []
+    memory.add_turn(sentence(6), sentence(7))
+
+    assert len(calls) == 1
+    summary, transcript = calls[0]
+    assert summary == "" and transcript.startswith("User: message 0") and "message 3" in transcript
+    stats = memory.stats()
+    assert stats["turns"] == 4 and stats["turn_tokens"] == 40
+    assert memory.context().startswith("Summary of the earlier conversation:\nsummary of 4 messages")
+
+def test_oversized_summary_is_summarized_again():
+    def verbose(summary, transcript):
+        return "long " * 30 if summary or transcript.startswith("User") else "short"
+
+    memory, _ = make_memory(summarize=verbose)
+    for i in range(4):
+        memory.add_turn(sentence(2 * i), sentence(2 * i + 1))
+
+    assert memory.summary == "short"
+
+def test_failed_summary_keeps_the_recent_text():
+    def failing(summary, transcript):
+        raise RuntimeError("LLM unavailable")
+
+    memory, _ = make_memory(summarize=failing)
+    for i in range(4):
+        memory.add_turn(sentence(2 * i), sentence(2 * i + 1))
+
+    assert memory.summary.endswith(sentence(3).strip())
+
+def test_context_does_not_wait_for_a_background_summary():
+    release = threading.Event()
+
+    def slow(summary, transcript):
+        release.wait(5)
+        return "summary"
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    memory, _ = make_memory(summarize=slow, executor=executor)
+    for i in range(4):
+        memory.add_turn(sentence(2 * i), sentence(2 * i + 1))
+
+    # The folded turns stay in the context until the summary is ready
+    assert memory.stats()["summarizing"] == 1
+    assert "message 0" in memory.context() and memory.summary == ""
+    memory.add_turn("Next question", "Next answer")
+    assert "Next answer" in memory.context()
+
+    release.set()
+    executor.shutdown(wait=True)
+    assert memory.summary == "summary"
+    assert "message 0" not in memory.context() and "Next answer" in memory.context()
+    assert memory.stats()["summarizing"] == 0
+
+def test_summary_of_cleared_turns_is_dropped():
+    release = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=1)
+    memory, _ = make_memory(summarize=lambda summary, transcript: release.wait(5) and "stale", executor=executor)
+    for i in range(4):
+        memory.add_turn(sentence(2 * i), sentence(2 * i + 1))
+
+    memory.clear()
+    memory.add_turn("New conversation", "Hello")
+    release.set()
+    executor.shutdown(wait=True)
+
+    assert memory.summary == ""
+    assert memory.context() == "Recent conversation:\nUser: New conversation\nCoach: Hello"
+
+def test_fetched_context_is_capped_per_query_and_evicted_oldest_first():
+    memory, _ = make_memory(facts_tokens=40)
+    rows = "\n".join(f"row {i} a b c" for i in range(10))
+    memory.add_context("workout_history", rows)
+
+    context = memory.context()
+    assert "workout_history:\nrow 0 a b c\nrow 1 a b c\n... 8 more lines" in context
+    assert memory.stats()["fact_tokens"] <= 20
+
+    memory.add_context("total_calories", rows)
+    memory.add_context("average_heart_rate_by_type", rows)
+    assert "workout_history" not in memory.context()
+    assert "total_calories" in memory.context() and "average_heart_rate_by_type" in memory.context()
+    assert memory.stats()["fact_tokens"] <= 40
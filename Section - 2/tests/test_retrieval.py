@@ -0,0 +1,66 @@
+import sys
+import os
+
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.agents.retrieval import HybridRetriever
+from src.utils.bm25 import BM25Index
+
+TEXTS = [
+    "Barbell back squat: keep your chest up and knees tracking over toes.",
+    "HIIT alternates short bursts of effort with recovery.",
+    "Protein after a workout helps muscle repair.",
+    "Front squat and goblet squat variations build the quads.",
+]
+
+def build_index(stamp: str = "") -> BM25Index:
+    return BM25Index.build([f"doc-{i}" for i in range(len(TEXTS))], TEXTS,
+                           [{"source": "guide", "row": i} for i in range(len(TEXTS))], stamp=stamp)
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    retriever = HybridRetriever(vector_store=None, embeddings=None, bm25=None, rrf_k=60)
+
+    # 2 is second in both rankings, so it beats 1 and 3 which each lead only one
+    assert retriever.fuse([1, 2, 4], [3, 2]) == [2, 1, 3, 4]
+    # Ties break on position
+    assert retriever.fuse([5], [4]) == [4, 5]
+    assert retriever.fuse([], []) == []
+
+def test_bm25_ranks_keyword_matches_and_respects_allowed_rows():
+    index = build_index()
+
+    assert [row for row, _ in index.search("squat", k=4)] == [3, 0]
+    assert [row for row, _ in index.search("squat", k=1)] == [3]
+    assert index.search("squat", k=4, allowed=np.array([True, False, False, False])) == \
+        index.search("squat", k=4)[1:]
+    assert index.search("yoga", k=4) == []
+
+def test_bm25_save_and_load_round_trip(tmp_path):
+    index = build_index(stamp="v1")
+    index.save(str(tmp_path))
+
+    loaded = BM25Index.load(str(tmp_path))
+
+    assert loaded.stamp == "v1" and loaded.doc_ids == index.doc_ids and loaded.metadatas == index.metadatas
+    assert isinstance(loaded.postings_rows, np.memmap)
+    np.testing.assert_allclose(loaded.scores("protein workout"), index.scores("protein workout"))
+
+def test_bm25_save_replaces_the_previous_version(tmp_path):
+    build_index(stamp="v1").save(str(tmp_path))
+    old = BM25Index.load(str(tmp_path))
+
+    build_index(stamp="v2").save(str(tmp_path))
+
+    assert BM25Index.load(str(tmp_path)).stamp == "v2"
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("index-")]) == 1
+    # An index loaded before the save keeps serving from its own files
+    assert [row for row, _ in old.search("squat", k=4)] == [3, 0]
+
+def test_bm25_load_without_a_saved_index(tmp_path):
+    assert BM25Index.load(str(tmp_path)) is None
+    # A version that was never switched to is ignored
+    os.makedirs(tmp_path / "index-partial")
+    assert BM25Index.load(str(tmp_path)) is None
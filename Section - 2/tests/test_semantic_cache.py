@@ -0,0 +1,113 @@
+import sys
+import os
+
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.semantic_cache import SemanticCache, normalize_question
+from src.utils.stubs import StubEmbeddings
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_cache(**kwargs):
+    clock = Clock()
+    return SemanticCache(StubEmbeddings().embed_query, clock=clock, **kwargs), clock
+
+def test_normalize_question():
+    assert normalize_question("  What's   the BEST diet?! ") == "what s the best diet"
+
+def test_paraphrase_hits_and_unrelated_question_misses():
+    cache, _ = make_cache(threshold=0.8)
+    cache.store("What are the benefits of HIIT workouts?", "HIIT burns calories", user_id=26)
+
+    assert cache.lookup("what are the benefits of hiit workouts", user_id=26) == "HIIT burns calories"
+    assert cache.lookup("How do I improve my squat technique?", user_id=26) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_threshold_decides_near_matches():
+    question, paraphrase = "What are the benefits of HIIT?", "What are the benefits of HIIT workouts?"
+    embed = StubEmbeddings().embed_query
+    similarity = float(np.dot(embed(normalize_question(question)), embed(normalize_question(paraphrase))))
+
+    strict, _ = make_cache(threshold=similarity + 0.01)
+    loose, _ = make_cache(threshold=similarity - 0.01)
+    for cache in (strict, loose):
+        cache.store(question, "answer")
+
+    assert strict.lookup(paraphrase) is None
+    assert loose.lookup(paraphrase) == "answer"
+
+def test_namespaces_are_isolated():
+    cache, _ = make_cache()
+    cache.store("Show my workout history", "user 26 history", user_id=26, freshness=("workouts", 10))
+
+    assert cache.lookup("Show my workout history", user_id=27, freshness=("workouts", 10)) is None
+    assert cache.lookup("Show my workout history", user_id=26, freshness=("workouts", 11)) is None
+    assert cache.lookup("Show my workout history", user_id=26, freshness=("workouts", 10)) == "user 26 history"
+
+def test_entries_expire_after_ttl():
+    cache, clock = make_cache(ttl=60)
+    cache.store("Nutrition tips?", "Eat protein")
+
+    clock.now = 59
+    assert cache.lookup("Nutrition tips?") == "Eat protein"
+    clock.now = 61
+    assert cache.lookup("Nutrition tips?") is None
+    assert cache.stats()["entries"] == 0
+
+def test_expired_best_match_falls_through_to_a_live_one():
+    cache, clock = make_cache(threshold=0.7, ttl=60)
+    cache.store("What are the benefits of HIIT workouts?", "old answer")
+    clock.now = 50
+    cache.store("What are the benefits of HIIT workouts today?", "live answer")
+
+    clock.now = 70
+    assert cache.lookup("what are the benefits of hiit workouts") == "live answer"
+
+def test_lookup_embeds_without_holding_the_lock():
+    embed = StubEmbeddings().embed_query
+    cache = SemanticCache(lambda text: embed(text) if not cache._lock.locked() else None)
+    cache.store("Nutrition tips?", "Eat protein")
+
+    assert cache.lookup("nutrition tips please") is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache, _ = make_cache(max_entries=2)
+    cache.store("first question", "1")
+    cache.store("second question", "2")
+    cache.lookup("first question")
+    cache.store("third question", "3")
+
+    assert cache.lookup("second question") is None
+    assert cache.lookup("first question") == "1"
+    assert cache.stats()["evictions"] == 1
+
+def test_invalidate_drops_only_that_user():
+    cache, _ = make_cache()
+    cache.store("Show my workout history", "26", user_id=26)
+    cache.store("Show my workout history", "27", user_id=27)
+
+    cache.invalidate(26)
+
+    assert cache.lookup("Show my workout history", user_id=26) is None
+    assert cache.lookup("Show my workout history", user_id=27) == "27"
+
+def test_search_returns_the_embedding_for_store():
+    calls = []
+    embed = StubEmbeddings().embed_query
+    cache = SemanticCache(lambda text: calls.append(text) or embed(text))
+    cache.store("What are the benefits of HIIT?", "HIIT burns calories")
+    calls.clear()
+
+    answer, embedding = cache.search("How do I improve my squat technique?")
+    cache.store("How do I improve my squat technique?", "Keep your chest up", embedding=embedding)
+
+    assert answer is None and calls == ["how do i improve my squat technique"]
+    assert cache.lookup("how do I improve my squat technique") == "Keep your chest up"
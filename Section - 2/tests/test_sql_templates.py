@@ -0,0 +1,77 @@
+import sys
+import os
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.data_loaders.sql_templates import SQLTemplateCache, parameterize_generated_sql
+
+def test_user_filter_is_bound_to_a_parameter():
+    sql = "```sql\nSELECT workout_type, SUM(calories_burned) FROM user_workouts WHERE user_id = 26 " \
+          "AND workout_type = 'Running' GROUP BY workout_type;\n```"
+
+    assert parameterize_generated_sql(sql, 26) == (
+        "SELECT workout_type, SUM(calories_burned) FROM user_workouts WHERE user_id = $1 "
+        "AND workout_type = 'Running' GROUP BY workout_type"
+    )
+
+def test_or_inside_a_string_literal_is_allowed():
+    sql = "SELECT * FROM user_workouts WHERE user_id = 26 AND notes = 'run or swim'"
+    assert parameterize_generated_sql(sql, 26) is not None
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM user_workouts WHERE user_id = 26 OR 1=1",
+    "SELECT * FROM user_workouts WHERE NOT (user_id = 26)",
+    "SELECT * FROM user_workouts WHERE user_id = 27",
+    "SELECT * FROM user_workouts WHERE user_id = 260",
+    "SELECT * FROM user_workouts",
+    "SELECT * FROM user_workouts WHERE workout_type = 'user_id = 26'",
+    "SELECT * FROM user_workouts WHERE 1=1 -- user_id = 26",
+    "SELECT * FROM user_workouts WHERE 1=1 /* user_id = 26 */",
+    "SELECT * FROM user_workouts WHERE user_id = 26 UNION SELECT * FROM user_workouts",
+    "SELECT * FROM user_workouts WHERE user_id = 26; DELETE FROM user_workouts",
+    "SELECT * FROM users WHERE user_id = 26",
+    "DELETE FROM user_workouts WHERE user_id = 26",
+    "SELECT * FROM user_workouts WHERE user_id = 26 AND id = $2",
+])
+def test_unsafe_sql_is_rejected(sql):
+    assert parameterize_generated_sql(sql, 26) is None
+
+def test_builtin_templates_match_recurring_questions():
+    cache = SQLTemplateCache()
+
+    assert cache.match("How many workouts did I do this week?").name == "workouts_this_week"
+    assert cache.match("What's my average heart rate?").name == "average_heart_rate_by_type"
+    assert cache.match("Which month did I train the most?") is None
+    assert cache.stats()["template_hits"] == 2 and cache.stats()["misses"] == 1
+
+def test_promoted_sql_serves_the_same_question():
+    cache = SQLTemplateCache()
+    question = "Which month did I train the most?"
+
+    template = cache.promote(question, "SELECT COUNT(*) FROM user_workouts WHERE user_id = 26", 26)
+
+    assert template.guarded and template.params == ("user_id",)
+    assert template.sql == "SELECT COUNT(*) FROM user_workouts WHERE user_id = $1"
+    assert cache.match("which month did I train the MOST") is template
+    assert cache.stats()["promoted_hits"] == 1
+
+def test_invalid_sql_is_not_promoted():
+    cache = SQLTemplateCache()
+    question = "Which month did I train the most?"
+
+    assert cache.promote(question, "SELECT * FROM user_workouts WHERE user_id = 26 OR 1=1", 26) is None
+    assert cache.match(question) is None
+
+def test_least_recently_used_promoted_template_is_evicted():
+    cache = SQLTemplateCache(max_promoted=2)
+    for question in ("first question", "second question"):
+        cache.promote(question, "SELECT * FROM user_workouts WHERE user_id = 26", 26)
+    cache.match("first question")
+    cache.promote("third question", "SELECT * FROM user_workouts WHERE user_id = 26", 26)
+
+    assert cache.match("second question") is None
+    assert cache.match("first question") is not None
+    assert cache.match("third question") is not None
@@ -0,0 +1,149 @@
+"""Time and profile each stage of HealthDataAnalyzer at several data sizes.
+
+For each USERSxDAYS size, writes a synthetic CSV with HealthDataGenerator,
+then times load_data, analyze_all_users (grouped and per-user loop engines),
+custom_correlation and save_insights separately, recording each stage's
+peak traced memory. Results are printed as a table and optionally written
+as JSON; --profile adds the hottest functions from cProfile:
+
+    python benchmarks/bench_analyzer.py --sizes 100x30 1000x365 10000x365 --output results.json
+    python benchmarks/bench_analyzer.py --sizes 1000x365 --profile --top 15
+"""
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from analyzer import HealthDataAnalyzer
+from data_generator import HealthDataGenerator
+
+def parse_size(size: str) -> Tuple[int, int]:
+    users, days = size.lower().split('x')
+    return int(users), int(days)
+
+def measure(fn: Callable, memory: bool) -> Tuple[Dict, object]:
+    """Time fn, then run it again under tracemalloc for its peak memory."""
+    start = time.perf_counter()
+    result = fn()
+    stats = {'seconds': time.perf_counter() - start}
+    if memory:
+        tracemalloc.start()
+        fn()
+        stats['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return stats, result
+
+def top_functions(profiler: cProfile.Profile, limit: int) -> List[Dict]:
+    """The hottest functions by cumulative time."""
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'calls': calls,
+            'tottime': tottime,
+            'cumtime': cumtime
+        })
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+    return rows[:limit]
+
+def bench_size(num_users: int, days: int, work_dir: str, loop_users: int,
+               memory: bool, profile: bool, top: int) -> Dict:
+    analyzer = HealthDataAnalyzer()
+    analyzer.data_dir = analyzer.output_dir = work_dir
+    generator = HealthDataGenerator(num_users, days, seed=0, start_date='2024-01-01')
+    rows = generator.write_csv(analyzer.data_file)
+    result = {'users': num_users, 'days': days, 'rows': rows, 'stages': {}}
+    stages = result['stages']
+
+    def load():
+        df = analyzer.load_data()
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    stages['load_data'], df = measure(load, memory)
+    stages['analyze_all_users'], insights = measure(lambda: analyzer.analyze_all_users(df), memory)
+
+    # The loop engine and the pure-Python correlation scale with users x rows,
+    # so run them on a sample of users and extrapolate to the population
+    sample = df['user_id'].unique()[:loop_users]
+    scale = num_users / len(sample)
+    stages['analyze_all_users_loop'], _ = measure(lambda: {
+        user_id: analyzer.analyze_user_trends(df, user_id) for user_id in sample
+    }, memory)
+    stages['analyze_all_users_loop']['seconds'] *= scale
+
+    groups = [group for _, group in df[df['user_id'].isin(sample)].groupby('user_id', sort=False)]
+    pairs = [(group['sleep_quality'].tolist(), group['performance_score'].tolist()) for group in groups]
+    stages['custom_correlation'], _ = measure(
+        lambda: [analyzer.custom_correlation(x, y) for x, y in pairs], memory
+    )
+    stages['custom_correlation']['seconds'] *= scale
+    if scale != 1:
+        stages['analyze_all_users_loop']['extrapolated_from_users'] = len(sample)
+        stages['custom_correlation']['extrapolated_from_users'] = len(sample)
+
+    stages['save_insights'], _ = measure(lambda: analyzer.save_insights(insights, num_users=None), memory)
+
+    if profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        insights = analyzer.analyze_all_users(load())
+        for user_id in sample:
+            analyzer.analyze_user_trends(df, user_id)
+        analyzer.save_insights(insights, num_users=None)
+        profiler.disable()
+        result['profile'] = top_functions(profiler, top)
+    return result
+
+def print_result(result: Dict):
+    print(f"\n{result['rows']:,} rows ({result['users']:,} users x {result['days']} days)")
+    print(f"{'stage':<26} {'seconds':>10} {'peak MB':>9}")
+    for name, stats in result['stages'].items():
+        note = " (extrapolated)" if 'extrapolated_from_users' in stats else ""
+        peak = f"{stats['peak_mb']:>9.1f}" if 'peak_mb' in stats else f"{'-':>9}"
+        print(f"{name:<26} {stats['seconds']:>10.3f} {peak}{note}")
+    for row in result.get('profile', []):
+        print(f"  {row['cumtime']:>8.3f}s cum {row['tottime']:>8.3f}s own "
+              f"{row['calls']:>10,} calls  {row['function']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=['100x30', '1000x365', '10000x365'],
+                        help="Dataset sizes as USERSxDAYS")
+    parser.add_argument('--loop-users', type=int, default=200,
+                        help="Users run through the loop engine and custom_correlation")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="Skip the tracemalloc pass that records peak memory")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile the pipeline with cProfile and list the hottest functions")
+    parser.add_argument('--top', type=int, default=20, help="Functions listed by --profile")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        num_users, days = parse_size(size)
+        with tempfile.TemporaryDirectory() as work_dir:
+            result = bench_size(num_users, days, work_dir, args.loop_users,
+                                not args.no_memory, args.profile, args.top)
+        print_result(result)
+        results.append(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Measure anomaly detection throughput in batch and streaming modes.
+
+Batch mode runs the detector over a whole in-memory frame; streaming mode
+feeds a CSV written by HealthDataGenerator through the detector in chunks:
+
+    python benchmarks/bench_anomaly.py --users 100000 --days 365
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from anomaly_engine import detect_anomalies, iter_anomalies
+from data_generator import HealthDataGenerator
+from streaming_engine import iter_csv_chunks
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--chunksize', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    generator = HealthDataGenerator(args.users, args.days, seed=0, start_date='2024-01-01')
+    df = generator.generate_vectorized()
+    rows = len(df)
+    print(f"{rows:,} rows ({args.users:,} users x {args.days} days)")
+
+    start = time.perf_counter()
+    events = detect_anomalies(df)
+    elapsed = time.perf_counter() - start
+    print(f"batch: {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s, {len(events):,} events)")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'health_data.csv')
+        generator.write_csv(path)
+        start = time.perf_counter()
+        chunks = iter_csv_chunks(path, args.chunksize)
+        num_events = sum(len(chunk_events) for chunk_events in iter_anomalies(chunks))
+        elapsed = time.perf_counter() - start
+        # Separate CSV parsing from detection
+        start = time.perf_counter()
+        for _ in iter_csv_chunks(path, args.chunksize):
+            pass
+        read_seconds = time.perf_counter() - start
+    print(f"streaming: {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s, {num_events:,} events; "
+          f"{read_seconds:.2f}s of it reading the CSV)")
+
+if __name__ == '__main__':
+    main()
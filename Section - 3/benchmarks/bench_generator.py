@@ -0,0 +1,52 @@
+"""Compare the per-row and vectorized health data generators.
+
+The per-row generator runs on a sample of users and is extrapolated; the
+vectorized generator writes the full dataset to a temporary CSV:
+
+    python benchmarks/bench_generator.py --users 1000000 --days 100
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_generator import HealthDataGenerator
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--loop-sample', type=int, default=200,
+                        help='Users generated with the per-row generator')
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    rows = args.users * args.days
+    print(f"{rows:,} rows ({args.users:,} users x {args.days} days)")
+
+    sample = HealthDataGenerator(min(args.loop_sample, args.users), args.days)
+    start = time.perf_counter()
+    sample.generate_user_data()
+    loop_seconds = (time.perf_counter() - start) / sample.num_users * args.users
+    print(f"per-row generator: {loop_seconds:.2f}s (extrapolated from {sample.num_users} users)")
+
+    generator = HealthDataGenerator(args.users, args.days, seed=0)
+    start = time.perf_counter()
+    for _ in generator.iter_chunks(args.chunk_rows):
+        pass
+    generate_seconds = time.perf_counter() - start
+    print(f"vectorized generator: {generate_seconds:.2f}s ({rows / generate_seconds:,.0f} rows/s)")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'health_data.csv')
+        start = time.perf_counter()
+        generator.write_csv(path, args.chunk_rows)
+        write_seconds = time.perf_counter() - start
+        print(f"vectorized generator + CSV: {write_seconds:.2f}s "
+              f"({rows / write_seconds:,.0f} rows/s, {os.path.getsize(path) / 1e9:.2f} GB)")
+    print(f"speedup: {loop_seconds / write_seconds:.0f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Compare the grouped and per-user loop engines of HealthDataAnalyzer.
+
+The grouped engine runs on the full population; the loop engine runs on a
+sample of users and is extrapolated, since at 100k users it would take hours:
+
+    python benchmarks/bench_grouped_engine.py --users 100000 --days 365
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from analyzer import HealthDataAnalyzer
+from data_generator import HealthDataGenerator
+
+def synthetic_frame(num_users: int, days: int, seed: int = 0) -> pd.DataFrame:
+    """Build a health_data.csv-shaped frame with the vectorized generator."""
+    generator = HealthDataGenerator(num_users, days, seed=seed, start_date='2024-01-01')
+    df = generator.generate_vectorized()
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def max_difference(expected: dict, actual: dict) -> float:
+    worst = 0.0
+    for user_id, result in expected.items():
+        analysis, other = result['analysis'], actual[user_id]['analysis']
+        for section in ('correlations', 'averages'):
+            for name, value in analysis[section].items():
+                worst = max(worst, abs(value - other[section][name]))
+        for name, series in analysis['weekly_trends'].items():
+            diff = np.nan_to_num(np.abs(np.subtract(series, other['weekly_trends'][name])))
+            worst = max(worst, float(diff.max(initial=0.0)))
+    return worst
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--loop-sample', type=int, default=200,
+                        help='Users analyzed with the loop engine')
+    args = parser.parse_args()
+
+    analyzer = HealthDataAnalyzer()
+    df = synthetic_frame(args.users, args.days)
+    print(f"{len(df):,} rows ({args.users:,} users x {args.days} days)")
+
+    start = time.perf_counter()
+    grouped = analyzer.analyze_all_users(df, engine='grouped')
+    grouped_seconds = time.perf_counter() - start
+    print(f"grouped engine: {grouped_seconds:.2f}s")
+
+    # The loop engine filters the whole frame per user, so time it on the
+    # full frame and scale by the number of users
+    sample_users = df['user_id'].unique()[:args.loop_sample]
+    start = time.perf_counter()
+    looped = {
+        user_id: {'analysis': analyzer.analyze_user_trends(df, user_id)}
+        for user_id in sample_users
+    }
+    loop_seconds = (time.perf_counter() - start) / len(sample_users) * args.users
+    print(f"loop engine: {loop_seconds:.2f}s (extrapolated from {len(sample_users)} users)")
+    print(f"speedup: {loop_seconds / grouped_seconds:.0f}x")
+    print(f"max abs difference on sampled users: {max_difference(looped, grouped):.2e}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Measure the speedup of the sharded parallel analyzer as workers grow.
+
+Writes a synthetic health data CSV of the requested size, then analyzes it
+with 1, 2, 4, ... workers up to --max-workers and reports the full-population
+report time for each:
+
+    python benchmarks/bench_sharded.py --users 100000 --days 365 --max-workers 16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_generator import HealthDataGenerator
+from sharded_engine import analyze_sharded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--csv', help="Existing health data CSV to analyze instead of a synthetic one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.csv
+        if path is None:
+            path = os.path.join(tmp_dir, 'health_data.csv')
+            HealthDataGenerator(args.users, args.days, seed=0).write_csv(path)
+        print(f"{path}: {os.path.getsize(path) / 1e9:.2f} GB")
+
+        baseline = None
+        workers = 1
+        print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+        while workers <= args.max_workers:
+            start = time.perf_counter()
+            analyze_sharded(path, os.path.join(tmp_dir, 'report.txt'), workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x")
+            workers *= 2
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,25 @@
 import pandas as pd
+import argparse
+import math
 import os
-from typing import List, Tuple, Dict
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple, Dict
 from datetime import datetime
+from grouped_engine import CORRELATION_PAIRS, analyze_grouped
+from streaming_engine import UserAccumulators, analyze_stream, batch_rows, iter_csv_chunks, iter_csv_rows
+from sharded_engine import analyze_sharded
+from incremental import IncrementalAnalyzer
+from rolling_engine import RollingCorrelationEngine
+from report_writer import ReportWriter
+from cohort_engine import load_cohorts, rank_analyses, rank_averages, with_percentiles
+from anomaly_engine import AnomalyDetector, detect_anomalies, events_by_user
+
+# Percentile insights: average metric and how it is described
+PERCENTILE_INSIGHTS = {
+    'avg_steps': 'daily steps',
+    'avg_sleep_quality': 'sleep quality',
+    'avg_performance': 'performance'
+}
 
 class HealthDataAnalyzer:
     def __init__(self):
@@ -9,8 +27,12 @@ class HealthDataAnalyzer:
         self.output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'output')
         os.makedirs(self.output_dir, exist_ok=True)
 
+    @property
+    def data_file(self) -> str:
+        return os.path.join(self.data_dir, 'health_data.csv')
+
     def load_data(self) -> pd.DataFrame:
-        return pd.read_csv(os.path.join(self.data_dir, 'health_data.csv'))
+        return pd.read_csv(self.data_file)
 
     def custom_correlation(self, x: List[float], y: List[float]) -> float:
         """Calculate Pearson correlation coefficient without using libraries."""
@@ -108,66 +130,330 @@ class HealthDataAnalyzer:
         avg_sleep = analysis['averages']['avg_sleep_hours']
         if avg_sleep < 7:
             insights.append("Average sleep duration is below recommended 7-9 hours.")
-        
+
+        # Lagged and rolling insights, when the rolling engine has run
+        lagged = analysis.get('lagged_correlations')
+        if lagged and lagged['sleep_quality_lag1_vs_performance_score'] > 0.5:
+            insights.append("Last night's sleep quality strongly predicts today's performance.")
+
+        rolling = analysis.get('rolling_correlations')
+        if rolling:
+            recent = rolling['sleep_quality_vs_performance_score_7d']
+            overall = analysis['correlations']['sleep_quality_vs_performance']
+            if not math.isnan(recent) and recent - overall > 0.3:
+                insights.append("Performance has tracked sleep quality more closely over the past week.")
+            elif not math.isnan(recent) and overall - recent > 0.3:
+                insights.append("Performance has tracked sleep quality less closely over the past week.")
+
+        # Anomaly insights, when the anomaly detector has run: the latest
+        # resting heart rate spike and the latest sleep collapse
+        anomalies = analysis.get('anomalies')
+        if anomalies:
+            spikes = [event for event in anomalies
+                      if event['metric'] == 'heart_rate' and event['zscore'] > 0]
+            collapses = [event for event in anomalies
+                         if event['metric'] in ('sleep_hours', 'sleep_quality') and event['zscore'] < 0]
+            if spikes:
+                insights.append(f"Resting heart rate spike detected on {spikes[-1]['date']}.")
+            if collapses:
+                insights.append(f"Sleep collapse detected on {collapses[-1]['date']}.")
+
+        # Percentile insights, when users have been ranked against their cohort
+        percentiles = analysis.get('percentiles')
+        if percentiles:
+            for metric, label in PERCENTILE_INSIGHTS.items():
+                if percentiles[metric] >= 0.9:
+                    insights.append(f"Top 10% of your cohort for {label}.")
+                elif percentiles[metric] <= 0.1:
+                    insights.append(f"Bottom 10% of your cohort for {label}.")
+
         return insights
 
-    def save_insights(self, insights: Dict, num_users: int = 5):
-        """Save insights for the specified number of users."""
+    def render_report_header(self) -> str:
+        return "Health Data Analysis Report\n" + "=" * 50 + "\n\n"
+
+    def render_user_section(self, user_id, user_insights: Dict) -> str:
+        """Render one user's report section."""
+        lines = [f"\nUser {user_id} Analysis\n", "-" * 50 + "\n"]
+        
+        # Write insights
+        lines.append("\nKey Insights:\n")
+        for insight in user_insights['insights']:
+            lines.append(f"- {insight}\n")
+        
+        # Write averages
+        lines.append("\nAverage Metrics:\n")
+        for metric, value in user_insights['analysis']['averages'].items():
+            lines.append(f"{metric}: {value:.1f}\n")
+        
+        # Write correlations
+        lines.append("\nCorrelations:\n")
+        for metric, value in user_insights['analysis']['correlations'].items():
+            lines.append(f"{metric}: {value:.2f}\n")
+
+        # Write rolling and lagged highlights, when the rolling engine has run
+        rolling = user_insights['analysis'].get('rolling_correlations')
+        if rolling:
+            lines.append("\nRecent Correlations (latest window):\n")
+            for metric, (x, y) in CORRELATION_PAIRS.items():
+                key = f"{x}_vs_{y}"
+                values = " ".join(
+                    f"{name[len(key) + 1:]}={rolling[name]:.2f}"
+                    for name in rolling if name.startswith(key + "_")
+                )
+                lines.append(f"{metric}: {values}\n")
+        percentiles = user_insights['analysis'].get('percentiles')
+        if percentiles:
+            lines.append(f"\nCohort Percentiles ({user_insights['analysis']['cohort']}):\n")
+            for metric, value in percentiles.items():
+                lines.append(f"{metric}: {value:.0%}\n")
+        anomalies = user_insights['analysis'].get('anomalies')
+        if anomalies:
+            lines.append("\nAnomalies:\n")
+            for event in anomalies:
+                lines.append(f"{event['date']} {event['metric']}: {event['value']:.1f} "
+                             f"(expected {event['expected']:.1f}, z={event['zscore']:.1f}, {event['detector']})\n")
+        lagged = user_insights['analysis'].get('lagged_correlations')
+        if lagged:
+            lines.append("\nStrongest Lagged Effects:\n")
+            defined = [(name, value) for name, value in lagged.items() if not math.isnan(value)]
+            for name, value in sorted(defined, key=lambda item: -abs(item[1]))[:3]:
+                lines.append(f"{name}: {value:.2f}\n")
+        
+        # Add simple ASCII visualization of weekly trends
+        lines.append("\nWeekly Performance Trend (ASCII Chart):\n")
+        weekly_perf = user_insights['analysis']['weekly_trends']['performance']
+        lines.append(self.create_ascii_chart(weekly_perf))
+        lines.append("\n" + "-" * 50 + "\n")
+        return "".join(lines)
+
+    def save_insights(self, insights: Dict, num_users: Optional[int] = 5):
+        """Save insights for the specified number of users (all when None)."""
+        self.write_report(islice(insights.items(), num_users))
+
+    def write_report(self, insights: Iterable[Tuple], formats: Iterable[str] = ('text',),
+                     users_per_file: Optional[int] = None) -> List[str]:
+        """Write (user_id, user_insights) pairs to report files as they arrive.
+
+        Sections are rendered and written one user at a time through buffered
+        files, so a lazy iterable keeps memory flat for any number of users.
+        formats may include 'text' and 'jsonl'; users_per_file splits the
+        report into numbered pages. Returns the paths written.
+        """
+        writer = ReportWriter(self, self.output_dir, formats=formats, users_per_file=users_per_file)
+        return writer.write(insights)
+
+    def stream_report(self, path: str = None, chunksize: int = 1_000_000,
+                      num_users: Optional[int] = None, formats: Iterable[str] = ('text',),
+                      users_per_file: Optional[int] = None, percentiles: bool = False,
+                      cohorts: Optional[Dict] = None, anomalies: bool = False) -> List[str]:
+        """Stream a CSV through the accumulators and write the report without
+        holding every user's analysis in memory at once.
+
+        With anomalies set, each chunk is also fed to the anomaly detector,
+        which needs each user's rows in date order; only the flagged events
+        are kept.
+        """
+        accumulators = UserAccumulators()
+        detector = AnomalyDetector() if anomalies else None
+        events = []
+        for chunk in iter_csv_chunks(path or self.data_file, chunksize):
+            accumulators.update(chunk)
+            if detector:
+                events.append(detector.update(chunk))
+        analyses = accumulators.iter_analyses()
+        if anomalies:
+            # An empty file yields no chunks and so no event frames to concatenate
+            flagged = events_by_user(pd.concat(events, ignore_index=True)) if events else {}
+            analyses = self._with_anomalies(analyses, flagged)
+        if percentiles:
+            labels, ranks = rank_averages(accumulators.users, accumulators.averages(), cohorts)
+            analyses = with_percentiles(analyses, labels, ranks)
+        insights = self.iter_insights(analyses)
+        return self.write_report(islice(insights, num_users), formats, users_per_file)
+
+    def analyze_all_users(self, df: pd.DataFrame, engine: str = 'grouped', rolling: bool = False,
+                          percentiles: bool = False, cohorts: Optional[Dict] = None,
+                          anomalies: bool = False):
+        """Analyze every user.
+
+        The 'grouped' engine computes all users in one pass of grouped array
+        operations; 'loop' filters the frame and analyzes one user at a time.
+        With rolling set, each analysis also gets the latest 7/14/30-day
+        correlations and 1-3 day lagged correlations of every metric pair.
+        With percentiles set, each user's averages are ranked within their
+        cohort (from the user_id -> cohort mapping, or the whole population).
+        With anomalies set, each analysis lists the days flagged by the
+        EWMA/z-score and CUSUM detectors.
+        """
+        if engine == 'grouped':
+            analyses = analyze_grouped(df)
+        elif engine == 'loop':
+            analyses = {
+                user_id: self.analyze_user_trends(df, user_id)
+                for user_id in df['user_id'].unique()
+            }
+        else:
+            raise ValueError(f"Unknown engine: {engine}")
+
+        if rolling:
+            for user_id, summary in RollingCorrelationEngine(df).summarize().items():
+                analyses[user_id].update(summary)
+        if percentiles:
+            analyses = rank_analyses(analyses, cohorts)
+        if anomalies:
+            events = events_by_user(detect_anomalies(df.sort_values('date', kind='stable')))
+            for user_id, analysis in analyses.items():
+                analysis['anomalies'] = events.get(user_id, [])
+
+        return self.build_insights(analyses)
+
+    def analyze_all_users_streaming(self, path: str = None, chunksize: int = 1_000_000,
+                                    row_generator: bool = False):
+        """Analyze every user from a CSV without loading it into memory.
+
+        The file is consumed in chunks (or row by row with the csv module when
+        row_generator is set) and folded into per-user running statistics, so
+        memory depends on the number of users and weeks, not rows. Results
+        match analyze_all_users.
+        """
+        path = path or self.data_file
+        if row_generator:
+            chunks = batch_rows(iter_csv_rows(path), chunksize)
+        else:
+            chunks = iter_csv_chunks(path, chunksize)
+        return self.build_insights(analyze_stream(chunks))
+
+    def analyze_all_users_incremental(self, path: str = None, state_path: str = None,
+                                      chunksize: int = 1_000_000, percentiles: bool = False,
+                                      cohorts: Optional[Dict] = None):
+        """Analyze every user, ingesting only rows appended since the last run.
+
+        Per-user accumulators persist in state_path between runs, so a day of
+        new data costs O(new rows) and the insights are rebuilt in O(users).
+        With percentiles set, users are ranked within their cohort as in
+        analyze_all_users.
+        """
+        incremental = IncrementalAnalyzer(
+            path or self.data_file,
+            state_path or os.path.join(self.data_dir, 'analyzer_state.npz'),
+            chunksize
+        )
+        incremental.ingest()
+        analyses = incremental.analyses()
+        if percentiles:
+            analyses = rank_analyses(analyses, cohorts)
+        return self.build_insights(analyses)
+
+    def save_insights_sharded(self, path: str = None, workers: int = None,
+                              num_users: int = None, chunksize: int = 1_000_000) -> int:
+        """Analyze a CSV in parallel across processes and save the report.
+
+        Users are sharded by hash across workers, each worker writes its own
+        report sections, and the report lists users in the same order as
+        save_insights. Returns the number of users written.
+        """
         output_file = os.path.join(self.output_dir, 'health_insights.txt')
-        with open(output_file, 'w') as f:
-            f.write("Health Data Analysis Report\n")
-            f.write("=" * 50 + "\n\n")
-            
-            for user_id in list(insights.keys())[:num_users]:  # Only process first 5 users
-                user_insights = insights[user_id]
-                f.write(f"\nUser {user_id} Analysis\n")
-                f.write("-" * 50 + "\n")
-                
-                # Write insights
-                f.write("\nKey Insights:\n")
-                for insight in user_insights['insights']:
-                    f.write(f"- {insight}\n")
-                
-                # Write averages
-                f.write("\nAverage Metrics:\n")
-                for metric, value in user_insights['analysis']['averages'].items():
-                    f.write(f"{metric}: {value:.1f}\n")
-                
-                # Write correlations
-                f.write("\nCorrelations:\n")
-                for metric, value in user_insights['analysis']['correlations'].items():
-                    f.write(f"{metric}: {value:.2f}\n")
-                
-                # Add simple ASCII visualization of weekly trends
-                f.write("\nWeekly Performance Trend (ASCII Chart):\n")
-                weekly_perf = user_insights['analysis']['weekly_trends']['performance']
-                f.write(self.create_ascii_chart(weekly_perf))
-                f.write("\n" + "-" * 50 + "\n")
-
-    def analyze_all_users(self, df: pd.DataFrame):
-        unique_users = df['user_id'].unique()
-        all_insights = {}
-
-        for user_id in unique_users:
-            analysis = self.analyze_user_trends(df, user_id)
+        return analyze_sharded(path or self.data_file, output_file, workers, num_users, chunksize)
+
+    def _with_anomalies(self, analyses: Iterable[Tuple], events: Dict) -> Iterator[Tuple]:
+        for user_id, analysis in analyses:
+            analysis['anomalies'] = events.get(user_id, [])
+            yield user_id, analysis
+
+    def build_insights(self, analyses: Dict) -> Dict:
+        """Attach generated insights to each user's analysis."""
+        return dict(self.iter_insights(analyses.items()))
+
+    def iter_insights(self, analyses: Iterable[Tuple]) -> Iterator[Tuple]:
+        """Lazily attach insights to (user_id, analysis) pairs."""
+        for user_id, analysis in analyses:
             insights = self.generate_insights(analysis)
-            all_insights[user_id] = {
+            yield user_id, {
                 'analysis': analysis,
                 'insights': insights
             }
 
-        return all_insights
+def _reject_unsupported(parser: argparse.ArgumentParser, mode: str, flags: Dict[str, bool]):
+    """Exit with a usage error if any of the flags the given mode ignores was passed."""
+    given = [flag for flag, passed in flags.items() if passed]
+    if given:
+        parser.error(f"{mode} does not support {', '.join(given)}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Analyze health data and generate insights.")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Stream the CSV in chunks instead of loading it into memory")
+    parser.add_argument('--chunksize', type=int, default=1_000_000,
+                        help="Rows per chunk in streaming and parallel modes")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Analyze in parallel across this many processes (text report only)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Ingest only rows appended since the last incremental run")
+    parser.add_argument('--rolling', action='store_true',
+                        help="Add rolling-window and lagged correlations to the in-memory analysis")
+    parser.add_argument('--all-users', action='store_true',
+                        help="Report on every user instead of the first 10")
+    parser.add_argument('--formats', nargs='+', choices=['text', 'jsonl'], default=['text'],
+                        help="Report formats to write (parallel mode writes text only)")
+    parser.add_argument('--users-per-file', type=int, default=None,
+                        help="Split the report into pages of this many users")
+    parser.add_argument('--percentiles', action='store_true',
+                        help="Rank users against their cohort (in-memory, streaming and incremental modes)")
+    parser.add_argument('--cohorts', default=None,
+                        help="CSV of user_id with age or age_band defining cohorts for --percentiles")
+    parser.add_argument('--anomalies', action='store_true',
+                        help="Flag heart rate spikes and sleep collapses (in-memory and streaming modes)")
+    args = parser.parse_args()
+    if args.workers:
+        _reject_unsupported(parser, '--workers', {
+            '--streaming': args.streaming,
+            '--incremental': args.incremental,
+            '--rolling': args.rolling,
+            '--formats jsonl': 'jsonl' in args.formats,
+            '--users-per-file': args.users_per_file is not None,
+            '--percentiles': args.percentiles,
+            '--cohorts': args.cohorts is not None,
+            '--anomalies': args.anomalies
+        })
+    if args.incremental:
+        _reject_unsupported(parser, '--incremental', {
+            '--streaming': args.streaming,
+            '--rolling': args.rolling,
+            '--anomalies': args.anomalies
+        })
+    if args.streaming:
+        _reject_unsupported(parser, '--streaming', {'--rolling': args.rolling})
+    cohorts = load_cohorts(args.cohorts) if args.cohorts else None
+
     analyzer = HealthDataAnalyzer()
-    df = analyzer.load_data()
-    
-    # Convert date column to datetime
-    df['date'] = pd.to_datetime(df['date'])
+    num_users = None if args.all_users else 10
+    if args.workers:
+        analyzer.save_insights_sharded(workers=args.workers, num_users=num_users, chunksize=args.chunksize)
+        print("Analysis complete. Check the output directory for results.")
+        return
+    if args.streaming:
+        analyzer.stream_report(chunksize=args.chunksize, num_users=num_users,
+                               formats=args.formats, users_per_file=args.users_per_file,
+                               percentiles=args.percentiles, cohorts=cohorts,
+                               anomalies=args.anomalies)
+        print("Analysis complete. Check the output directory for results.")
+        return
+    if args.incremental:
+        insights = analyzer.analyze_all_users_incremental(chunksize=args.chunksize,
+                                                          percentiles=args.percentiles, cohorts=cohorts)
+    else:
+        df = analyzer.load_data()
+        
+        # Convert date column to datetime
+        df['date'] = pd.to_datetime(df['date'])
+        
+        insights = analyzer.analyze_all_users(df, rolling=args.rolling,
+                                              percentiles=args.percentiles, cohorts=cohorts,
+                                              anomalies=args.anomalies)
     
-    # Generate insights for all users but save only 10 to avoid large file size
-    insights = analyzer.analyze_all_users(df)
-    analyzer.save_insights(insights, num_users=10)
+    # Generate insights for all users but save only 10 unless asked for all
+    analyzer.write_report(islice(insights.items(), num_users), args.formats, args.users_per_file)
     
     print("Analysis complete. Check the output directory for results.")
 
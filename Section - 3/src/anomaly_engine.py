@@ -0,0 +1,165 @@
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from streaming_engine import METRICS
+
+# Detector defaults: EWMA smoothing, z-score threshold, CUSUM slack and
+# decision threshold (both in standard deviations), and days of history
+# needed before a user's metric is scored
+ALPHA = 0.1
+Z_THRESHOLD = 4.0
+CUSUM_SLACK = 0.5
+CUSUM_THRESHOLD = 8.0
+WARMUP_DAYS = 10
+
+# Anomaly event columns, one row per flagged (user, day, metric)
+EVENT_COLUMNS = ['user_id', 'date', 'metric', 'value', 'expected', 'zscore', 'detector']
+
+class AnomalyDetector:
+    """Online anomaly detection over daily health metrics.
+
+    Each user and metric keeps an exponentially weighted mean and variance
+    plus the two one-sided CUSUM sums of the standardized residual: five
+    numbers, however much history has been seen. A value is flagged when its
+    z-score against the EWMA exceeds z_threshold (a sudden spike) or when a
+    CUSUM sum crosses cusum_threshold (a sustained shift, e.g. several nights
+    of collapsing sleep); a CUSUM sum resets after it fires.
+
+    Rows are processed one day at a time with array operations across all
+    users present that day. Each user's rows must arrive in date order, but
+    can be split across any number of update calls, so the same detector
+    serves a whole frame or a stream of chunks.
+    """
+
+    def __init__(self, metrics: Iterable[str] = METRICS, alpha: float = ALPHA,
+                 z_threshold: float = Z_THRESHOLD, cusum_slack: float = CUSUM_SLACK,
+                 cusum_threshold: float = CUSUM_THRESHOLD, warmup: int = WARMUP_DAYS,
+                 capacity: int = 1024):
+        self.metrics = list(metrics)
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.cusum_slack = cusum_slack
+        self.cusum_threshold = cusum_threshold
+        self.warmup = warmup
+        self.slots: Dict = {}
+        self.users: List = []
+        shape = (capacity, len(self.metrics))
+        self.count = np.zeros(shape)
+        self.mean = np.zeros(shape)
+        self.var = np.zeros(shape)
+        self.cusum_high = np.zeros(shape)
+        self.cusum_low = np.zeros(shape)
+
+    def _slots_for(self, user_ids: np.ndarray) -> np.ndarray:
+        slots = np.empty(len(user_ids), dtype=np.int64)
+        for i, user_id in enumerate(user_ids):
+            slot = self.slots.get(user_id)
+            if slot is None:
+                slot = self.slots[user_id] = len(self.users)
+                self.users.append(user_id)
+            slots[i] = slot
+        capacity = len(self.count)
+        if len(self.users) > capacity:
+            new_capacity = max(len(self.users), capacity * 2)
+            for name in ('count', 'mean', 'var', 'cusum_high', 'cusum_low'):
+                grown = np.zeros((new_capacity, len(self.metrics)))
+                grown[:capacity] = getattr(self, name)
+                setattr(self, name, grown)
+        return slots
+
+    def update_day(self, slots: np.ndarray, values: np.ndarray) -> Dict[str, np.ndarray]:
+        """Score one day's values (users x metrics) and fold them into the state.
+
+        Each slot may appear at most once. Returns boolean users x metrics
+        masks for each detector, with the z-scores and expected values.
+        """
+        count = self.count[slots]
+        mean = self.mean[slots]
+        var = self.var[slots]
+        present = ~np.isnan(values)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            zscore = (values - mean) / np.sqrt(var)
+        scored = present & (count >= self.warmup) & (var > 0)
+        zscore = np.where(scored, zscore, 0.0)
+
+        high = np.maximum(0.0, self.cusum_high[slots] + zscore - self.cusum_slack)
+        low = np.maximum(0.0, self.cusum_low[slots] - zscore - self.cusum_slack)
+        flags = {
+            'zscore': scored & (np.abs(zscore) > self.z_threshold),
+            'cusum_up': scored & (high > self.cusum_threshold),
+            'cusum_down': scored & (low > self.cusum_threshold)
+        }
+        self.cusum_high[slots] = np.where(flags['cusum_up'], 0.0, high)
+        self.cusum_low[slots] = np.where(flags['cusum_down'], 0.0, low)
+
+        # Exponentially weighted mean and variance; the first value seeds the mean
+        diff = np.where(present, values - mean, 0.0)
+        first = present & (count == 0)
+        increment = np.where(first, diff, self.alpha * diff)
+        self.mean[slots] = mean + increment
+        self.var[slots] = np.where(first, 0.0, (1 - self.alpha) * (var + diff * increment))
+        self.count[slots] = count + present
+
+        return {'flags': flags, 'zscore': zscore, 'expected': mean}
+
+    def update(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Process a chunk of rows day by day and return its anomaly events."""
+        if chunk.empty:
+            return pd.DataFrame(columns=EVENT_COLUMNS)
+        codes, chunk_users = pd.factorize(chunk['user_id'])
+        chunk_slots = self._slots_for(chunk_users.to_numpy())
+        slots = chunk_slots[codes]
+        days = pd.to_datetime(chunk['date']).values.astype('datetime64[D]').astype(np.int64)
+        values = chunk[self.metrics].to_numpy(dtype=float)
+
+        # Batches of at most one row per user: the day, then the row's
+        # occurrence within that (user, day) in case of duplicates
+        occurrence = pd.Series(slots).groupby([slots, days]).cumcount().to_numpy()
+        order = np.lexsort((occurrence, days))
+        batch_keys = np.stack([days[order], occurrence[order]], axis=1)
+        boundaries = np.flatnonzero(np.any(batch_keys[1:] != batch_keys[:-1], axis=1)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(order)]))
+
+        events = []
+        for start, end in zip(starts, ends):
+            rows = order[start:end]
+            result = self.update_day(slots[rows], values[rows])
+            for detector, mask in result['flags'].items():
+                row_index, metric_index = np.nonzero(mask)
+                if len(row_index):
+                    events.append(pd.DataFrame({
+                        'user_id': np.asarray(self.users, dtype=object)[slots[rows][row_index]],
+                        'date': days[rows][row_index],
+                        'metric': np.asarray(self.metrics, dtype=object)[metric_index],
+                        'value': values[rows][row_index, metric_index],
+                        'expected': result['expected'][row_index, metric_index],
+                        'zscore': result['zscore'][row_index, metric_index],
+                        'detector': detector
+                    }))
+        if not events:
+            return pd.DataFrame(columns=EVENT_COLUMNS)
+        events = pd.concat(events, ignore_index=True)
+        events['date'] = events['date'].to_numpy().astype('datetime64[D]').astype(str)
+        return events
+
+def detect_anomalies(df: pd.DataFrame, **options) -> pd.DataFrame:
+    """Anomaly events for a whole frame, in date order."""
+    return AnomalyDetector(**options).update(df)
+
+def iter_anomalies(chunks: Iterable[pd.DataFrame], **options) -> Iterator[pd.DataFrame]:
+    """Anomaly events for each chunk of a stream, as the chunks arrive."""
+    detector = AnomalyDetector(**options)
+    for chunk in chunks:
+        yield detector.update(chunk)
+
+def events_by_user(events: pd.DataFrame) -> Dict:
+    """Group events into per-user lists of event dictionaries."""
+    columns = [column for column in EVENT_COLUMNS if column != 'user_id']
+    return {
+        user_id: group[columns].to_dict('records')
+        for user_id, group in events.groupby('user_id', sort=False)
+    }
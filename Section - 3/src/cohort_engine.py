@@ -0,0 +1,184 @@
+import csv
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from grouped_engine import AVERAGE_COLUMNS
+
+# t-digest compression: more centroids, and more accurate tails, as it grows
+DEFAULT_COMPRESSION = 200
+
+# Cohort label for users without a known cohort
+DEFAULT_COHORT = 'all'
+
+class TDigest:
+    """Mergeable streaming quantile sketch (a merging t-digest).
+
+    Values are summarized by at most about compression weighted centroids,
+    kept small near the tails by the arcsine scale function so extreme
+    percentiles stay accurate. Batches are folded in with one sort and a
+    grouped merge, so a sketch never holds more than its centroids plus the
+    batch being added, and sketches built separately can be merged.
+    """
+
+    def __init__(self, compression: int = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def update(self, values: np.ndarray, weights: np.ndarray = None):
+        """Fold a batch of values into the sketch; NaNs are ignored."""
+        values = np.asarray(values, dtype=float)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+        keep = ~np.isnan(values)
+        values, weights = values[keep], weights[keep]
+        if len(values) == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, weights]))
+
+    def merge(self, other: 'TDigest'):
+        """Fold another sketch into this one."""
+        if other.count:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress(np.concatenate([self.means, other.means]),
+                           np.concatenate([self.weights, other.weights]))
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        # Position of each point's midpoint on the k1 scale; points sharing
+        # a unit interval of k merge into one centroid
+        q = (cumulative - weights / 2) / cumulative[-1]
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        _, clusters = np.unique(np.floor(k), return_inverse=True)
+        self.weights = np.bincount(clusters, weights=weights)
+        self.means = np.bincount(clusters, weights=means * weights) / self.weights
+
+    def _knots(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Interpolation knots: (value, cumulative fraction) through each centroid."""
+        cumulative = np.cumsum(self.weights)
+        fractions = (cumulative - self.weights / 2) / cumulative[-1]
+        return (np.concatenate(([self.min], self.means, [self.max])),
+                np.concatenate(([0.0], fractions, [1.0])))
+
+    def cdf(self, values) -> np.ndarray:
+        """Estimated fraction of the population at or below each value."""
+        if not self.count:
+            return np.full(np.shape(values), np.nan)
+        xs, fractions = self._knots()
+        return np.interp(values, xs, fractions)
+
+    def quantile(self, q) -> np.ndarray:
+        """Estimated value at each quantile q in [0, 1]."""
+        if not self.count:
+            return np.full(np.shape(q), np.nan)
+        xs, fractions = self._knots()
+        return np.interp(q, fractions, xs)
+
+class CohortStatistics:
+    """Per-cohort quantile sketches of every user-level average.
+
+    Distributions are built once from batches of per-user averages; ranking
+    a user is then an interpolation over a fixed number of centroids, so it
+    costs the same however large the population is.
+    """
+
+    def __init__(self, metrics: Iterable[str] = tuple(AVERAGE_COLUMNS),
+                 compression: int = DEFAULT_COMPRESSION):
+        self.metrics = tuple(metrics)
+        self.compression = compression
+        self.digests: Dict[str, Dict[str, TDigest]] = {}
+
+    def update(self, cohorts: np.ndarray, averages: Dict[str, np.ndarray]):
+        """Add a batch of users, given their cohort labels and averages."""
+        labels, inverse = np.unique(np.asarray(cohorts, dtype=str), return_inverse=True)
+        for index, label in enumerate(labels):
+            members = inverse == index
+            digests = self.digests.setdefault(str(label), {
+                metric: TDigest(self.compression) for metric in self.metrics
+            })
+            for metric in self.metrics:
+                digests[metric].update(np.asarray(averages[metric], dtype=float)[members])
+
+    def percentiles(self, cohorts: np.ndarray, averages: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Each user's percentile (0-1) within their cohort for every metric."""
+        cohorts = np.asarray(cohorts, dtype=str)
+        results = {metric: np.full(len(cohorts), np.nan) for metric in self.metrics}
+        for label, digests in self.digests.items():
+            members = cohorts == label
+            for metric in self.metrics:
+                values = np.asarray(averages[metric], dtype=float)[members]
+                results[metric][members] = digests[metric].cdf(values)
+        return results
+
+def age_band(age: float, width: int = 10) -> str:
+    """Label an age with its band, e.g. 34 -> '30-39'."""
+    start = int(age) // width * width
+    return f"{start}-{start + width - 1}"
+
+def load_cohorts(path: str) -> Dict:
+    """Read a user_id -> cohort mapping from a CSV.
+
+    The CSV needs a user_id column and either an age_band column or an age
+    column, which is banded by decade.
+    """
+    cohorts = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            user_id = int(row['user_id'])
+            if row.get('age_band'):
+                cohorts[user_id] = row['age_band']
+            else:
+                cohorts[user_id] = age_band(float(row['age']))
+    return cohorts
+
+def cohort_labels(users, cohorts: Optional[Dict] = None) -> np.ndarray:
+    """Cohort label of each user; everyone shares one cohort when cohorts is None."""
+    if cohorts is None:
+        return np.full(len(users), DEFAULT_COHORT, dtype=object)
+    return np.array([cohorts.get(user_id, DEFAULT_COHORT) for user_id in users], dtype=object)
+
+def rank_averages(users, averages: Dict[str, np.ndarray], cohorts: Optional[Dict] = None,
+                  batch_size: int = 100_000) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Cohort labels and within-cohort percentiles for per-user average arrays.
+
+    The sketches are fed in batches of users, then every user is ranked
+    against their cohort's distribution.
+    """
+    labels = cohort_labels(users, cohorts)
+    statistics = CohortStatistics()
+    for start in range(0, len(labels), batch_size):
+        statistics.update(labels[start:start + batch_size], {
+            metric: values[start:start + batch_size] for metric, values in averages.items()
+        })
+    return labels, statistics.percentiles(labels, averages)
+
+def with_percentiles(analyses: Iterable[Tuple], labels: np.ndarray,
+                     percentiles: Dict[str, np.ndarray]) -> Iterator[Tuple]:
+    """Attach each user's cohort and percentiles to (user_id, analysis) pairs."""
+    for index, (user_id, analysis) in enumerate(analyses):
+        analysis['cohort'] = str(labels[index])
+        analysis['percentiles'] = {
+            metric: float(values[index]) for metric, values in percentiles.items()
+        }
+        yield user_id, analysis
+
+def rank_analyses(analyses: Dict, cohorts: Optional[Dict] = None) -> Dict:
+    """Add 'cohort' and 'percentiles' to every user's analysis."""
+    users = list(analyses)
+    averages = {
+        metric: np.array([analyses[user_id]['averages'][metric] for user_id in users], dtype=float)
+        for metric in AVERAGE_COLUMNS
+    }
+    labels, percentiles = rank_averages(users, averages, cohorts)
+    return dict(with_percentiles(analyses.items(), labels, percentiles))
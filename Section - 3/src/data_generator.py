@@ -1,33 +1,36 @@
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+import argparse
 import os
+from typing import Iterator
 
 class HealthDataGenerator:
-    def __init__(self, num_users=100, days=30):
+    def __init__(self, num_users=100, days=30, seed=None, start_date=None):
         self.num_users = num_users
         self.days = days
+        self.seed = seed
+        self.start_date = start_date
         self.data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
         os.makedirs(self.data_dir, exist_ok=True)
 
     def generate_user_data(self):
         data = []
-        start_date = datetime.now() - timedelta(days=self.days)
+        # Seeded like the vectorized generator, so --loop --seed is reproducible too
+        rng = np.random.RandomState(self.seed)
 
         for user_id in range(1, self.num_users + 1):
             # Generate base characteristics for each user
-            base_steps = np.random.normal(8000, 2000)  # Mean 8000 steps, SD 2000
-            base_heart_rate = np.random.normal(70, 5)  # Mean 70 bpm, SD 5
-            base_sleep_hours = np.random.normal(7.5, 1)  # Mean 7.5 hours, SD 1
+            base_steps = rng.normal(8000, 2000)  # Mean 8000 steps, SD 2000
+            base_heart_rate = rng.normal(70, 5)  # Mean 70 bpm, SD 5
+            base_sleep_hours = rng.normal(7.5, 1)  # Mean 7.5 hours, SD 1
 
-            for day in range(self.days):
-                current_date = start_date + timedelta(days=day)
-                
+            for current_date in self._dates():
                 # Add random daily variation
-                daily_steps = max(0, int(np.random.normal(base_steps, 1000)))
-                heart_rate = max(50, min(100, int(np.random.normal(base_heart_rate, 3))))
-                sleep_hours = max(4, min(10, np.random.normal(base_sleep_hours, 0.5)))
-                sleep_quality = min(100, max(0, int(np.random.normal(70 + (sleep_hours - 7) * 10, 10))))
+                daily_steps = max(0, int(rng.normal(base_steps, 1000)))
+                heart_rate = max(50, min(100, int(rng.normal(base_heart_rate, 3))))
+                sleep_hours = max(4, min(10, rng.normal(base_sleep_hours, 0.5)))
+                sleep_quality = min(100, max(0, int(rng.normal(70 + (sleep_hours - 7) * 10, 10))))
                 
                 # Calculate performance score based on other metrics
                 performance_score = min(100, max(0, int(
@@ -38,7 +41,7 @@ class HealthDataGenerator:
 
                 data.append({
                     'user_id': user_id,
-                    'date': current_date.strftime('%Y-%m-%d'),
+                    'date': current_date,
                     'steps': daily_steps,
                     'heart_rate': heart_rate,
                     'sleep_hours': round(sleep_hours, 2),
@@ -48,15 +51,105 @@ class HealthDataGenerator:
 
         return pd.DataFrame(data)
 
-    def save_data(self, df):
-        output_file = os.path.join(self.data_dir, 'health_data.csv')
+    def _dates(self) -> np.ndarray:
+        """The 'YYYY-MM-DD' string of each day, shared by every user."""
+        start_date = self.start_date or datetime.now() - timedelta(days=self.days)
+        return pd.date_range(pd.Timestamp(start_date).normalize(), periods=self.days) \
+            .strftime('%Y-%m-%d').to_numpy(dtype=object)
+
+    def _generate_users(self, first_user: int, num_users: int, rng: np.random.Generator,
+                        dates: np.ndarray) -> pd.DataFrame:
+        """Rows for users first_user .. first_user + num_users - 1 as array operations.
+
+        Draws from the same distributions as generate_user_data: per-user
+        baselines, daily variation around them, and the same clipping and
+        truncation toward zero as int().
+        """
+        shape = (num_users, self.days)
+        base_steps = rng.normal(8000, 2000, (num_users, 1))
+        base_heart_rate = rng.normal(70, 5, (num_users, 1))
+        base_sleep_hours = rng.normal(7.5, 1, (num_users, 1))
+
+        steps = np.maximum(0, np.trunc(rng.normal(base_steps, 1000, shape)))
+        heart_rate = np.clip(np.trunc(rng.normal(base_heart_rate, 3, shape)), 50, 100)
+        sleep_hours = np.clip(rng.normal(base_sleep_hours, 0.5, shape), 4, 10)
+        sleep_quality = np.clip(np.trunc(rng.normal(70 + (sleep_hours - 7) * 10, 10)), 0, 100)
+        performance_score = np.clip(np.trunc(
+            0.3 * (steps / 10000 * 100) +
+            0.3 * (100 - (heart_rate - 60) * 2) +
+            0.4 * sleep_quality
+        ), 0, 100)
+
+        return pd.DataFrame({
+            'user_id': np.repeat(np.arange(first_user, first_user + num_users), self.days),
+            'date': np.tile(dates, num_users),
+            'steps': steps.astype(np.int64).ravel(),
+            'heart_rate': heart_rate.astype(np.int64).ravel(),
+            'sleep_hours': np.round(sleep_hours, 2).ravel(),
+            'sleep_quality': sleep_quality.astype(np.int64).ravel(),
+            'performance_score': performance_score.astype(np.int64).ravel()
+        })
+
+    def iter_chunks(self, chunk_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+        """Generate the data as DataFrames of whole users, about chunk_rows rows each.
+
+        Each chunk draws from its own stream spawned from the seed, so the
+        output is reproducible for a given seed and chunk size.
+        """
+        users_per_chunk = max(1, chunk_rows // max(1, self.days))
+        num_chunks = -(-self.num_users // users_per_chunk)
+        streams = np.random.SeedSequence(self.seed).spawn(num_chunks)
+        dates = self._dates()
+        for index, stream in enumerate(streams):
+            first_user = index * users_per_chunk + 1
+            num_users = min(users_per_chunk, self.num_users - first_user + 1)
+            yield self._generate_users(first_user, num_users, np.random.default_rng(stream), dates)
+
+    def generate_vectorized(self, chunk_rows: int = 1_000_000) -> pd.DataFrame:
+        """The whole dataset in memory, generated with array operations."""
+        return pd.concat(self.iter_chunks(chunk_rows), ignore_index=True)
+
+    def write_csv(self, output_file: str = None, chunk_rows: int = 1_000_000) -> int:
+        """Generate the data chunk by chunk straight to a CSV; return the row count.
+
+        Only one chunk is held in memory at a time, so the file size is
+        bounded by disk rather than RAM.
+        """
+        output_file = output_file or os.path.join(self.data_dir, 'health_data.csv')
+        rows = 0
+        with open(output_file, 'w', newline='') as f:
+            for chunk in self.iter_chunks(chunk_rows):
+                chunk.to_csv(f, index=False, header=rows == 0)
+                rows += len(chunk)
+        return rows
+
+    def save_data(self, df, output_file: str = None):
+        output_file = output_file or os.path.join(self.data_dir, 'health_data.csv')
         df.to_csv(output_file, index=False)
         print(f"Data saved to {output_file}")
 
 def main():
-    generator = HealthDataGenerator()
-    data = generator.generate_user_data()
-    generator.save_data(data)
+    parser = argparse.ArgumentParser(description="Generate synthetic health data.")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=None,
+                        help="Seed for reproducible data")
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000,
+                        help="Rows generated and written per chunk")
+    parser.add_argument('--output', default=None,
+                        help="CSV to write (default: data/health_data.csv)")
+    parser.add_argument('--loop', action='store_true',
+                        help="Use the original per-row generator")
+    args = parser.parse_args()
+
+    generator = HealthDataGenerator(args.users, args.days, seed=args.seed)
+    output_file = args.output or os.path.join(generator.data_dir, 'health_data.csv')
+    if args.loop:
+        data = generator.generate_user_data()
+        generator.save_data(data, output_file)
+        return
+    rows = generator.write_csv(output_file, args.chunk_rows)
+    print(f"{rows:,} rows saved to {output_file}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, Tuple
+
+# Per-user averages, keyed by their name in the analysis output
+AVERAGE_COLUMNS = {
+    'avg_steps': 'steps',
+    'avg_heart_rate': 'heart_rate',
+    'avg_sleep_hours': 'sleep_hours',
+    'avg_sleep_quality': 'sleep_quality',
+    'avg_performance': 'performance_score'
+}
+
+# Metric pairs correlated per user
+CORRELATION_PAIRS = {
+    'sleep_quality_vs_performance': ('sleep_quality', 'performance_score'),
+    'steps_vs_performance': ('steps', 'performance_score'),
+    'heart_rate_vs_performance': ('heart_rate', 'performance_score')
+}
+
+# Weekly trend series, keyed by their name in the analysis output
+WEEKLY_COLUMNS = {
+    'steps': 'steps',
+    'sleep_quality': 'sleep_quality',
+    'performance': 'performance_score'
+}
+
+def week_ordinals(dates: pd.Series) -> np.ndarray:
+    """Number the Monday-to-Sunday weeks that resample('W') buckets dates into."""
+    days = pd.to_datetime(dates).values.astype('datetime64[D]').astype(np.int64)
+    # Day 0 (1970-01-01) was a Thursday, so shift by 3 to start weeks on Monday
+    return (days + 3) // 7
+
+def grouped_moments(codes: np.ndarray, num_groups: int,
+                    values: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Dict, Dict]:
+    """Per-group counts, means and centered deviations for each column."""
+    counts = np.bincount(codes, minlength=num_groups).astype(float)
+    means = {
+        column: np.bincount(codes, weights=column_values, minlength=num_groups) / counts
+        for column, column_values in values.items()
+    }
+    deviations = {
+        column: column_values - means[column][codes]
+        for column, column_values in values.items()
+    }
+    return counts, means, deviations
+
+def grouped_correlation(codes: np.ndarray, num_groups: int,
+                        dev_x: np.ndarray, dev_y: np.ndarray) -> np.ndarray:
+    """Pearson correlation per group from centered deviations.
+
+    Mirrors HealthDataAnalyzer.custom_correlation: groups where either
+    series is constant get 0.0.
+    """
+    covariance = np.bincount(codes, weights=dev_x * dev_y, minlength=num_groups)
+    var_x = np.bincount(codes, weights=dev_x * dev_x, minlength=num_groups)
+    var_y = np.bincount(codes, weights=dev_y * dev_y, minlength=num_groups)
+    denominator = np.sqrt(var_x) * np.sqrt(var_y)
+    correlation = np.zeros(num_groups)
+    np.divide(covariance, denominator, out=correlation, where=denominator != 0)
+    return correlation
+
+def grouped_weekly_means(codes: np.ndarray, num_groups: int, weeks: np.ndarray,
+                         values: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Dict]:
+    """Weekly means per group laid out back to back in flat arrays.
+
+    Group ``g`` owns slots ``offsets[g]:offsets[g + 1]``, one per week from
+    its first to its last; weeks without data are NaN, as with resample.
+    """
+    week_range = pd.Series(weeks).groupby(codes).agg(['min', 'max'])
+    first_week = week_range['min'].to_numpy()
+    spans = week_range['max'].to_numpy() - first_week + 1
+    offsets = np.concatenate(([0], np.cumsum(spans)))
+    slots = offsets[codes] + weeks - first_week[codes]
+
+    num_slots = int(offsets[-1])
+    slot_counts = np.bincount(slots, minlength=num_slots).astype(float)
+    weekly = {}
+    for column, column_values in values.items():
+        sums = np.bincount(slots, weights=column_values, minlength=num_slots)
+        weekly[column] = np.full(num_slots, np.nan)
+        np.divide(sums, slot_counts, out=weekly[column], where=slot_counts != 0)
+    return offsets, weekly
+
+def analyze_grouped(df: pd.DataFrame) -> Dict:
+    """Analyze every user with grouped array operations over the whole frame.
+
+    Returns the same per-user structure as
+    HealthDataAnalyzer.analyze_user_trends, keyed by user ID in order of
+    first appearance. Rows are grouped once, so the cost is O(rows) rather
+    than O(users x rows).
+    """
+    codes, users = pd.factorize(df['user_id'])
+    num_groups = len(users)
+    columns = set(AVERAGE_COLUMNS.values()) | set(WEEKLY_COLUMNS.values())
+    values = {column: df[column].to_numpy(dtype=float) for column in columns}
+
+    counts, means, deviations = grouped_moments(codes, num_groups, values)
+    correlations = {
+        name: grouped_correlation(codes, num_groups, deviations[x], deviations[y])
+        for name, (x, y) in CORRELATION_PAIRS.items()
+    }
+    offsets, weekly = grouped_weekly_means(
+        codes, num_groups, week_ordinals(df['date']),
+        {name: values[column] for name, column in WEEKLY_COLUMNS.items()}
+    )
+
+    return assemble_analyses(
+        users.to_numpy(),
+        correlations,
+        {name: means[column] for name, column in AVERAGE_COLUMNS.items()},
+        offsets,
+        weekly
+    )
+
+def assemble_analyses(users, correlations: Dict[str, np.ndarray], averages: Dict[str, np.ndarray],
+                      offsets: np.ndarray, weekly: Dict[str, np.ndarray]) -> Dict:
+    """Unpack per-group arrays into the per-user analysis dictionaries."""
+    return dict(iter_analyses(users, correlations, averages, offsets, weekly))
+
+def iter_analyses(users, correlations: Dict[str, np.ndarray], averages: Dict[str, np.ndarray],
+                  offsets: np.ndarray, weekly: Dict[str, np.ndarray]) -> Iterator[Tuple]:
+    """Yield (user_id, analysis) pairs, building one user's dictionary at a time."""
+    for group, user_id in enumerate(users):
+        start, end = offsets[group], offsets[group + 1]
+        yield user_id, {
+            'correlations': {
+                name: float(per_group[group]) for name, per_group in correlations.items()
+            },
+            'averages': {
+                name: per_group[group] for name, per_group in averages.items()
+            },
+            'weekly_trends': {
+                name: series[start:end].tolist() for name, series in weekly.items()
+            }
+        }
@@ -0,0 +1,98 @@
+import json
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Report file formats and their extensions
+FORMATS = {'text': '.txt', 'jsonl': '.jsonl'}
+
+# Bytes buffered per open report file before writing to disk
+BUFFER_SIZE = 1 << 20
+
+def _jsonable(value):
+    """Convert numpy scalars to Python values and NaN to None for strict JSON."""
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+class ReportWriter:
+    """Writes per-user report sections to text and JSONL files as they arrive.
+
+    Sections are rendered from an iterable of (user_id, user_insights) pairs
+    one user at a time and written through buffered files, so memory does not
+    grow with the number of users. With users_per_file set, the report is
+    split into numbered pages ('health_insights-00001.txt', ...), each text
+    page starting with the report header. JSONL records carry the analysis,
+    the insights and the weekly performance ASCII chart.
+    """
+
+    def __init__(self, analyzer, output_dir: str, basename: str = 'health_insights',
+                 formats: Iterable[str] = ('text',), users_per_file: Optional[int] = None,
+                 buffer_size: int = BUFFER_SIZE):
+        self.analyzer = analyzer
+        self.output_dir = output_dir
+        self.basename = basename
+        self.formats = tuple(formats)
+        unknown = set(self.formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown report format: {', '.join(sorted(unknown))}")
+        if users_per_file is not None and users_per_file < 1:
+            raise ValueError("users_per_file must be at least 1")
+        self.users_per_file = users_per_file
+        self.buffer_size = buffer_size
+
+    def path(self, fmt: str, page: Optional[int] = None) -> str:
+        suffix = f"-{page + 1:05d}" if page is not None else ""
+        return os.path.join(self.output_dir, f"{self.basename}{suffix}{FORMATS[fmt]}")
+
+    def _open_page(self, page: Optional[int]) -> Dict:
+        files = {}
+        for fmt in self.formats:
+            files[fmt] = open(self.path(fmt, page), 'w', buffering=self.buffer_size)
+            if fmt == 'text':
+                files[fmt].write(self.analyzer.render_report_header())
+        return files
+
+    def render_record(self, user_id, user_insights: Dict) -> str:
+        """One user's JSONL line."""
+        analysis = user_insights['analysis']
+        record = {
+            'user_id': user_id,
+            'insights': user_insights['insights'],
+            'analysis': analysis,
+            'weekly_performance_chart': self.analyzer.create_ascii_chart(
+                analysis['weekly_trends']['performance']
+            )
+        }
+        return json.dumps(_jsonable(record), allow_nan=False) + "\n"
+
+    def write(self, insights: Iterable[Tuple]) -> List[str]:
+        """Write every (user_id, user_insights) pair; return the paths written."""
+        paginated = self.users_per_file is not None
+        page = 0
+        paths = [self.path(fmt, 0 if paginated else None) for fmt in self.formats]
+        files = self._open_page(0 if paginated else None)
+        try:
+            for index, (user_id, user_insights) in enumerate(insights):
+                if paginated and index and index % self.users_per_file == 0:
+                    for f in files.values():
+                        f.close()
+                    page += 1
+                    paths.extend(self.path(fmt, page) for fmt in self.formats)
+                    files = self._open_page(page)
+                if 'text' in files:
+                    files['text'].write(self.analyzer.render_user_section(user_id, user_insights))
+                if 'jsonl' in files:
+                    files['jsonl'].write(self.render_record(user_id, user_insights))
+        finally:
+            for f in files.values():
+                f.close()
+        return paths
@@ -0,0 +1,165 @@
+from itertools import combinations, permutations
+from typing import Dict, Iterable, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from streaming_engine import METRICS
+
+DEFAULT_WINDOWS = (7, 14, 30)
+DEFAULT_LAGS = (1, 2, 3)
+
+# Windows with fewer paired observations than this have no correlation
+MIN_PERIODS = 3
+
+# Users laid out densely at a time; bounds each array to block x days
+BLOCK_USERS = 1024
+
+class RollingCorrelationEngine:
+    """Rolling-window and lagged Pearson correlations for every metric pair.
+
+    Users are processed in blocks of block_size. Each block's data is laid
+    out as a dense users x days x metrics array (missing days are NaN), so
+    every operation below works on the whole block at once, while memory is
+    bounded by the block rather than the population. Rolling windows come
+    from prefix sums of counts, sums, squares and cross-products along the
+    day axis: sliding a window one day is a single subtraction of two prefix
+    sums, an O(1) update per step regardless of window length. Only one
+    metric pair's prefix sums are held at a time. Series are centered on
+    each user's mean first to keep the sums-of-squares form numerically
+    stable.
+
+    A lag of k pairs metric x on day t - k with metric y on day t, e.g.
+    last night's sleep against today's performance.
+    """
+
+    def __init__(self, df: pd.DataFrame, windows: Iterable[int] = DEFAULT_WINDOWS,
+                 lags: Iterable[int] = DEFAULT_LAGS, min_periods: int = MIN_PERIODS,
+                 block_size: int = BLOCK_USERS):
+        self.windows = tuple(windows)
+        self.lags = tuple(lags)
+        self.min_periods = min_periods
+        self.block_size = block_size
+
+        codes, users = pd.factorize(df['user_id'])
+        self.users = users.to_numpy()
+        dates = pd.to_datetime(df['date']).values.astype('datetime64[D]')
+        self.start = dates.min()
+        days = (dates - self.start).astype(np.int64)
+        self.num_days = int(days.max()) + 1
+
+        # Rows grouped by user, so each block of users is a contiguous slice
+        order = np.argsort(codes, kind='stable')
+        self._codes = codes[order]
+        self._days = days[order]
+        self._values = df[METRICS].to_numpy(dtype=float)[order]
+
+        # Each user's last day with data; rolling summaries end there
+        self.last_day = pd.Series(days).groupby(codes).max().to_numpy()
+
+    def _blocks(self) -> Iterator[Tuple[slice, np.ndarray]]:
+        """Each block's users and their centered users x days x metrics array."""
+        bounds = np.searchsorted(self._codes, np.arange(0, len(self.users) + self.block_size, self.block_size))
+        for first, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            users = slice(first * self.block_size, min((first + 1) * self.block_size, len(self.users)))
+            values = np.full((users.stop - users.start, self.num_days, len(METRICS)), np.nan)
+            values[self._codes[start:end] - users.start, self._days[start:end]] = self._values[start:end]
+            values -= np.nanmean(values, axis=1, keepdims=True)
+            yield users, values
+
+    def _paired(self, values: np.ndarray, x: str, y: str, lag: int) -> Tuple[np.ndarray, np.ndarray]:
+        """x shifted forward by lag days and y, aligned on y's day axis."""
+        xs = values[:, :, METRICS.index(x)]
+        ys = values[:, :, METRICS.index(y)]
+        if lag:
+            shifted = np.full_like(xs, np.nan)
+            shifted[:, lag:] = xs[:, :-lag]
+            xs = shifted
+        return xs, ys
+
+    def _terms(self, values: np.ndarray, x: str, y: str, lag: int) -> np.ndarray:
+        """Per-day n, x, y, x^2, y^2 and xy, zeroed where either value is missing."""
+        xs, ys = self._paired(values, x, y, lag)
+        valid = ~(np.isnan(xs) | np.isnan(ys))
+        xs = np.where(valid, xs, 0.0)
+        ys = np.where(valid, ys, 0.0)
+        return np.stack([valid.astype(float), xs, ys, xs * xs, ys * ys, xs * ys])
+
+    def _prefix_sums(self, values: np.ndarray, x: str, y: str, lag: int) -> np.ndarray:
+        """Prefix sums of the per-day terms over days, with a leading zero."""
+        terms = self._terms(values, x, y, lag)
+        prefix = np.zeros(terms.shape[:2] + (terms.shape[2] + 1,))
+        np.cumsum(terms, axis=2, out=prefix[:, :, 1:])
+        return prefix
+
+    def _correlation(self, sums: np.ndarray) -> np.ndarray:
+        n, sx, sy, sxx, syy, sxy = sums
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = sxy - sx * sy / n
+            var_x = sxx - sx * sx / n
+            var_y = syy - sy * sy / n
+            correlation = cov / np.sqrt(var_x * var_y)
+        # Treat variances lost in rounding as constant series
+        degenerate = (var_x <= 1e-9 * sxx) | (var_y <= 1e-9 * syy)
+        correlation[(n < self.min_periods) | degenerate] = np.nan
+        return np.clip(correlation, -1.0, 1.0)
+
+    def rolling(self, x: str, y: str, window: int, lag: int = 0) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Correlation over the trailing window ending on each day.
+
+        Yields each block's user IDs and their users x days correlations,
+        with day 0 being self.start.
+        """
+        for users, values in self._blocks():
+            prefix = self._prefix_sums(values, x, y, lag)
+            ends = np.arange(1, prefix.shape[2])
+            starts = np.maximum(0, ends - window)
+            yield self.users[users], self._correlation(prefix[:, :, ends] - prefix[:, :, starts])
+
+    def latest(self, x: str, y: str, window: int, lag: int = 0) -> np.ndarray:
+        """Correlation over the window ending on each user's last day."""
+        return np.concatenate([
+            self._latest_from_prefix(self._prefix_sums(values, x, y, lag), self.last_day[users], window)
+            for users, values in self._blocks()
+        ])
+
+    def _latest_from_prefix(self, prefix: np.ndarray, last_day: np.ndarray, window: int) -> np.ndarray:
+        rows = np.arange(len(last_day))
+        ends = last_day + 1
+        starts = np.maximum(0, ends - window)
+        return self._correlation(prefix[:, rows, ends] - prefix[:, rows, starts])
+
+    def lagged(self, x: str, y: str, lag: int) -> np.ndarray:
+        """Whole-period correlation of x on day t - lag with y on day t."""
+        return np.concatenate([
+            self._correlation(self._terms(values, x, y, lag).sum(axis=2))
+            for _, values in self._blocks()
+        ])
+
+    def summarize(self) -> Dict:
+        """Per-user rolling and lagged correlations for every metric pair.
+
+        'rolling_correlations' holds the latest window for each unordered pair
+        and window, keyed '{x}_vs_{y}_{window}d'; 'lagged_correlations' holds
+        the whole-period correlation for each ordered pair and lag, keyed
+        '{x}_lag{lag}_vs_{y}'. Undefined correlations are NaN.
+        """
+        summaries = {}
+        for users, values in self._blocks():
+            last_day = self.last_day[users]
+            rolling = {}
+            for x, y in combinations(METRICS, 2):
+                prefix = self._prefix_sums(values, x, y, 0)
+                for window in self.windows:
+                    rolling[f"{x}_vs_{y}_{window}d"] = self._latest_from_prefix(prefix, last_day, window)
+            lagged = {
+                f"{x}_lag{lag}_vs_{y}": self._correlation(self._terms(values, x, y, lag).sum(axis=2))
+                for x, y in permutations(METRICS, 2)
+                for lag in self.lags
+            }
+            for i, user_id in enumerate(self.users[users]):
+                summaries[user_id] = {
+                    'rolling_correlations': {name: float(correlations[i]) for name, correlations in rolling.items()},
+                    'lagged_correlations': {name: float(correlations[i]) for name, correlations in lagged.items()}
+                }
+        return summaries
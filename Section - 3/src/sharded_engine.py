@@ -0,0 +1,148 @@
+import os
+import shutil
+import tempfile
+import zlib
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from streaming_engine import UserAccumulators
+
+def shard_of(user_id: bytes, num_shards: int) -> int:
+    """Stable shard for a user ID; unlike hash(), the same in every process."""
+    return zlib.crc32(user_id) % num_shards
+
+def byte_ranges(path: str, num_ranges: int) -> List[Tuple[int, int]]:
+    """Split a file into contiguous byte ranges of roughly equal size."""
+    size = os.path.getsize(path)
+    step = max(1, -(-size // num_ranges))
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+def partition_range(path: str, range_index: int, start: int, end: int,
+                    num_shards: int, tmp_dir: str) -> List[bytes]:
+    """Route the rows starting inside [start, end) to per-shard files.
+
+    A row belongs to the range its first byte falls in, so a worker skips the
+    partial row at its start and finishes the row that crosses its end.
+    Returns the user IDs in order of first appearance within the range.
+    """
+    outputs = [
+        open(os.path.join(tmp_dir, f"part-{range_index:05d}-{shard:05d}.csv"), 'wb')
+        for shard in range(num_shards)
+    ]
+    buffers: List[List[bytes]] = [[] for _ in range(num_shards)]
+    seen = {}
+    try:
+        with open(path, 'rb') as f:
+            if start == 0:
+                position = len(f.readline())  # header
+            else:
+                f.seek(start - 1)
+                position = start - 1 + len(f.readline())
+            while position < end:
+                line = f.readline()
+                if not line:
+                    break
+                position += len(line)
+                user_id = line.split(b',', 1)[0]
+                shard = seen.get(user_id)
+                if shard is None:
+                    shard = seen[user_id] = shard_of(user_id, num_shards)
+                buffers[shard].append(line)
+                if len(buffers[shard]) >= 10000:
+                    outputs[shard].writelines(buffers[shard])
+                    buffers[shard] = []
+        for shard, lines in enumerate(buffers):
+            outputs[shard].writelines(lines)
+    finally:
+        for output in outputs:
+            output.close()
+    return list(seen)
+
+def analyze_shard(shard: int, num_ranges: int, columns: List[str], tmp_dir: str,
+                  wanted: Optional[List[str]], chunksize: int) -> Dict[str, Tuple[int, int]]:
+    """Analyze one shard's users and write their report sections to a temp file.
+
+    Returns the byte offset and length of each user's section.
+    """
+    from analyzer import HealthDataAnalyzer
+
+    accumulators = UserAccumulators()
+    for range_index in range(num_ranges):
+        part = os.path.join(tmp_dir, f"part-{range_index:05d}-{shard:05d}.csv")
+        if os.path.getsize(part) == 0:
+            continue
+        for chunk in pd.read_csv(part, names=columns, header=None, chunksize=chunksize,
+                                 dtype={'user_id': str}, parse_dates=['date']):
+            accumulators.update(chunk)
+
+    analyzer = HealthDataAnalyzer()
+    analyses = accumulators.to_analyses()
+    wanted_users = set(wanted) if wanted is not None else None
+    index = {}
+    with open(os.path.join(tmp_dir, f"section-{shard:05d}.txt"), 'wb') as f:
+        for user_id, analysis in analyses.items():
+            if wanted_users is not None and user_id not in wanted_users:
+                continue
+            user_insights = {'analysis': analysis, 'insights': analyzer.generate_insights(analysis)}
+            section = analyzer.render_user_section(user_id, user_insights).encode('utf-8')
+            index[user_id] = (f.tell(), len(section))
+            f.write(section)
+    return index
+
+def analyze_sharded(path: str, output_file: str, workers: int = None,
+                    num_users: Optional[int] = None, chunksize: int = 1_000_000,
+                    tmp_dir: str = None) -> int:
+    """Analyze a health data CSV across a process pool and write the report.
+
+    Workers first split the file by byte range into per-shard partitions,
+    with users assigned to shards by hash. Each worker then analyzes one
+    shard and writes its users' report sections to a temp file, and the
+    coordinator stitches sections together in order of first appearance.
+    Writes the first num_users users (all when None) and returns how many.
+    """
+    from analyzer import HealthDataAnalyzer
+
+    workers = workers or os.cpu_count()
+    with open(path) as f:
+        columns = f.readline().strip().split(',')
+    ranges = byte_ranges(path, workers)
+    work_dir = tempfile.mkdtemp(prefix='health-shards-', dir=tmp_dir)
+    try:
+        with Pool(workers) as pool:
+            range_users = pool.starmap(partition_range, [
+                (path, range_index, start, end, workers, work_dir)
+                for range_index, (start, end) in enumerate(ranges)
+            ])
+
+            order = list(dict.fromkeys(user for users in range_users for user in users))
+            order = [user.decode('utf-8') for user in order[:num_users]]
+            wanted: Optional[Dict[int, List[str]]] = None
+            if num_users is not None:
+                wanted = {shard: [] for shard in range(workers)}
+                for user_id in order:
+                    wanted[shard_of(user_id.encode('utf-8'), workers)].append(user_id)
+
+            indexes = pool.starmap(analyze_shard, [
+                (shard, len(ranges), columns, work_dir,
+                 wanted[shard] if wanted is not None else None, chunksize)
+                for shard in range(workers)
+            ])
+
+        sections = [open(os.path.join(work_dir, f"section-{shard:05d}.txt"), 'rb')
+                    for shard in range(workers)]
+        try:
+            with open(output_file, 'wb') as out:
+                out.write(HealthDataAnalyzer().render_report_header().encode('utf-8'))
+                for user_id in order:
+                    shard = shard_of(user_id.encode('utf-8'), workers)
+                    offset, length = indexes[shard][user_id]
+                    sections[shard].seek(offset)
+                    out.write(sections[shard].read(length))
+        finally:
+            for section in sections:
+                section.close()
+        return len(order)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,252 @@
+import csv
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from grouped_engine import (
+    AVERAGE_COLUMNS, CORRELATION_PAIRS, WEEKLY_COLUMNS,
+    assemble_analyses, grouped_moments, iter_analyses, week_ordinals
+)
+
+# Metric columns tracked per user, in state-array column order
+METRICS = ['steps', 'heart_rate', 'sleep_hours', 'sleep_quality', 'performance_score']
+PAIRS = list(CORRELATION_PAIRS.values())
+WEEKLY_METRICS = list(WEEKLY_COLUMNS.values())
+
+# Weekly buckets are keyed by slot * WEEK_KEY_SPAN + week ordinal
+WEEK_KEY_SPAN = 1 << 20
+
+# UserAccumulators state arrays: one row per user, and one per weekly bucket
+USER_ARRAYS = ('count', 'total', 'mean', 'm2', 'comoment')
+WEEK_ARRAYS = ('week_keys', 'week_counts', 'week_sums')
+
+def iter_csv_chunks(path: str, chunksize: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """Read a health data CSV as a sequence of DataFrame chunks; an empty file has none."""
+    try:
+        reader = pd.read_csv(path, chunksize=chunksize, parse_dates=['date'])
+    except pd.errors.EmptyDataError:
+        return
+    yield from reader
+
+def iter_csv_rows(path: str) -> Iterator[Dict[str, str]]:
+    """Read a health data CSV one row at a time with the standard library."""
+    with open(path, newline='') as f:
+        yield from csv.DictReader(f)
+
+def batch_rows(rows: Iterable[Dict], batch_size: int = 100_000) -> Iterator[pd.DataFrame]:
+    """Group a stream of row dicts into DataFrame chunks of at most batch_size rows."""
+    batch: List[Dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield _rows_to_frame(batch)
+            batch = []
+    if batch:
+        yield _rows_to_frame(batch)
+
+def _rows_to_frame(rows: List[Dict]) -> pd.DataFrame:
+    df = pd.DataFrame(rows)
+    df['user_id'] = pd.to_numeric(df['user_id'])
+    for column in METRICS:
+        df[column] = pd.to_numeric(df[column])
+    return df
+
+class UserAccumulators:
+    """Running per-user statistics that absorb health data chunk by chunk.
+
+    Each user owns a slot in compact arrays holding the row count, the sum,
+    mean and sum of squared deviations of every metric, and the co-moment of
+    each correlated pair. A chunk is summarized with grouped array operations
+    and folded in with the pairwise form of Welford's update (Chan et al.),
+    so the state never depends on how many rows have been seen. Weekly trends
+    are kept as per-(user, week) sum and count buckets.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.slots: Dict = {}
+        self.users: List = []
+        self.count = np.zeros(capacity)
+        self.total = np.zeros((capacity, len(METRICS)))
+        self.mean = np.zeros((capacity, len(METRICS)))
+        self.m2 = np.zeros((capacity, len(METRICS)))
+        self.comoment = np.zeros((capacity, len(PAIRS)))
+        # Weekly buckets sorted by key
+        self.week_keys = np.zeros(0, dtype=np.int64)
+        self.week_counts = np.zeros(0)
+        self.week_sums = np.zeros((0, len(WEEKLY_METRICS)))
+
+    @property
+    def num_users(self) -> int:
+        return len(self.users)
+
+    def _ensure_capacity(self, size: int):
+        capacity = len(self.count)
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2)
+        for name in USER_ARRAYS:
+            old = getattr(self, name)
+            grown = np.zeros((new_capacity,) + old.shape[1:])
+            grown[:capacity] = old
+            setattr(self, name, grown)
+
+    def _slots_for(self, user_ids: np.ndarray) -> np.ndarray:
+        """Map a chunk's unique user IDs to slots, adding unseen users."""
+        slots = np.empty(len(user_ids), dtype=np.int64)
+        for i, user_id in enumerate(user_ids):
+            slot = self.slots.get(user_id)
+            if slot is None:
+                slot = self.slots[user_id] = len(self.users)
+                self.users.append(user_id)
+            slots[i] = slot
+        self._ensure_capacity(len(self.users))
+        return slots
+
+    def update(self, chunk: pd.DataFrame):
+        """Fold a chunk of rows into the running statistics."""
+        if chunk.empty:
+            return
+        codes, chunk_users = pd.factorize(chunk['user_id'])
+        num_groups = len(chunk_users)
+        slots = self._slots_for(chunk_users.to_numpy())
+        values = {column: chunk[column].to_numpy(dtype=float) for column in METRICS}
+
+        # Summarize the chunk per user
+        counts, means, deviations = grouped_moments(codes, num_groups, values)
+        chunk_mean = np.column_stack([means[column] for column in METRICS])
+        chunk_total = np.column_stack([
+            np.bincount(codes, weights=values[column], minlength=num_groups)
+            for column in METRICS
+        ])
+        chunk_m2 = np.column_stack([
+            np.bincount(codes, weights=deviations[column] ** 2, minlength=num_groups)
+            for column in METRICS
+        ])
+        chunk_comoment = np.column_stack([
+            np.bincount(codes, weights=deviations[x] * deviations[y], minlength=num_groups)
+            for x, y in PAIRS
+        ])
+
+        # Merge with the running statistics
+        n_a = self.count[slots]
+        n_b = counts
+        n = n_a + n_b
+        delta = chunk_mean - self.mean[slots]
+        weight = (n_a * n_b / n)[:, None]
+        x_index = [METRICS.index(x) for x, _ in PAIRS]
+        y_index = [METRICS.index(y) for _, y in PAIRS]
+        self.comoment[slots] += chunk_comoment + delta[:, x_index] * delta[:, y_index] * weight
+        self.m2[slots] += chunk_m2 + delta ** 2 * weight
+        self.mean[slots] += delta * (n_b / n)[:, None]
+        self.count[slots] = n
+        self.total[slots] += chunk_total
+
+        self._update_weeks(slots[codes], week_ordinals(chunk['date']), values)
+
+    def _update_weeks(self, row_slots: np.ndarray, weeks: np.ndarray, values: Dict[str, np.ndarray]):
+        keys = row_slots * WEEK_KEY_SPAN + weeks
+        chunk_keys, inverse = np.unique(keys, return_inverse=True)
+        chunk_counts = np.bincount(inverse).astype(float)
+        chunk_sums = np.column_stack([
+            np.bincount(inverse, weights=values[column]) for column in WEEKLY_METRICS
+        ])
+
+        merged_keys = np.union1d(self.week_keys, chunk_keys)
+        if len(merged_keys) != len(self.week_keys):
+            positions = np.searchsorted(merged_keys, self.week_keys)
+            counts = np.zeros(len(merged_keys))
+            sums = np.zeros((len(merged_keys), len(WEEKLY_METRICS)))
+            counts[positions] = self.week_counts
+            sums[positions] = self.week_sums
+            self.week_keys, self.week_counts, self.week_sums = merged_keys, counts, sums
+
+        positions = np.searchsorted(self.week_keys, chunk_keys)
+        self.week_counts[positions] += chunk_counts
+        self.week_sums[positions] += chunk_sums
+
+    def correlations(self) -> Dict[str, np.ndarray]:
+        """Per-user Pearson correlation of each pair; 0.0 for constant series."""
+        n = self.num_users
+        results = {}
+        for index, (name, (x, y)) in enumerate(CORRELATION_PAIRS.items()):
+            denominator = np.sqrt(self.m2[:n, METRICS.index(x)]) * np.sqrt(self.m2[:n, METRICS.index(y)])
+            correlation = np.zeros(n)
+            np.divide(self.comoment[:n, index], denominator, out=correlation, where=denominator != 0)
+            results[name] = correlation
+        return results
+
+    def averages(self) -> Dict[str, np.ndarray]:
+        # Divide exact running sums rather than using the running means, so
+        # averages round the same way as a mean over the whole frame
+        n = self.num_users
+        return {
+            name: self.total[:n, METRICS.index(column)] / self.count[:n]
+            for name, column in AVERAGE_COLUMNS.items()
+        }
+
+    def weekly_means(self):
+        """Weekly means laid out as in grouped_engine.grouped_weekly_means."""
+        slots = self.week_keys // WEEK_KEY_SPAN
+        weeks = self.week_keys % WEEK_KEY_SPAN
+        # Keys are sorted, so each user's buckets are contiguous and ordered by week
+        starts = np.searchsorted(slots, np.arange(self.num_users))
+        ends = np.searchsorted(slots, np.arange(self.num_users), side='right')
+        first_week = weeks[starts]
+        spans = weeks[ends - 1] - first_week + 1
+        offsets = np.concatenate(([0], np.cumsum(spans)))
+        positions = offsets[slots] + weeks - first_week[slots]
+
+        weekly = {}
+        for index, name in enumerate(WEEKLY_COLUMNS):
+            series = np.full(int(offsets[-1]), np.nan)
+            series[positions] = self.week_sums[:, index] / self.week_counts
+            weekly[name] = series
+        return offsets, weekly
+
+    def to_analyses(self) -> Dict:
+        """Per-user analyses in the same form as grouped_engine.analyze_grouped."""
+        offsets, weekly = self.weekly_means()
+        return assemble_analyses(self.users, self.correlations(), self.averages(), offsets, weekly)
+
+    def iter_analyses(self) -> Iterator[Tuple]:
+        """Yield (user_id, analysis) pairs one user at a time, in to_analyses order."""
+        offsets, weekly = self.weekly_means()
+        return iter_analyses(self.users, self.correlations(), self.averages(), offsets, weekly)
+
+    def save(self, path: str, metadata: Dict = None):
+        """Write the accumulators and optional JSON metadata to a compact .npz file."""
+        n = self.num_users
+        arrays = {name: getattr(self, name)[:n] for name in USER_ARRAYS}
+        arrays.update({name: getattr(self, name) for name in WEEK_ARRAYS})
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp_path,
+            users=np.array(self.users),
+            metadata=np.array(json.dumps(metadata or {})),
+            **arrays
+        )
+        # Replace atomically so a crash never leaves a half-written state file
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple['UserAccumulators', Dict]:
+        """Restore accumulators and metadata written by save()."""
+        with np.load(path, allow_pickle=False) as state:
+            accumulators = cls(capacity=max(1, len(state['users'])))
+            accumulators.users = state['users'].tolist()
+            accumulators.slots = {user_id: slot for slot, user_id in enumerate(accumulators.users)}
+            for name in USER_ARRAYS:
+                getattr(accumulators, name)[:len(accumulators.users)] = state[name]
+            for name in WEEK_ARRAYS:
+                setattr(accumulators, name, state[name])
+            metadata = json.loads(state['metadata'].item())
+        return accumulators, metadata
+
+def analyze_stream(chunks: Iterable[pd.DataFrame]) -> Dict:
+    """Analyze every user from a stream of chunks in memory independent of row count."""
+    accumulators = UserAccumulators()
+    for chunk in chunks:
+        accumulators.update(chunk)
+    return accumulators.to_analyses()
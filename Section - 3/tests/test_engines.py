@@ -0,0 +1,372 @@
+import sys
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import analyzer as analyzer_module
+from analyzer import HealthDataAnalyzer
+from data_generator import HealthDataGenerator
+from anomaly_engine import detect_anomalies, iter_anomalies
+from cohort_engine import TDigest
+from incremental import IncrementalAnalyzer
+from report_writer import ReportWriter
+from rolling_engine import RollingCorrelationEngine
+from sharded_engine import analyze_sharded, byte_ranges
+
+HEADER = "user_id,date,steps,heart_rate,sleep_hours,sleep_quality,performance_score\n"
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = str(tmp_path / "health_data.csv")
+    HealthDataGenerator(num_users=20, days=60, seed=3, start_date='2024-01-01').write_csv(path, chunk_rows=250)
+    return path
+
+@pytest.fixture
+def analyzer(tmp_path):
+    analyzer = HealthDataAnalyzer()
+    analyzer.output_dir = str(tmp_path)
+    return analyzer
+
+def assert_close(actual, expected):
+    """Equal structure and strings, with floats equal up to summation order."""
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            assert_close(actual[key], expected[key])
+    elif isinstance(expected, (list, tuple)):
+        assert len(actual) == len(expected)
+        for actual_item, expected_item in zip(actual, expected):
+            assert_close(actual_item, expected_item)
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-12)
+    else:
+        assert actual == expected
+
+def test_grouped_and_streaming_engines_match_the_loop(analyzer, data_file):
+    df = pd.read_csv(data_file, parse_dates=['date'])
+
+    loop = analyzer.analyze_all_users(df, engine='loop')
+    grouped = analyzer.analyze_all_users(df, engine='grouped')
+    # Chunks that split users across boundaries
+    streamed = analyzer.analyze_all_users_streaming(data_file, chunksize=170)
+
+    assert len(loop) == 20
+    assert_close(grouped, loop)
+    assert_close(streamed, loop)
+    for user_id in loop:
+        section = analyzer.render_user_section(user_id, loop[user_id])
+        assert analyzer.render_user_section(user_id, grouped[user_id]) == section
+        assert analyzer.render_user_section(user_id, streamed[user_id]) == section
+
+def test_streaming_an_empty_file_yields_no_users(analyzer, tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_text("")
+
+    assert analyzer.analyze_all_users_streaming(str(path)) == {}
+
+@pytest.mark.parametrize("content", ["", HEADER])
+def test_stream_report_of_an_empty_file(analyzer, tmp_path, content):
+    path = tmp_path / "empty.csv"
+    path.write_text(content)
+
+    paths = analyzer.stream_report(str(path), anomalies=True, percentiles=True)
+
+    assert paths == [os.path.join(str(tmp_path), 'health_insights.txt')]
+
+def test_loop_generator_is_reproducible_with_a_seed():
+    first = HealthDataGenerator(num_users=3, days=10, seed=7, start_date='2024-01-01').generate_user_data()
+    second = HealthDataGenerator(num_users=3, days=10, seed=7, start_date='2024-01-01').generate_user_data()
+    other = HealthDataGenerator(num_users=3, days=10, seed=8, start_date='2024-01-01').generate_user_data()
+
+    pd.testing.assert_frame_equal(first, second)
+    assert not first.equals(other)
+    assert first['date'].iloc[0] == '2024-01-01' and len(first) == 30
+
+def users_across_boundaries(path, workers):
+    """User IDs whose rows fall on both sides of a byte range boundary."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    users = set()
+    for start, _ in byte_ranges(path, workers)[1:]:
+        line_start = data.rfind(b'\n', 0, start) + 1
+        before = data[data.rfind(b'\n', 0, line_start - 1) + 1:line_start]
+        after = data[data.find(b'\n', start) + 1:]
+        if before.split(b',', 1)[0] == after.split(b',', 1)[0]:
+            users.add(before.split(b',', 1)[0])
+    return users
+
+@pytest.mark.parametrize("num_users", [None, 7])
+def test_sharded_report_matches_single_process(analyzer, data_file, tmp_path, num_users):
+    # Users' rows are contiguous, so three ranges of 20 users split some of them
+    assert users_across_boundaries(data_file, 3)
+    analyzer.stream_report(data_file, chunksize=170, num_users=num_users)
+    with open(os.path.join(str(tmp_path), 'health_insights.txt')) as f:
+        expected = f.read()
+
+    output_file = str(tmp_path / "sharded.txt")
+    written = analyze_sharded(data_file, output_file, workers=3, num_users=num_users, chunksize=170)
+
+    with open(output_file) as f:
+        assert f.read() == expected
+    assert written == (num_users or 20)
+
+@pytest.mark.parametrize("flags, rejected", [
+    (["--rolling"], "--rolling"),
+    (["--formats", "text", "jsonl"], "--formats jsonl"),
+    (["--users-per-file", "5"], "--users-per-file"),
+    (["--percentiles"], "--percentiles"),
+    (["--anomalies"], "--anomalies"),
+    (["--incremental"], "--incremental")
+])
+def test_workers_rejects_flags_it_would_ignore(monkeypatch, capsys, flags, rejected):
+    monkeypatch.setattr(sys, 'argv', ['analyzer.py', '--workers', '2'] + flags)
+
+    with pytest.raises(SystemExit) as exited:
+        analyzer_module.main()
+
+    assert exited.value.code == 2
+    assert f"--workers does not support {rejected}" in capsys.readouterr().err
+
+def ingested_rows(incremental):
+    """Ingest and return the number of rows actually folded into the accumulators."""
+    rows = []
+    update = incremental.accumulators.update
+    incremental.accumulators.update = lambda chunk: rows.append(len(chunk)) or update(chunk)
+    incremental.ingest()
+    return sum(rows)
+
+def test_incremental_reads_only_appended_rows(analyzer, data_file, tmp_path):
+    with open(data_file) as f:
+        lines = f.readlines()
+    path = str(tmp_path / "growing.csv")
+    state_path = str(tmp_path / "state.npz")
+    with open(path, 'w') as f:
+        f.writelines(lines[:501])
+    assert ingested_rows(IncrementalAnalyzer(path, state_path, chunksize=170)) == 500
+
+    # The last row is still being written, so it waits for the next run
+    with open(path, 'a') as f:
+        f.writelines(lines[501:800])
+        f.write(lines[800][:10])
+    assert ingested_rows(IncrementalAnalyzer(path, state_path, chunksize=170)) == 299
+    with open(path, 'a') as f:
+        f.write(lines[800][10:])
+        f.writelines(lines[801:])
+    assert ingested_rows(IncrementalAnalyzer(path, state_path, chunksize=170)) == len(lines) - 800
+    assert ingested_rows(IncrementalAnalyzer(path, state_path, chunksize=170)) == 0
+
+    incremental = analyzer.analyze_all_users_incremental(path, state_path, chunksize=170)
+    assert_close(incremental, analyzer.analyze_all_users_streaming(data_file, chunksize=170))
+    ranked = analyzer.analyze_all_users_incremental(path, state_path, percentiles=True)
+    assert all('percentiles' in user['analysis'] for user in ranked.values())
+
+def test_incremental_rebuilds_state_for_a_rewritten_file(analyzer, data_file, tmp_path):
+    state_path = str(tmp_path / "state.npz")
+    analyzer.analyze_all_users_incremental(data_file, state_path)
+
+    # New contents under the same name: a rewrite, not an append
+    HealthDataGenerator(num_users=20, days=60, seed=4, start_date='2024-01-01').write_csv(data_file, chunk_rows=250)
+    with open(data_file) as f:
+        rows = sum(1 for _ in f) - 1
+    assert ingested_rows(IncrementalAnalyzer(data_file, state_path)) == rows
+
+    incremental = analyzer.analyze_all_users_incremental(data_file, state_path)
+    assert_close(incremental, analyzer.analyze_all_users_streaming(data_file))
+
+def test_incremental_rejects_flags_it_would_ignore(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['analyzer.py', '--incremental', '--rolling', '--anomalies'])
+
+    with pytest.raises(SystemExit):
+        analyzer_module.main()
+
+    assert "--incremental does not support --rolling, --anomalies" in capsys.readouterr().err
+
+def test_streaming_rejects_rolling(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['analyzer.py', '--streaming', '--rolling'])
+
+    with pytest.raises(SystemExit):
+        analyzer_module.main()
+
+    assert "--streaming does not support --rolling" in capsys.readouterr().err
+
+@pytest.fixture
+def gappy_frame(data_file):
+    """The generated data with a tenth of the days missing, in shuffled order."""
+    df = pd.read_csv(data_file, parse_dates=['date'])
+    return df.sample(frac=0.9, random_state=0)
+
+def daily_series(df, user_id, metric, start, num_days):
+    user = df[df['user_id'] == user_id].set_index('date')[metric]
+    return user.reindex(pd.date_range(start, periods=num_days, freq='D'))
+
+@pytest.mark.parametrize("window, lag", [(7, 0), (14, 2)])
+def test_rolling_correlations_match_pandas(gappy_frame, window, lag):
+    # Blocks of 6 users, so 20 users take four blocks and the last one is partial
+    engine = RollingCorrelationEngine(gappy_frame, block_size=6)
+    blocks = list(engine.rolling('sleep_quality', 'performance_score', window, lag))
+
+    assert [len(users) for users, _ in blocks] == [6, 6, 6, 2]
+    for users, correlations in blocks:
+        for user_id, row in zip(users, correlations):
+            x = daily_series(gappy_frame, user_id, 'sleep_quality', engine.start, engine.num_days)
+            y = daily_series(gappy_frame, user_id, 'performance_score', engine.start, engine.num_days)
+            expected = x.shift(lag).rolling(window, min_periods=3).corr(y).to_numpy()
+            np.testing.assert_allclose(row, expected, rtol=1e-7, atol=1e-9)
+
+def test_lagged_and_latest_correlations_match_pandas(gappy_frame):
+    engine = RollingCorrelationEngine(gappy_frame, block_size=6)
+    lagged = engine.lagged('sleep_hours', 'heart_rate', 1)
+    latest = engine.latest('steps', 'performance_score', 30)
+
+    for i, user_id in enumerate(engine.users):
+        x = daily_series(gappy_frame, user_id, 'sleep_hours', engine.start, engine.num_days)
+        y = daily_series(gappy_frame, user_id, 'heart_rate', engine.start, engine.num_days)
+        assert lagged[i] == pytest.approx(x.shift(1).corr(y), rel=1e-9)
+
+        steps = daily_series(gappy_frame, user_id, 'steps', engine.start, engine.num_days)
+        performance = daily_series(gappy_frame, user_id, 'performance_score', engine.start, engine.num_days)
+        last = steps.last_valid_index()
+        expected = steps[:last].tail(30).corr(performance[:last].tail(30))
+        assert latest[i] == pytest.approx(expected, rel=1e-9)
+
+def test_rolling_summaries_do_not_depend_on_the_block_size(gappy_frame):
+    whole = RollingCorrelationEngine(gappy_frame, block_size=1024).summarize()
+
+    assert_close(RollingCorrelationEngine(gappy_frame, block_size=3).summarize(), whole)
+
+@pytest.fixture
+def insights(analyzer, data_file):
+    df = pd.read_csv(data_file, parse_dates=['date'])
+    return analyzer.analyze_all_users(df.head(7 * 60), rolling=True)
+
+def test_report_writer_jsonl_records(analyzer, insights, tmp_path):
+    paths = ReportWriter(analyzer, str(tmp_path), formats=['jsonl']).write(insights.items())
+
+    assert paths == [str(tmp_path / "health_insights.jsonl")]
+    with open(paths[0]) as f:
+        records = [json.loads(line) for line in f]
+    assert [record['user_id'] for record in records] == list(insights)
+    for record in records:
+        user = insights[record['user_id']]
+        assert record['insights'] == user['insights']
+        assert record['analysis']['averages'] == pytest.approx(user['analysis']['averages'])
+        assert record['weekly_performance_chart'] == analyzer.create_ascii_chart(
+            user['analysis']['weekly_trends']['performance'])
+
+def test_report_writer_jsonl_writes_nan_as_null(analyzer, insights, tmp_path):
+    user_id = next(iter(insights))
+    insights[user_id]['analysis']['rolling_correlations']['steps_vs_heart_rate_7d'] = float('nan')
+
+    path, = ReportWriter(analyzer, str(tmp_path), formats=['jsonl']).write(insights.items())
+
+    with open(path) as f:
+        record = json.loads(f.readline())
+    assert record['analysis']['rolling_correlations']['steps_vs_heart_rate_7d'] is None
+
+def test_report_writer_splits_pages(analyzer, insights, tmp_path):
+    whole_dir = tmp_path / "whole"
+    whole_dir.mkdir()
+    ReportWriter(analyzer, str(whole_dir)).write(insights.items())
+
+    paths = ReportWriter(analyzer, str(tmp_path), formats=['text', 'jsonl'], users_per_file=3).write(insights.items())
+
+    assert [os.path.basename(path) for path in paths] == [
+        f"health_insights-{page:05d}.{extension}" for page in (1, 2, 3) for extension in ('txt', 'jsonl')
+    ]
+    header = analyzer.render_report_header()
+    pages = []
+    for path in paths[::2]:
+        with open(path) as f:
+            page = f.read()
+        assert page.startswith(header)
+        pages.append(page[len(header):])
+    with open(whole_dir / "health_insights.txt") as f:
+        assert header + "".join(pages) == f.read()
+    line_counts = []
+    for path in paths[1::2]:
+        with open(path) as f:
+            line_counts.append(sum(1 for _ in f))
+    assert line_counts == [3, 3, 1]
+
+@pytest.mark.parametrize("options", [{'formats': ['pdf']}, {'users_per_file': 0}])
+def test_report_writer_rejects_bad_options(analyzer, tmp_path, options):
+    with pytest.raises(ValueError):
+        ReportWriter(analyzer, str(tmp_path), **options)
+
+# Largest difference allowed between a t-digest estimate's rank and the exact one
+TDIGEST_RANK_ERROR = 0.002
+
+@pytest.mark.parametrize("distribution", ['normal', 'lognormal'])
+def test_tdigest_percentiles_are_within_the_stated_error(distribution):
+    rng = np.random.default_rng(5)
+    values = rng.normal(70, 5, 100_000) if distribution == 'normal' else rng.lognormal(8, 0.6, 100_000)
+    digest, other = TDigest(), TDigest()
+    for batch in np.array_split(values[:60_000], 6):
+        digest.update(batch)
+    for batch in np.array_split(values[60_000:], 4):
+        other.update(batch)
+    digest.merge(other)
+
+    quantiles = np.array([0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999])
+    exact = np.percentile(values, quantiles * 100)
+    assert digest.count == len(values)
+    assert len(digest.means) <= digest.compression
+    assert np.abs(digest.cdf(exact) - quantiles).max() < TDIGEST_RANK_ERROR
+    estimated = digest.quantile(quantiles)
+    ranks = (values[:, None] <= estimated).mean(axis=0)
+    assert np.abs(ranks - quantiles).max() < TDIGEST_RANK_ERROR
+    assert digest.quantile([0.0, 1.0]).tolist() == [values.min(), values.max()]
+
+def daily_frame(heart_rate, sleep_hours):
+    """Sixty days of one user's data with the given heart rate and sleep series."""
+    return pd.DataFrame({
+        'user_id': 1,
+        'date': pd.date_range('2024-01-01', periods=60).strftime('%Y-%m-%d'),
+        'steps': 8000.0,
+        'heart_rate': heart_rate,
+        'sleep_hours': sleep_hours,
+        'sleep_quality': 7.0,
+        'performance_score': 70.0
+    })
+
+@pytest.fixture
+def noisy_series():
+    rng = np.random.default_rng(0)
+    return 70 + 2 * rng.normal(size=60), 7.5 + 0.3 * rng.normal(size=60)
+
+def test_anomalies_ignore_flat_and_steady_series(noisy_series):
+    assert detect_anomalies(daily_frame(np.full(60, 70.0), np.full(60, 7.5))).empty
+    assert detect_anomalies(daily_frame(*noisy_series)).empty
+
+def test_anomalies_flag_an_injected_spike(noisy_series):
+    heart_rate, sleep_hours = noisy_series
+    heart_rate = heart_rate.copy()
+    heart_rate[40] += 30
+
+    events = detect_anomalies(daily_frame(heart_rate, sleep_hours))
+
+    assert set(events['date']) == {'2024-02-10'}
+    assert set(events['metric']) == {'heart_rate'}
+    assert 'zscore' in set(events['detector'])
+    assert events['zscore'].min() > 4
+
+def test_cusum_flags_a_sustained_drop_the_zscore_misses(noisy_series):
+    heart_rate, sleep_hours = noisy_series
+    sleep_hours = sleep_hours.copy()
+    sleep_hours[40:47] -= 1.0
+    df = daily_frame(heart_rate, sleep_hours)
+
+    events = detect_anomalies(df)
+
+    assert events[['metric', 'detector']].values.tolist() == [['sleep_hours', 'cusum_down']]
+    assert '2024-02-10' < events['date'].iloc[0] < '2024-02-17'
+    # Chunks that split the user's days give the same events
+    chunks = [df.iloc[start:start + 9] for start in range(0, len(df), 9)]
+    streamed = pd.concat([chunk for chunk in iter_anomalies(chunks) if not chunk.empty], ignore_index=True)
+    pd.testing.assert_frame_equal(streamed, events)
@@ -1,15 +1,80 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from datetime import datetime
 import random
 import uvicorn
-from typing import Dict
+from typing import Dict, Union
 from pydantic import BaseModel
-import time
+from contextlib import asynccontextmanager
+import argparse
+import asyncio
+import logging
+import os
+from metrics import (
+    PROMETHEUS_CONTENT_TYPE, LoopLagMonitor, MetricsMiddleware, MetricsRegistry, span
+)
+from response_cache import ResponseCache, encode_json
+from store import Reading, SQLiteStore
 
-app = FastAPI(title="Fitness Data API")
+# Serve hot endpoints with orjson-encoded Response objects instead of
+# FastAPI's default model validation and encoding; set to "0" to benchmark
+# the default path
+FAST_RESPONSES = os.getenv("FITNESS_API_FAST_RESPONSES", "1") == "1"
 
-# In-memory store for demo purposes
-user_data_store: Dict[str, Dict] = {}
+# Simulated processing time of the fitness data endpoint, in seconds
+SIMULATED_LATENCY = 0.1
+
+# Path of the SQLite file shared by worker processes; when unset, readings
+# live in a per-process dict, which is fine for a single worker
+STORE_PATH = os.getenv("FITNESS_API_STORE")
+
+# Readings keyed by user ID
+user_data_store: Union[Dict[str, Reading], SQLiteStore] = (
+    SQLiteStore(STORE_PATH) if STORE_PATH else {}
+)
+
+# Dashboards poll stats for the same users every few seconds
+STATS_CACHE_TTL = 5.0
+stats_cache = ResponseCache(ttl=STATS_CACHE_TTL)
+
+# Log a timing line with per-step spans for every request
+TRACE_REQUESTS = os.getenv("FITNESS_API_TRACE", "0") == "1"
+if TRACE_REQUESTS:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+metrics = MetricsRegistry()
+metrics.add_callback(
+    "fitness_api_store_readings", "gauge",
+    "Users with a stored reading.", lambda: len(user_data_store)
+)
+for counter in ("hits", "misses", "coalesced", "invalidations"):
+    metrics.add_callback(
+        f"fitness_api_stats_cache_{counter}_total", "counter",
+        f"Stats response cache {counter}.",
+        lambda counter=counter: getattr(stats_cache, counter)
+    )
+metrics.add_callback(
+    "fitness_api_stats_cache_hit_ratio", "gauge",
+    "Share of stats lookups served without a new computation.",
+    lambda: stats_cache.metrics()["hit_rate"]
+)
+loop_lag_monitor = LoopLagMonitor(metrics)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared store on worker startup and close it on shutdown."""
+    if isinstance(user_data_store, SQLiteStore):
+        user_data_store.open()
+    loop_lag_monitor.start()
+    yield
+    await loop_lag_monitor.stop()
+    if isinstance(user_data_store, SQLiteStore):
+        user_data_store.close()
+
+app = FastAPI(title="Fitness Data API", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware, registry=metrics, trace=TRACE_REQUESTS)
 
 class FitnessData(BaseModel):
     user_id: str
@@ -17,47 +82,69 @@ class FitnessData(BaseModel):
     steps: int
     heart_rate: int
 
-def generate_fitness_data(user_id: str) -> FitnessData:
-    """Generate synthetic fitness data for a user."""
+def generate_reading() -> Reading:
+    """Generate a synthetic fitness reading."""
     current_time = datetime.now().isoformat()
     
     # Generate realistic-looking data
     steps = random.randint(0, 500)  # Steps in last interval
     heart_rate = random.randint(60, 150)  # Normal heart rate range
     
+    return Reading(current_time, steps, heart_rate)
+
+def generate_fitness_data(user_id: str) -> FitnessData:
+    """Generate synthetic fitness data for a user."""
+    reading = generate_reading()
     return FitnessData(
         user_id=user_id,
-        timestamp=current_time,
-        steps=steps,
-        heart_rate=heart_rate
+        timestamp=reading.timestamp,
+        steps=reading.steps,
+        heart_rate=reading.heart_rate
     )
 
+def json_response(payload) -> Response:
+    """Build a JSON response directly, bypassing FastAPI's encoder."""
+    return Response(content=encode_json(payload), media_type="application/json")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    payload = {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    if FAST_RESPONSES:
+        return json_response(payload)
+    return payload
 
 @app.get("/api/v1/fitness/data/{user_id}")
 async def get_fitness_data(user_id: str):
     """Get real-time fitness data for a user."""
-    # Simulate processing time
-    time.sleep(0.1)
+    # Simulate processing time without blocking the event loop
+    await asyncio.sleep(SIMULATED_LATENCY)
     
     if not user_id.strip():
         raise HTTPException(status_code=400, detail="Invalid user ID")
     
     # Generate and store new data
+    if FAST_RESPONSES:
+        reading = generate_reading()
+        with span("store_put"):
+            user_data_store[user_id] = reading
+        stats_cache.invalidate(user_id)
+        return json_response({
+            "user_id": user_id,
+            "timestamp": reading.timestamp,
+            "steps": reading.steps,
+            "heart_rate": reading.heart_rate
+        })
+    
     data = generate_fitness_data(user_id)
-    user_data_store[user_id] = data.dict()
+    with span("store_put"):
+        user_data_store[user_id] = Reading(data.timestamp, data.steps, data.heart_rate)
+    stats_cache.invalidate(user_id)
     
     return data
 
-@app.get("/api/v1/fitness/stats/{user_id}")
-async def get_user_stats(user_id: str):
-    """Get aggregated fitness stats for a user."""
-    if user_id not in user_data_store:
-        raise HTTPException(status_code=404, detail="User not found")
-    
+async def compute_user_stats(user_id: str) -> Dict:
+    """Aggregate fitness stats for a user."""
     # In a real implementation, this would aggregate from a database
     return {
         "user_id": user_id,
@@ -66,5 +153,72 @@ async def get_user_stats(user_id: str):
         "active_minutes": random.randint(30, 180)
     }
 
+async def compute_shared_user_stats(user_id: str, version: str) -> bytes:
+    """Compute stats once per reading across every worker sharing the store."""
+    body = encode_json(await compute_user_stats(user_id))
+    return user_data_store.setdefault_stats(user_id, version, body)
+
+@app.get("/api/v1/fitness/stats/{user_id}")
+async def get_user_stats(user_id: str):
+    """Get aggregated fitness stats for a user."""
+    with span("store_get"):
+        reading = user_data_store.get(user_id)
+    if reading is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Cache hits return the pre-encoded body, skipping model and JSON encoding.
+    # The reading timestamp versions each entry, so a reading stored by
+    # another worker also invalidates this worker's cached stats.
+    if isinstance(user_data_store, SQLiteStore):
+        compute = lambda: compute_shared_user_stats(user_id, reading.timestamp)
+    else:
+        compute = lambda: compute_user_stats(user_id)
+    with span("stats_cache"):
+        body = await stats_cache.get_or_compute(
+            user_id, compute, version=reading.timestamp
+        )
+    return Response(content=body, media_type="application/json")
+
+@app.get("/metrics")
+async def get_metrics():
+    """Expose server metrics in the Prometheus text format."""
+    return Response(content=metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/api/v1/cache/metrics")
+async def get_cache_metrics():
+    """Get hit and miss metrics for the stats response cache."""
+    return stats_cache.metrics()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fitness data API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes")
+    parser.add_argument("--store", default=None,
+                        help="SQLite file shared by workers (defaults to data/api_store.db with --workers > 1)")
+    parser.add_argument("--reload", action="store_true",
+                        help="Restart on code changes (development only, single worker)")
+    args = parser.parse_args()
+
+    if args.reload and args.workers > 1:
+        parser.error("--reload cannot be combined with --workers")
+
+    store_path = args.store or STORE_PATH
+    if store_path is None and args.workers > 1:
+        store_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "api_store.db")
+    if store_path:
+        # Worker processes re-import this module and pick the store up from the environment
+        os.environ["FITNESS_API_STORE"] = os.path.abspath(store_path)
+
+    uvicorn.run(
+        "api_server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reload=args.reload,
+        timeout_graceful_shutdown=10
+    )
+
 if __name__ == "__main__":
-    uvicorn.run("api_server:app", host="127.0.0.1", port=8000, reload=True) 
\ No newline at end of file
+    main() 
\ No newline at end of file
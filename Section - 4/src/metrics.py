@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("fitness_api.trace")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow requests
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Spans recorded for the current request when tracing is enabled
+_current_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar(
+    "current_spans", default=None
+)
+
+@contextmanager
+def span(name: str):
+    """Time a block as a span of the current request; a no-op unless tracing."""
+    spans = _current_spans.get()
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, time.perf_counter() - start))
+
+class Histogram:
+    """Prometheus histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, labels: Tuple[str, ...] = ()) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            label_text = ",".join(
+                f'{name}="{value}"' for name, value in zip(self.label_names, labels)
+            )
+            prefix = label_text + "," if label_text else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Request metrics plus gauges and counters read at scrape time."""
+
+    def __init__(self):
+        self.request_duration = Histogram(
+            "fitness_api_request_duration_seconds",
+            "Request latency by route, method and status.",
+            ("route", "method", "status")
+        )
+        self.loop_lag = Histogram(
+            "fitness_api_event_loop_lag_seconds",
+            "Delay between when the event loop monitor should wake up and when it did."
+        )
+        self.in_flight = 0
+        self._callbacks: List[Tuple[str, str, str, Callable[[], float]]] = []
+        self.add_callback(
+            "fitness_api_requests_in_flight", "gauge",
+            "Requests currently being served.", lambda: self.in_flight
+        )
+
+    def add_callback(self, name: str, metric_type: str, help: str, read: Callable[[], float]):
+        """Register a gauge or counter whose value is read when metrics are scraped."""
+        self._callbacks.append((name, metric_type, help, read))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = self.request_duration.render() + self.loop_lag.render()
+        for name, metric_type, help, read in self._callbacks:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"{name} {read()}")
+        return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight requests and optional spans.
+
+    Written as plain ASGI rather than ``BaseHTTPMiddleware`` so the cost per
+    request is a couple of clock reads and a dict lookup.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry, trace: bool = False):
+        self.app = app
+        self.registry = registry
+        self.trace = trace
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _current_spans.set([]) if self.trace else None
+        registry.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            registry.in_flight -= 1
+            # FastAPI records the matched route in the scope; use its path
+            # template so per-user URLs share one series
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            registry.request_duration.observe(
+                duration, (route_path, scope["method"], str(status))
+            )
+            if token is not None:
+                spans = _current_spans.get()
+                _current_spans.reset(token)
+                span_text = " ".join(f"{name}={elapsed * 1000:.3f}ms" for name, elapsed in spans)
+                logger.info(
+                    f"{scope['method']} {scope['path']} {status} "
+                    f"{duration * 1000:.3f}ms {span_text}".rstrip()
+                )
+
+class LoopLagMonitor:
+    """Background task sampling how late the event loop wakes up."""
+
+    def __init__(self, registry: MetricsRegistry, interval: float = 0.5):
+        self.registry = registry
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.registry.loop_lag.observe(max(0.0, time.perf_counter() - start - self.interval))
@@ -0,0 +1,134 @@
+import asyncio
+import orjson
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+def encode_json(payload: Any) -> bytes:
+    """Encode a payload to the same compact UTF-8 JSON as FastAPI's JSONResponse."""
+    return orjson.dumps(payload)
+
+class ResponseCache:
+    """TTL cache of pre-encoded JSON responses with request coalescing.
+
+    Concurrent misses for the same key share a single computation, and
+    invalidating a key discards both the cached bytes and any computation
+    still in flight so stale results are never stored. If the request
+    computing a value is cancelled, the first waiter takes over. Entries can also carry
+    a version, so a process sharing state with others can detect that another
+    worker has changed the underlying data without being told.
+    """
+
+    def __init__(self, ttl: float = 5.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, bytes, Any]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def get(self, key: str, version: Any = None) -> Optional[bytes]:
+        """Return cached bytes for a key if present, current and not expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, body, entry_version = entry
+        if expires_at <= time.monotonic() or entry_version != version:
+            del self._entries[key]
+            return None
+        return body
+
+    def set(self, key: str, body: bytes, ttl: Optional[float] = None, version: Any = None):
+        """Store pre-encoded bytes for a key with an optional per-key TTL."""
+        ttl = self.ttl if ttl is None else ttl
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + ttl, body, version)
+        if len(self._entries) > self.max_entries:
+            self._evict()
+
+    def invalidate(self, key: str):
+        """Drop a key so the next request recomputes it."""
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._inflight.pop(key, None)
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        """Remove every entry and reset the metrics."""
+        self._entries.clear()
+        self._inflight.clear()
+        self._generations.clear()
+        self.hits = self.misses = self.coalesced = self.invalidations = 0
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        version: Any = None,
+    ) -> bytes:
+        """Return cached bytes for a key, computing and encoding them on a miss.
+
+        ``compute`` may return a payload to encode or already-encoded bytes.
+        """
+        body = self.get(key, version)
+        if body is not None:
+            self.hits += 1
+            return body
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The request computing the value was cancelled, not this one; compute it here
+                return await self.get_or_compute(key, compute, ttl, version)
+
+        self.misses += 1
+        generation = self._generations.get(key, 0)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+            body = result if isinstance(result, bytes) else encode_json(result)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(body)
+            if self._generations.get(key, 0) == generation:
+                self.set(key, body, ttl, version)
+            return body
+        finally:
+            # Cancellation is not an Exception; release the waiters rather than leave them hanging
+            if not future.done():
+                future.cancel()
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return hit/miss counters for the cache."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+    def _evict(self):
+        """Drop expired entries, then the oldest ones, until under the limit."""
+        now = time.monotonic()
+        for key in [k for k, (exp, _, _) in self._entries.items() if exp <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
@@ -0,0 +1,122 @@
+import os
+import sqlite3
+from typing import Iterator, NamedTuple, Optional
+
+class Reading(NamedTuple):
+    """Compact internal form of a stored fitness reading."""
+    timestamp: str
+    steps: int
+    heart_rate: int
+
+class SQLiteStore:
+    """Reading and stats state shared by every worker process on a host.
+
+    Behaves like the in-memory ``Dict[str, Reading]`` store so the API can
+    use either. The database runs in WAL mode so readers in one worker never
+    block the writer in another, and each process opens its own connection
+    lazily so the store is safe to create before uvicorn spawns workers.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self.open()
+        return self._conn
+
+    def open(self):
+        """Open this process's connection and create the schema if needed."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS readings (
+                user_id TEXT PRIMARY KEY,
+                timestamp TEXT NOT NULL,
+                steps INTEGER NOT NULL,
+                heart_rate INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS stats (
+                user_id TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                body BLOB NOT NULL
+            );
+        """)
+        self._conn = conn
+        self._pid = os.getpid()
+
+    def close(self):
+        """Close this process's connection, checkpointing the WAL."""
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+        self._pid = None
+
+    def __setitem__(self, user_id: str, reading: Reading):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO readings VALUES (?, ?, ?, ?)",
+            (user_id, *reading)
+        )
+
+    def __getitem__(self, user_id: str) -> Reading:
+        reading = self.get(user_id)
+        if reading is None:
+            raise KeyError(user_id)
+        return reading
+
+    def __delitem__(self, user_id: str):
+        cursor = self.conn.execute("DELETE FROM readings WHERE user_id = ?", (user_id,))
+        if cursor.rowcount == 0:
+            raise KeyError(user_id)
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get(user_id) is not None
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        return (row[0] for row in self.conn.execute("SELECT user_id FROM readings").fetchall())
+
+    def get(self, user_id: str, default: Optional[Reading] = None) -> Optional[Reading]:
+        row = self.conn.execute(
+            "SELECT timestamp, steps, heart_rate FROM readings WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        return Reading(*row) if row else default
+
+    def clear(self):
+        self.conn.executescript("DELETE FROM readings; DELETE FROM stats;")
+
+    def setdefault_stats(self, user_id: str, version: str, body: bytes) -> bytes:
+        """Store stats for a reading version unless a worker already did.
+
+        Returns the body every worker should serve for that version, so
+        concurrent workers computing the same stats agree on one result.
+        Versions are ISO timestamps, so newer versions compare greater.
+        """
+        conn = self.conn
+        conn.execute(
+            """
+            INSERT INTO stats VALUES (?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET version = excluded.version, body = excluded.body
+            WHERE stats.version < excluded.version
+            """,
+            (user_id, version, body)
+        )
+        row = conn.execute(
+            "SELECT body FROM stats WHERE user_id = ? AND version = ?",
+            (user_id, version)
+        ).fetchone()
+        return bytes(row[0]) if row else body
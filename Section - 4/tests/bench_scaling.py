@@ -0,0 +1,102 @@
+"""Benchmark API throughput as the number of worker processes grows.
+
+Starts the server in production mode (shared SQLite store, no reload) with
+1..N workers and drives it from several client processes, printing
+requests per second for each worker count:
+
+    python tests/bench_scaling.py --max-workers 4 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+USERS = [f"bench_user{i}" for i in range(50)]
+
+async def client_loop(base_url: str, duration: float, concurrency: int) -> int:
+    """Hit the stats and health endpoints until the deadline; return completed requests."""
+    deadline = time.perf_counter() + duration
+    completed = 0
+
+    async def worker(offset: int):
+        nonlocal completed
+        i = offset
+        while time.perf_counter() < deadline:
+            user_id = USERS[i % len(USERS)]
+            endpoint = "/health" if i % 4 == 0 else f"/api/v1/fitness/stats/{user_id}"
+            response = await client.get(endpoint)
+            if response.status_code == 200:
+                completed += 1
+            i += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    return completed
+
+def run_client(args) -> int:
+    return asyncio.run(client_loop(*args))
+
+def wait_until_healthy(base_url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become healthy")
+
+def benchmark_workers(workers: int, args) -> float:
+    base_url = f"http://127.0.0.1:{args.port}"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        server = subprocess.Popen(
+            [sys.executable, "api_server.py", "--port", str(args.port),
+             "--workers", str(workers), "--store", os.path.join(tmp_dir, "store.db")],
+            cwd=SRC_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_until_healthy(base_url)
+            for user_id in USERS:
+                httpx.get(f"{base_url}/api/v1/fitness/data/{user_id}", timeout=10)
+
+            with multiprocessing.Pool(args.clients) as pool:
+                start_time = time.perf_counter()
+                counts = pool.map(run_client, [(base_url, args.duration, args.concurrency)] * args.clients)
+                elapsed = time.perf_counter() - start_time
+            return sum(counts) / elapsed
+        finally:
+            # SIGTERM lets uvicorn drain connections and run the shutdown hooks
+            server.terminate()
+            server.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--clients", type=int, default=4, help="Client processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="Connections per client")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+    workers = 1
+    while workers <= args.max_workers:
+        rps = benchmark_workers(workers, args)
+        baseline = baseline or rps
+        print(f"{workers:>8} {rps:>10.0f} {rps / baseline:>7.2f}x")
+        workers *= 2
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""Load generator for the fitness data API.
+
+Supports open-loop runs (requests arrive at a constant rate whether or not
+earlier ones have finished) and closed-loop runs (a fixed number of virtual
+users that each wait for a response before sending the next request).
+Latencies go into HDR-style histograms with coordinated-omission correction,
+and results are written as JSON reports that can be compared with a stored
+baseline:
+
+    python tests/loadgen.py --mode open --rate 200 --duration 10 --report report.json
+    python tests/loadgen.py --target http://127.0.0.1:8000 --baseline tests/baselines/load_baseline.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+# Add the src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+ENDPOINTS = {
+    "health": "/health",
+    "data": "/api/v1/fitness/data/{user_id}",
+    "stats": "/api/v1/fitness/stats/{user_id}",
+    "cache_metrics": "/api/v1/cache/metrics",
+    "metrics": "/metrics",
+}
+
+# Every endpoint gets some load; /metrics at the rate of a Prometheus scraper
+DEFAULT_MIX = {"health": 1, "data": 2, "stats": 6, "cache_metrics": 1, "metrics": 1}
+
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+class LatencyHistogram:
+    """Log-linear latency histogram in the style of HdrHistogram.
+
+    Values are recorded in microseconds. Each power-of-two range is split
+    into ``2 ** (significant_bits - 1)`` linear sub-buckets, which bounds the
+    relative error of any reported percentile by ``2 ** -(significant_bits - 1)``
+    while keeping memory proportional to the dynamic range, not the count.
+    """
+
+    def __init__(self, significant_bits: int = 11):
+        self.significant_bits = significant_bits
+        self.half = 1 << (significant_bits - 1)
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        shift = max(0, value.bit_length() - self.significant_bits)
+        return shift * self.half + (value >> shift)
+
+    def _highest_equivalent(self, index: int) -> int:
+        if index < 2 * self.half:
+            return index
+        shift = index // self.half - 1
+        sub_bucket = index - shift * self.half
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value_us: int, count: int = 1):
+        value_us = max(0, int(value_us))
+        index = self._index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        self.sum += value_us * count
+        self.max = max(self.max, value_us)
+
+    def record_corrected(self, value_us: int, expected_interval_us: int):
+        """Record a value plus the samples a stalled closed loop failed to send.
+
+        When a response takes longer than the expected interval between
+        requests, the requests that should have been issued meanwhile would
+        have waited too; back-fill them with linearly decreasing latencies.
+        """
+        self.record(value_us)
+        if expected_interval_us <= 0:
+            return
+        missing = value_us - expected_interval_us
+        while missing >= expected_interval_us:
+            self.record(missing)
+            missing -= expected_interval_us
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> int:
+        if self.total == 0:
+            return 0
+        target = max(1, math.ceil(percentile / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def summary_ms(self) -> Dict[str, float]:
+        summary = {f"p{p:g}": self.percentile(p) / 1000 for p in PERCENTILES}
+        summary["mean"] = self.sum / self.total / 1000 if self.total else 0.0
+        summary["max"] = self.max / 1000
+        return summary
+
+class EndpointResults:
+    """Latency histograms and counters for one endpoint."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.service_time = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+
+    def merge(self, other: "EndpointResults"):
+        self.latency.merge(other.latency)
+        self.service_time.merge(other.service_time)
+        self.requests += other.requests
+        self.errors += other.errors
+
+    def to_dict(self, elapsed: float) -> Dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "throughput_rps": self.requests / elapsed if elapsed else 0.0,
+            "latency_ms": self.latency.summary_ms(),
+            "service_time_ms": self.service_time.summary_ms(),
+        }
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse a mix such as ``health=1,stats=6`` into endpoint weights."""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}', expected one of {sorted(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+class LoadGenerator:
+    """Drive an API target with a weighted mix of endpoint requests."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        mix: Optional[Dict[str, float]] = None,
+        num_users: int = 100,
+        seed: Optional[int] = None,
+    ):
+        self.client = client
+        self.mix = mix or DEFAULT_MIX
+        self.user_ids = [f"load_user{i}" for i in range(num_users)]
+        self.random = random.Random(seed)
+        self.results: Dict[str, EndpointResults] = {name: EndpointResults() for name in self.mix}
+        self._names = list(self.mix)
+        self._weights = [self.mix[name] for name in self._names]
+
+    async def prepare(self):
+        """Create a reading for every user so stats requests do not 404."""
+        await asyncio.gather(*[
+            self.client.get(ENDPOINTS["data"].format(user_id=user_id))
+            for user_id in self.user_ids
+        ])
+
+    def _next_request(self):
+        name = self.random.choices(self._names, self._weights)[0]
+        user_id = self.random.choice(self.user_ids)
+        return name, ENDPOINTS[name].format(user_id=user_id)
+
+    async def _send(self, name: str, path: str, intended_start: float, expected_interval_us: int = 0):
+        start = time.perf_counter()
+        try:
+            response = await self.client.get(path)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        end = time.perf_counter()
+
+        results = self.results[name]
+        results.requests += 1
+        results.errors += failed
+        results.service_time.record((end - start) * 1e6)
+        latency_us = int((end - intended_start) * 1e6)
+        if expected_interval_us:
+            results.latency.record_corrected(latency_us, expected_interval_us)
+        else:
+            results.latency.record(latency_us)
+
+    async def run_open_loop(self, rate: float, duration: float) -> float:
+        """Issue requests at a constant arrival rate; return elapsed seconds.
+
+        Latency is measured from each request's scheduled start, so time
+        spent queued behind a slow server counts against it.
+        """
+        interval = 1.0 / rate
+        total = int(rate * duration)
+        start = time.perf_counter()
+        tasks = []
+        for i in range(total):
+            intended_start = start + i * interval
+            delay = intended_start - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name, path = self._next_request()
+            tasks.append(asyncio.create_task(self._send(name, path, intended_start)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+    async def run_closed_loop(
+        self,
+        users: int,
+        duration: float,
+        think_time: float = 0.0,
+        expected_interval: Optional[float] = None,
+    ) -> float:
+        """Run virtual users back to back for a duration; return elapsed seconds.
+
+        ``expected_interval`` (seconds between a user's requests when the
+        server keeps up) enables coordinated-omission correction.
+        """
+        expected_interval_us = int((expected_interval or 0) * 1e6)
+        start = time.perf_counter()
+        deadline = start + duration
+
+        async def virtual_user():
+            while time.perf_counter() < deadline:
+                name, path = self._next_request()
+                await self._send(name, path, time.perf_counter(), expected_interval_us)
+                if think_time:
+                    await asyncio.sleep(think_time)
+
+        await asyncio.gather(*[virtual_user() for _ in range(users)])
+        return time.perf_counter() - start
+
+    def report(self, elapsed: float, **settings) -> Dict:
+        total = EndpointResults()
+        for results in self.results.values():
+            total.merge(results)
+        return {
+            "settings": {**settings, "mix": self.mix, "num_users": len(self.user_ids)},
+            "elapsed_s": elapsed,
+            "total": total.to_dict(elapsed),
+            "endpoints": {name: results.to_dict(elapsed) for name, results in self.results.items()},
+        }
+
+def compare_reports(
+    report: Dict,
+    baseline: Dict,
+    tolerance: float = 0.25,
+    latency_slack_ms: float = 5.0,
+) -> List[str]:
+    """Return regressions of a report against a baseline, empty when it passes.
+
+    Throughput may drop and p99 latency may grow by at most ``tolerance``,
+    and the error rate must not exceed the baseline's. ``latency_slack_ms``
+    keeps scheduler jitter on millisecond-scale endpoints from failing runs.
+    """
+    regressions = []
+    sections = {"total": (report["total"], baseline["total"])}
+    for name, base in baseline.get("endpoints", {}).items():
+        if name in report.get("endpoints", {}):
+            sections[name] = (report["endpoints"][name], base)
+
+    for name, (current, base) in sections.items():
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {current['throughput_rps']:.1f} rps "
+                f"< baseline {base['throughput_rps']:.1f} rps"
+            )
+        if current["latency_ms"]["p99"] > base["latency_ms"]["p99"] * (1 + tolerance) + latency_slack_ms:
+            regressions.append(
+                f"{name}: p99 latency {current['latency_ms']['p99']:.2f} ms "
+                f"> baseline {base['latency_ms']['p99']:.2f} ms"
+            )
+        current_error_rate = current["errors"] / max(1, current["requests"])
+        base_error_rate = base["errors"] / max(1, base["requests"])
+        if current_error_rate > base_error_rate:
+            regressions.append(
+                f"{name}: error rate {current_error_rate:.2%} > baseline {base_error_rate:.2%}"
+            )
+    return regressions
+
+def create_client(target: str) -> httpx.AsyncClient:
+    """Create a client for a base URL, or for the app in-process when target is 'inprocess'."""
+    if target == "inprocess":
+        from api_server import app
+        transport = httpx.ASGITransport(app=app)
+        return httpx.AsyncClient(transport=transport, base_url="http://inprocess")
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+    return httpx.AsyncClient(base_url=target, limits=limits, timeout=30.0)
+
+async def run(args) -> Dict:
+    async with create_client(args.target) as client:
+        generator = LoadGenerator(client, parse_mix(args.mix), args.num_users, args.seed)
+        await generator.prepare()
+        if args.mode == "open":
+            elapsed = await generator.run_open_loop(args.rate, args.duration)
+        else:
+            elapsed = await generator.run_closed_loop(
+                args.users, args.duration, args.think_time, args.expected_interval
+            )
+    return generator.report(
+        elapsed,
+        target=args.target,
+        mode=args.mode,
+        duration_s=args.duration,
+        rate=args.rate if args.mode == "open" else None,
+        users=args.users if args.mode == "closed" else None,
+    )
+
+def print_report(report: Dict):
+    print(f"{'endpoint':<15} {'requests':>9} {'errors':>7} {'req/s':>9} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9} {'max ms':>8}")
+    rows = {**report["endpoints"], "total": report["total"]}
+    for name, row in rows.items():
+        latency = row["latency_ms"]
+        print(f"{name:<15} {row['requests']:>9} {row['errors']:>7} {row['throughput_rps']:>9.1f} "
+              f"{latency['p50']:>8.2f} {latency['p99']:>8.2f} {latency['p99.9']:>9.2f} {latency['max']:>8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the fitness data API.")
+    parser.add_argument("--target", default="inprocess",
+                        help="Base URL of a running server, or 'inprocess' to drive the app directly")
+    parser.add_argument("--mode", choices=("open", "closed"), default="open")
+    parser.add_argument("--rate", type=float, default=200.0, help="Open loop: requests per second")
+    parser.add_argument("--users", type=int, default=10, help="Closed loop: virtual users")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Closed loop: seconds between requests")
+    parser.add_argument("--expected-interval", type=float, default=None,
+                        help="Closed loop: expected seconds between a user's requests, for coordinated-omission correction")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--mix", default=",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()),
+                        help="Endpoint weights, e.g. health=1,data=2,stats=6")
+    parser.add_argument("--num-users", type=int, default=100, help="Distinct user IDs to request")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--report", help="Write the JSON report to this path")
+    parser.add_argument("--baseline", help="Compare against this JSON report and exit non-zero on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--latency-slack-ms", type=float, default=5.0, help="Allowed absolute p99 growth")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the report to --baseline instead of comparing")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.tolerance, args.latency_slack_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -71,4 +71,127 @@ def test_get_user_stats():
 def test_get_user_stats_nonexistent_user():
     response = client.get("/api/v1/fitness/stats/nonexistent_user")
     assert response.status_code == 404
-    assert "User not found" in response.json()["detail"] 
\ No newline at end of file
+    assert "User not found" in response.json()["detail"] 
+
+def test_get_user_stats_cached():
+    user_id = "cached_user"
+    client.get(f"/api/v1/fitness/data/{user_id}")
+    
+    first = client.get(f"/api/v1/fitness/stats/{user_id}")
+    second = client.get(f"/api/v1/fitness/stats/{user_id}")
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "application/json"
+    assert first.content == second.content
+
+def test_get_user_stats_invalidated_by_new_reading():
+    import api_server
+    from api_server import stats_cache
+
+    user_id = "invalidated_user"
+    client.get(f"/api/v1/fitness/data/{user_id}")
+    client.get(f"/api/v1/fitness/stats/{user_id}")
+    version = api_server.user_data_store[user_id].timestamp
+    assert stats_cache.get(user_id, version) is not None
+    
+    # A new reading must drop the cached stats for that user only
+    client.get(f"/api/v1/fitness/data/{user_id}")
+    assert stats_cache.get(user_id, version) is None
+
+def test_cache_metrics():
+    user_id = "metrics_user"
+    client.get(f"/api/v1/fitness/data/{user_id}")
+    before = client.get("/api/v1/cache/metrics").json()
+    
+    client.get(f"/api/v1/fitness/stats/{user_id}")
+    client.get(f"/api/v1/fitness/stats/{user_id}")
+    after = client.get("/api/v1/cache/metrics").json()
+    
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+    assert 0.0 <= after["hit_rate"] <= 1.0
+
+def test_default_response_path_matches_fast_path(monkeypatch):
+    import api_server
+
+    user_id = "toggle_user"
+    for fast in (True, False):
+        monkeypatch.setattr(api_server, "FAST_RESPONSES", fast)
+        response = client.get(f"/api/v1/fitness/data/{user_id}")
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data) == {"user_id", "timestamp", "steps", "heart_rate"}
+        assert data["user_id"] == user_id
+        
+        # Readings are stored in compact form on both paths
+        reading = api_server.user_data_store[user_id]
+        assert (reading.steps, reading.heart_rate) == (data["steps"], data["heart_rate"])
+        
+        health = client.get("/health").json()
+        assert health["status"] == "healthy"
+
+def test_shared_store_backend(monkeypatch, tmp_path):
+    import api_server
+    from store import SQLiteStore
+
+    store = SQLiteStore(str(tmp_path / "store.db"))
+    monkeypatch.setattr(api_server, "user_data_store", store)
+    user_id = "shared_user"
+    
+    assert client.get(f"/api/v1/fitness/stats/{user_id}").status_code == 404
+    data = client.get(f"/api/v1/fitness/data/{user_id}").json()
+    assert store[user_id].steps == data["steps"]
+    
+    # Stats computed by this worker are shared with every other worker
+    stats = client.get(f"/api/v1/fitness/stats/{user_id}").content
+    other_worker = SQLiteStore(store.path)
+    version = other_worker[user_id].timestamp
+    assert other_worker.setdefault_stats(user_id, version, b"{}") == stats
+    
+    # A reading stored by another worker invalidates this worker's cache
+    other_worker[user_id] = api_server.generate_reading()
+    misses = api_server.stats_cache.misses
+    client.get(f"/api/v1/fitness/stats/{user_id}")
+    assert api_server.stats_cache.misses == misses + 1
+    other_worker.close()
+    store.close()
+
+def test_metrics_endpoint():
+    user_id = "prometheus_user"
+    client.get(f"/api/v1/fitness/data/{user_id}")
+    client.get(f"/api/v1/fitness/stats/{user_id}")
+    client.get(f"/api/v1/fitness/stats/{user_id}")
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    
+    # Per-user URLs are grouped under their route template
+    assert '# TYPE fitness_api_request_duration_seconds histogram' in body
+    assert 'route="/api/v1/fitness/stats/{user_id}",method="GET",status="200",le="+Inf"' in body
+    assert user_id not in body
+    assert "fitness_api_requests_in_flight 1" in body
+    assert "fitness_api_store_readings" in body
+    assert "fitness_api_stats_cache_hits_total" in body
+    assert "fitness_api_stats_cache_hit_ratio" in body
+
+def test_trace_spans_are_logged(caplog):
+    import logging
+    from fastapi import FastAPI
+    from metrics import MetricsMiddleware, MetricsRegistry, span
+
+    traced_app = FastAPI()
+    traced_app.add_middleware(MetricsMiddleware, registry=MetricsRegistry(), trace=True)
+
+    @traced_app.get("/work")
+    async def work():
+        with span("step"):
+            pass
+        return {}
+
+    with caplog.at_level(logging.INFO, logger="fitness_api.trace"):
+        TestClient(traced_app).get("/work")
+    assert any(
+        record.getMessage().startswith("GET /work 200") and "step=" in record.getMessage()
+        for record in caplog.records
+    )
@@ -0,0 +1,82 @@
+import pytest
+import sys
+import os
+
+# Add the tests directory to the Python path
+sys.path.append(os.path.dirname(__file__))
+
+from loadgen import (
+    DEFAULT_MIX, ENDPOINTS, LatencyHistogram, LoadGenerator, compare_reports, create_client, parse_mix
+)
+
+def test_histogram_percentiles_within_precision():
+    histogram = LatencyHistogram()
+    for value in range(1, 100001):
+        histogram.record(value)
+    
+    assert histogram.total == 100000
+    assert histogram.max == 100000
+    for percentile in (50, 90, 99, 99.9):
+        expected = percentile / 100 * 100000
+        assert abs(histogram.percentile(percentile) - expected) / expected < 0.001
+    assert histogram.percentile(100) == 100000
+
+def test_histogram_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for value in (0, 1, 2, 3, 1000):
+        histogram.record(value)
+    assert histogram.percentile(20) == 0
+    assert histogram.percentile(60) == 2
+    assert histogram.percentile(100) == 1000
+
+def test_coordinated_omission_correction_backfills_stalls():
+    # One 1s stall in a loop that should send a request every 100ms
+    histogram = LatencyHistogram()
+    histogram.record_corrected(1000000, 100000)
+    
+    assert histogram.total == 10
+    assert histogram.percentile(50) == pytest.approx(500000, rel=0.001)
+    assert histogram.max == 1000000
+
+def test_histogram_merge():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    a.record(10)
+    b.record(20, count=3)
+    a.merge(b)
+    assert a.total == 4
+    assert a.percentile(50) == 20
+
+def test_default_mix_covers_every_endpoint():
+    assert set(DEFAULT_MIX) == set(ENDPOINTS)
+
+def test_parse_mix():
+    assert parse_mix("health=1,stats=6") == {"health": 1.0, "stats": 6.0}
+    with pytest.raises(ValueError):
+        parse_mix("unknown=1")
+
+def make_report(rps, p99, errors=0, requests=100):
+    row = {"requests": requests, "errors": errors, "throughput_rps": rps, "latency_ms": {"p99": p99}}
+    return {"total": row, "endpoints": {"health": row}}
+
+def test_compare_reports():
+    baseline = make_report(100, 10)
+    assert compare_reports(make_report(90, 12), baseline) == []
+    
+    regressions = compare_reports(make_report(50, 20, errors=1), baseline)
+    assert len(regressions) == 6
+    assert any("throughput" in r for r in regressions)
+    assert any("p99" in r for r in regressions)
+    assert any("error rate" in r for r in regressions)
+
+@pytest.mark.asyncio
+async def test_open_loop_report_in_process():
+    async with create_client("inprocess") as client:
+        generator = LoadGenerator(client, mix={"health": 1, "stats": 1}, num_users=5, seed=1)
+        await generator.prepare()
+        elapsed = await generator.run_open_loop(rate=200, duration=0.5)
+    report = generator.report(elapsed, mode="open")
+    
+    assert report["total"]["requests"] == 100
+    assert report["total"]["errors"] == 0
+    assert set(report["endpoints"]) == {"health", "stats"}
+    assert report["total"]["latency_ms"]["p50"] > 0
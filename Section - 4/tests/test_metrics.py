@@ -0,0 +1,51 @@
+import pytest
+import asyncio
+import time
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from metrics import Histogram, LoopLagMonitor, MetricsRegistry, span
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, ("/a",))
+    
+    lines = histogram.render()
+    assert '# TYPE latency_seconds histogram' in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{route="/a"} 2.65' in lines
+    assert 'latency_seconds_count{route="/a"} 4' in lines
+    assert histogram.count(("/a",)) == 4
+
+def test_registry_reads_callbacks_at_scrape_time():
+    registry = MetricsRegistry()
+    values = {"size": 1}
+    registry.add_callback("store_size", "gauge", "Store size.", lambda: values["size"])
+    values["size"] = 42
+    
+    body = registry.render()
+    assert "# TYPE store_size gauge\nstore_size 42\n" in body
+    assert "fitness_api_requests_in_flight 0" in body
+
+def test_span_is_noop_without_tracing():
+    with span("untraced"):
+        pass
+
+@pytest.mark.asyncio
+async def test_loop_lag_monitor_records_blocking():
+    registry = MetricsRegistry()
+    monitor = LoopLagMonitor(registry, interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.02)
+    time.sleep(0.05)  # block the loop
+    await asyncio.sleep(0.02)
+    await monitor.stop()
+    
+    assert registry.loop_lag.count() >= 2
+    assert registry.loop_lag._series[()][1] >= 0.03
@@ -0,0 +1,123 @@
+import pytest
+import asyncio
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from response_cache import ResponseCache, encode_json
+
+def test_encode_json_is_compact():
+    assert encode_json({"a": 1, "b": "é"}) == '{"a":1,"b":"é"}'.encode("utf-8")
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_are_coalesced():
+    cache = ResponseCache(ttl=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"value": calls}
+
+    results = await asyncio.gather(*[
+        cache.get_or_compute("user", compute) for _ in range(10)
+    ])
+    
+    assert calls == 1
+    assert all(body == b'{"value":1}' for body in results)
+    assert cache.misses == 1
+    assert cache.coalesced == 9
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl():
+    cache = ResponseCache(ttl=60)
+
+    async def compute():
+        return {"value": 1}
+
+    await cache.get_or_compute("short", compute, ttl=0.01)
+    await cache.get_or_compute("long", compute)
+    await asyncio.sleep(0.02)
+    
+    assert cache.get("short") is None
+    assert cache.get("long") == b'{"value":1}'
+
+@pytest.mark.asyncio
+async def test_invalidation_during_compute_is_not_stored():
+    cache = ResponseCache(ttl=60)
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return {"value": 1}
+
+    task = asyncio.create_task(cache.get_or_compute("user", compute))
+    await asyncio.sleep(0.01)
+    cache.invalidate("user")
+    
+    assert await task == b'{"value":1}'
+    assert cache.get("user") is None
+
+@pytest.mark.asyncio
+async def test_compute_errors_are_not_cached():
+    cache = ResponseCache(ttl=60)
+
+    async def compute():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await cache.get_or_compute("user", compute)
+    assert cache.get("user") is None
+
+@pytest.mark.asyncio
+async def test_cancelled_computation_does_not_hang_waiters():
+    cache = ResponseCache(ttl=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"value": calls}
+
+    owner = asyncio.create_task(cache.get_or_compute("user", compute))
+    await asyncio.sleep(0.01)
+    waiters = [asyncio.create_task(cache.get_or_compute("user", compute)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    owner.cancel()
+
+    results = await asyncio.wait_for(asyncio.gather(*waiters), timeout=1)
+
+    assert owner.cancelled()
+    # The first waiter recomputes and the others coalesce onto it
+    assert calls == 2 and results == [b'{"value":2}'] * 3
+    assert cache.get("user") == b'{"value":2}'
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_computation_running():
+    cache = ResponseCache(ttl=60)
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return {"value": 1}
+
+    owner = asyncio.create_task(cache.get_or_compute("user", compute))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(cache.get_or_compute("user", compute))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+
+    assert await owner == b'{"value":1}'
+    assert waiter.cancelled()
+
+def test_max_entries_evicts_oldest():
+    cache = ResponseCache(ttl=60, max_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.set("c", b"3")
+    
+    assert cache.get("a") is None
+    assert cache.get("b") == b"2"
+    assert cache.get("c") == b"3"
@@ -0,0 +1,55 @@
+import pytest
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from store import Reading, SQLiteStore
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "store.db")
+
+def test_readings_are_visible_to_other_connections(store_path):
+    writer = SQLiteStore(store_path)
+    reader = SQLiteStore(store_path)
+    writer["user1"] = Reading("2025-01-18T02:13:27.965185", 382, 132)
+    
+    assert "user1" in reader
+    assert reader["user1"] == Reading("2025-01-18T02:13:27.965185", 382, 132)
+    assert reader.get("missing") is None
+    assert len(reader) == 1
+    assert list(reader) == ["user1"]
+    
+    writer["user1"] = Reading("2025-01-18T02:13:28.000000", 10, 70)
+    assert reader["user1"].steps == 10
+    assert len(reader) == 1
+
+def test_missing_reading_raises_key_error(store_path):
+    store = SQLiteStore(store_path)
+    with pytest.raises(KeyError):
+        store["missing"]
+    with pytest.raises(KeyError):
+        del store["missing"]
+
+def test_first_stats_for_a_version_win(store_path):
+    worker_a = SQLiteStore(store_path)
+    worker_b = SQLiteStore(store_path)
+    
+    assert worker_a.setdefault_stats("user1", "2025-01-18T02:00", b"a") == b"a"
+    assert worker_b.setdefault_stats("user1", "2025-01-18T02:00", b"b") == b"a"
+    
+    # Newer readings replace stats; stale versions never overwrite them
+    assert worker_b.setdefault_stats("user1", "2025-01-18T03:00", b"c") == b"c"
+    assert worker_a.setdefault_stats("user1", "2025-01-18T02:00", b"d") == b"d"
+    assert worker_a.setdefault_stats("user1", "2025-01-18T03:00", b"e") == b"c"
+
+def test_close_and_reopen(store_path):
+    store = SQLiteStore(store_path)
+    store["user1"] = Reading("2025-01-18T02:13:27", 1, 60)
+    store.close()
+    
+    assert store["user1"].steps == 1
+    store.clear()
+    assert len(store) == 0